@@ -1,7 +1,7 @@
 from django.contrib import admin
 from .models import (
     UniBookingCard, HotelBooking, FlightBooking,
-    TransferBooking, VisaBooking, Payment
+    TransferBooking, VisaBooking, Payment, VoucherIngestJob,
 )
 
 
@@ -64,3 +64,12 @@ class PaymentAdmin(admin.ModelAdmin):
         return obj.remain
     remaining.short_description = "المتبقي"
 
+
+
+@admin.register(VoucherIngestJob)
+class VoucherIngestJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "original_name", "status", "card", "created_by", "booking", "created_at", "finished_at")
+    search_fields = ("original_name", "card__customer_name")
+    list_filter = ("status", "created_by")
+    ordering = ("-created_at",)
+    readonly_fields = ("text", "result", "error", "started_at", "finished_at")
@@ -0,0 +1,158 @@
+# core/db_router.py
+"""
+Read-replica routing for the analytics pages.
+
+Views wrapped in ``@read_only`` (reports, exports, dashboard overview) send
+their reads to the ``replica`` alias when ``DATABASE_REPLICA_URL`` is set.
+Everything else, and every write, stays on ``default``. A session that wrote
+something is pinned to the primary for ``REPLICA_PIN_SECONDS`` so agents see
+their own booking right after saving it, whatever the replication lag.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REPLICA = "replica"
+ROUTER = "core.db_router.ReplicaRouter"
+PIN_SESSION_KEY = "_db_primary_until"
+
+
+class _Scope:
+    __slots__ = ("wrote",)
+
+    def __init__(self):
+        self.wrote = False
+
+
+# كل request وكل بلوك read-only ليه _Scope بتاعه، فالكتابة اللي برة (حفظ الـ session مثلاً)
+# متسربش للـ request اللي بعده على نفس الـ thread
+_read_only = contextvars.ContextVar("db_read_only", default=None)
+_request = contextvars.ContextVar("db_request", default=None)
+
+
+def replica_configured() -> bool:
+    # من غير الـ router (زي التيستات) مفيش توجيه، فمفيش داعي نثبّت الـ session على الـ primary
+    return REPLICA in settings.DATABASES and ROUTER in settings.DATABASE_ROUTERS
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        scope = _read_only.get()
+        if scope is not None and not scope.wrote:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # بعد أي كتابة نقرا من الـ primary عشان نشوف اللي اتكتب
+        for var in (_read_only, _request):
+            scope = var.get()
+            if scope is not None:
+                scope.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # نفس البيانات على الاتنين
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+@contextmanager
+def use_replica():
+    """Send the reads in this block to the replica (no-op without one)."""
+    if not replica_configured():
+        yield
+        return
+    token = _read_only.set(_Scope())
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def _pinned(request) -> bool:
+    # بيتحسب في الـ middleware (sync) عشان الـ async views متلمسش الـ session
+    return getattr(request, "_db_pinned", False)
+
+
+def _stream_on_replica(iterator):
+    # الـ StreamingHttpResponse بيقرا بعد ما الـ view يرجع
+    with use_replica():
+        yield from iterator
+
+
+def read_only(view):
+    """Route the view's reads (including a streamed body) to the replica."""
+    if iscoroutinefunction(view):
+        async def wrapper(request, *args, **kwargs):
+            if _pinned(request):
+                return await view(request, *args, **kwargs)
+            with use_replica():
+                return await view(request, *args, **kwargs)
+
+        markcoroutinefunction(wrapper)
+        return wraps(view)(wrapper)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_configured() or _pinned(request):
+            return view(request, *args, **kwargs)
+        with use_replica():
+            response = view(request, *args, **kwargs)
+        if getattr(response, "streaming", False) and not getattr(response, "is_async", False):
+            response.streaming_content = _stream_on_replica(response.streaming_content)
+        return response
+
+    return wrapper
+
+
+class ReplicaPinMiddleware:
+    """Pin the session to the primary for a few seconds after any write."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _pin_until(self):
+        return time.time() + getattr(settings, "REPLICA_PIN_SECONDS", 5)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_configured():
+            return self.get_response(request)
+        session = getattr(request, "session", None)
+        request._db_pinned = session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+        scope = _Scope()
+        token = _request.set(scope)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        if scope.wrote and session is not None:
+            session[PIN_SESSION_KEY] = self._pin_until()
+        return response
+
+    async def __acall__(self, request):
+        if not replica_configured():
+            return await self.get_response(request)
+        session = getattr(request, "session", None)
+        request._db_pinned = session is not None and (await session.aget(PIN_SESSION_KEY, 0)) > time.time()
+        scope = _Scope()
+        token = _request.set(scope)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        if scope.wrote and session is not None:
+            await session.aset(PIN_SESSION_KEY, self._pin_until())
+        return response
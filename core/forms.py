@@ -6,7 +6,7 @@ from .models import (
 
 from decimal import Decimal
 from django.core.exceptions import ValidationError
-from django.db.models import Sum
+from .services.payments import payment_summary
 
 class UniBookingCardForm(forms.ModelForm):
     class Meta:
@@ -120,6 +120,38 @@ class VoucherUploadForm(forms.Form):
     file = forms.FileField()
 
 
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(d, initial) for d in data]
+        return [single_file_clean(data, initial)]
+
+
+class VoucherIngestForm(forms.Form):
+    MAX_FILES = 100
+    ALLOWED_EXTENSIONS = ("pdf", "docx", "jpg", "jpeg", "png", "webp", "tif", "tiff")
+
+    files = MultipleFileField()
+
+    def clean_files(self):
+        files = self.cleaned_data["files"]
+        if len(files) > self.MAX_FILES:
+            raise ValidationError(f"الحد الأقصى {self.MAX_FILES} ملف في المرة الواحدة.")
+        bad = [f.name for f in files if f.name.rsplit(".", 1)[-1].lower() not in self.ALLOWED_EXTENSIONS]
+        if bad:
+            raise ValidationError(f"ملفات غير مدعومة: {', '.join(bad)}")
+        return files
+
+
 class VoucherConfirmForm(forms.Form):
     booking_ref = forms.CharField(required=False)
     # ... إلخ
@@ -139,7 +171,11 @@ class PaymentForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         self.booking = kwargs.pop("booking", None)
-        has_existing_payments = kwargs.pop("has_existing_payments", False)
+        # PaymentSummary محسوب مرة واحدة (services/payments.py) بدل aggregate في كل clean
+        self.summary = kwargs.pop("summary", None)
+        has_existing_payments = kwargs.pop(
+            "has_existing_payments", self.summary.has_payments if self.summary else False
+        )
         super().__init__(*args, **kwargs)
 
         if has_existing_payments:
@@ -155,16 +191,22 @@ class PaymentForm(forms.ModelForm):
             self.fields['invoice_file'].required = True
             self.fields['voucher_original'].required = True
 
+    def _payment_summary(self):
+        # payment_edit مش بيبعت summary؛ نحسبه مرة واحدة لو احتجناه
+        if self.summary is None and self.booking is not None:
+            self.summary = payment_summary(self.booking)
+        return self.summary
+
+    def _sell_price(self, summary):
+        # بعد أول دفعة السعر بتاع الحجز هو المرجع، مش اللي في الفورم
+        return summary.sell if summary.has_payments else self.cleaned_data.get("sell_price")
+
     def clean_paid_amount(self):
         paid_amount = self.cleaned_data.get("paid_amount") or Decimal("0.00")
-        sell_price = self.cleaned_data.get("sell_price")
+        summary = self._payment_summary()
 
-        if self.booking:
-            if self.booking.payments.exists():
-                sell_price = self.booking.sell
-            
-            total_paid = self.booking.payments.aggregate(total=Sum('paid_amount'))['total'] or Decimal("0.00")
-            remaining = (sell_price or 0) - total_paid
+        if summary is not None:
+            remaining = (self._sell_price(summary) or 0) - summary.paid
 
             if paid_amount <= 0:
                 raise ValidationError("المبلغ المدفوع يجب أن يكون أكبر من صفر.")
@@ -177,14 +219,13 @@ class PaymentForm(forms.ModelForm):
     def clean_installment_date(self):
         due_date = self.cleaned_data.get("installment_date")
         paid_amount = self.cleaned_data.get("paid_amount", 0)
-        sell_price = self.cleaned_data.get("sell_price")
-
-        if self.booking and self.booking.payments.exists():
-            sell_price = self.booking.sell
+        summary = self._payment_summary()
+        if summary is None:
+            return due_date
 
         # إذا كان المبلغ المدفوع أقل من سعر البيع، يجب تحديد تاريخ للدفع
-        total_paid_after_this = (self.booking.payments.aggregate(total=Sum('paid_amount'))['total'] or Decimal("0.00")) + paid_amount
-        if total_paid_after_this < (sell_price or 0):
+        total_paid_after_this = summary.paid + paid_amount
+        if total_paid_after_this < (self._sell_price(summary) or 0):
             if not due_date:
                 raise ValidationError("يجب تحديد آخر ميعاد للدفع طالما أن المبلغ لم يكتمل.")
         
@@ -0,0 +1,167 @@
+# core/instrumentation.py
+"""
+Per-request SQL instrumentation that is cheap enough to leave on in production.
+
+Every DB connection gets one execute wrapper (installed from the
+``connection_created`` signal). It only records when a request is being
+measured, i.e. when ``QueryStatsMiddleware`` has put a collector into the
+context - so the dashboard's pool threads and the replica are counted too.
+The middleware adds ``Server-Timing`` and writes slow requests/queries as JSON
+lines to the ``core.slow`` logger (a rotating file, see ``LOGGING``).
+"""
+import contextvars
+import json
+import logging
+import logging.handlers
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+slow_log = logging.getLogger("core.slow")
+
+_collector = contextvars.ContextVar("query_stats", default=None)
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "signatures", "slow", "_lock")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.signatures = Counter()
+        self.slow = []
+        self._lock = threading.Lock()
+
+    def add(self, sql, elapsed, slow_after):
+        with self._lock:  # الـ dashboard بيسجل من كذا ثريد في نفس الوقت
+            self.count += 1
+            self.seconds += elapsed
+            # الـ SQL بتاع Django فيه %s بدل القيم، فهو نفسه توقيع الاستعلام
+            self.signatures[sql] += 1
+            if elapsed >= slow_after:
+                self.slow.append((sql, elapsed))
+
+    def duplicates(self, threshold):
+        return [(sql, n) for sql, n in self.signatures.most_common() if n >= threshold]
+
+
+def current_stats():
+    """QueryStats of the request being measured, None outside QueryStatsMiddleware."""
+    return _collector.get()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _record(execute, sql, params, many, context):
+    stats = _collector.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(sql, time.perf_counter() - started, _setting("SLOW_QUERY_MS", 100) / 1000)
+
+
+def install(connection):
+    # connection_created بيتبعت مع كل reconnect، فمنضيفش الـ wrapper مرتين
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+def _params(request):
+    match = request.resolver_match
+    params = {k: str(v) for k, v in (match.kwargs if match else {}).items()}
+    params.update({k: v[:200] for k, v in request.GET.items()})
+    return params
+
+
+class SlowLogHandler(logging.handlers.RotatingFileHandler):
+    """The ``slow_file`` handler: creates the log folder when logging is configured, not on settings import."""
+
+    def __init__(self, filename, *args, **kwargs):
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        super().__init__(filename, *args, **kwargs)
+
+
+def _log_slow(request, response, stats, elapsed, duplicates):
+    match = request.resolver_match
+    entry = {
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "method": request.method,
+        "path": request.path,
+        "view": match.view_name if match else None,
+        "params": _params(request),
+        "status": response.status_code,
+        "ms": round(elapsed * 1000, 1),
+        "db_ms": round(stats.seconds * 1000, 1),
+        "queries": stats.count,
+        "duplicates": [{"sql": sql[:500], "count": n} for sql, n in duplicates],
+        "slow_queries": [{"sql": sql[:2000], "ms": round(t * 1000, 1)} for sql, t in stats.slow],
+    }
+    slow_log.warning(json.dumps(entry, ensure_ascii=False))
+
+
+def _stream_collecting(iterator, stats):
+    # الـ StreamingHttpResponse بيقرا بعد ما الـ middleware يخلص (تصدير التقارير)
+    token = _collector.set(stats)
+    try:
+        yield from iterator
+    finally:
+        _collector.reset(token)
+
+
+class QueryStatsMiddleware:
+    """Query count, DB time and repeated (N+1) queries per request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not _setting("SQL_INSTRUMENTATION", True):
+            return self.get_response(request)
+        stats, started = QueryStats(), time.perf_counter()
+        token = _collector.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _collector.reset(token)
+        return self._finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not _setting("SQL_INSTRUMENTATION", True):
+            return await self.get_response(request)
+        stats, started = QueryStats(), time.perf_counter()
+        token = _collector.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _collector.reset(token)
+        return self._finish(request, response, stats, time.perf_counter() - started)
+
+    def _finish(self, request, response, stats, elapsed):
+        request.query_stats = stats  # لأمر bench والـ tests (response.wsgi_request)
+        if getattr(response, "streaming", False) and not getattr(response, "is_async", False):
+            response.streaming_content = _stream_collecting(response.streaming_content, stats)
+        duplicates = stats.duplicates(_setting("NPLUSONE_THRESHOLD", 5))
+        if _setting("SERVER_TIMING", True):
+            desc = f"{stats.count} queries" + (f", {sum(n for _, n in duplicates)} repeated" if duplicates else "")
+            response["Server-Timing"] = (
+                f'db;dur={stats.seconds * 1000:.1f};desc="{desc}", app;dur={elapsed * 1000:.1f}'
+            )
+        if stats.slow or elapsed * 1000 >= _setting("SLOW_REQUEST_MS", 500):
+            _log_slow(request, response, stats, elapsed, duplicates)
+        return response
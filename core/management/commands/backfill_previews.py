@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.models import StoredBlob
+from core.services.previews import build_preview, preview_name, supports
+from core.storage import get_blob_storage
+
+
+class Command(BaseCommand):
+    help = "تعليم الـ blobs اللي معاينتها موجودة (has_preview) وعمل الناقص منها مع --build"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--build", action="store_true", help="render missing previews (Pillow / PyMuPDF)")
+        parser.add_argument("--batch", type=int, default=500, help="rows per update")
+
+    def handle(self, *args, **opts):
+        storage = get_blob_storage()
+        marked = built = 0
+        ready = []
+        # على S3 كل exists() = طلب HEAD، فده أمر بيتشغل مرة مش جزء من migrate
+        for pk, name in StoredBlob.objects.filter(has_preview=False).values_list("pk", "name").iterator():
+            if not supports(name):
+                continue
+            if storage.exists(preview_name(name)):
+                ready.append(pk)
+            elif opts["build"] and build_preview(storage, name):
+                built += 1  # build_preview بيعلّم الصف بنفسه
+            if len(ready) >= opts["batch"]:
+                marked += StoredBlob.objects.filter(pk__in=ready).update(has_preview=True)
+                ready = []
+        if ready:
+            marked += StoredBlob.objects.filter(pk__in=ready).update(has_preview=True)
+        self.stdout.write(self.style.SUCCESS(f"✅ {marked} معاينة موجودة اتعلّمت، {built} معاينة جديدة اتعملت"))
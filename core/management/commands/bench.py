@@ -0,0 +1,176 @@
+import io
+import json
+import logging
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import URLPattern, reverse
+
+from core import urls as core_urls
+from core.models import (
+    FlightBooking, HotelBooking, Payment, Room, TransferBooking, UniBookingCard, VisaBooking, VoucherIngestJob,
+)
+
+# GET عليها بيغير البيانات أو مش مدعوم أصلاً
+SKIP = {
+    "payment_delete": "POST only, changes data",
+    "voucher_ingest_dismiss": "POST only, changes data",
+    "cards_bulk_delete": "POST only",
+    "voucher_generate": "POST only",
+}
+# booking_pk معناه حسب أول جزء في الرابط
+BOOKING_MODELS = {"hotel": HotelBooking, "flight": FlightBooking, "transfer": TransferBooking, "visa": VisaBooking}
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Command(BaseCommand):
+    help = "قياس كل صفحات core/urls.py (p50/p95 والاستعلامات والذاكرة) على أحجام بيانات مختلفة في قاعدة مؤقتة"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,5000", help="comma separated card counts")
+        parser.add_argument("--repeat", type=int, default=20, help="timed requests per URL and size")
+        parser.add_argument("--only", default="", help="comma separated URL names to run")
+        parser.add_argument("--users", type=int, default=20, help="agents passed to seed_bench")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="write the JSON report here instead of stdout")
+
+    def handle(self, *args, **opts):
+        try:
+            sizes = sorted({int(s) for s in opts["sizes"].split(",") if s.strip()})
+        except ValueError:
+            raise CommandError("--sizes must be integers, e.g. 100,1000,5000")
+        only = {s.strip() for s in opts["only"].split(",") if s.strip()}
+        patterns = [p for p in core_urls.urlpatterns if isinstance(p, URLPattern) and p.name]
+        if only:
+            unknown = only - {p.name for p in patterns}
+            if unknown:
+                raise CommandError(f"Unknown URL names: {', '.join(sorted(unknown))}")
+            patterns = [p for p in patterns if p.name in only]
+
+        # قاعدة test منفصلة: الأرقام متتأثرش بالداتا الحقيقية ومفيش حاجة بتتكتب عليها
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        # الـ 500 بتتسجل في التقرير بالـ status، مش محتاجين الـ traceback كل مرة
+        request_log = logging.getLogger("django.request")
+        level, request_log.level = request_log.level, logging.CRITICAL
+        try:
+            report = self._run(patterns, sizes, opts)
+        finally:
+            request_log.level = level
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report["skipped"] = {name: reason for name, reason in SKIP.items() if not only or name in only}
+        data = json.dumps(report, indent=2, ensure_ascii=False)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                fh.write(data + "\n")
+            self.stderr.write(self.style.SUCCESS(f"✅ Report written to {opts['output']}"))
+        else:
+            self.stdout.write(data)
+
+    def _run(self, patterns, sizes, opts):
+        admin = User.objects.create_superuser("bench_admin", "bench@example.com", "x")
+        client = Client(raise_request_exception=False)
+        client.force_login(admin)
+        report = {"repeat": opts["repeat"], "sizes": {}}
+        seeded = 0
+        for size in sizes:
+            # الأحجام بتتبني فوق بعض: 100 ثم نزود لحد 1000 وهكذا
+            out = io.StringIO()
+            call_command("seed_bench", cards=size - seeded, users=opts["users"], seed=opts["seed"], stdout=out)
+            seeded = size
+            self.stderr.write(f"[{size} cards] {out.getvalue().strip()}")
+            kwargs = self._objects()
+            results = {}
+            for pattern in patterns:
+                name = pattern.name
+                if name in SKIP:
+                    continue
+                url = self._url(pattern, kwargs)
+                if url is None:
+                    results[name] = {"skipped": "no object to point at"}
+                    continue
+                results[name] = self._measure(client, url, opts["repeat"])
+                self.stderr.write(f"  {name:<24} p50 {results[name]['p50_ms']:>8.1f} ms  "
+                                  f"p95 {results[name]['p95_ms']:>8.1f} ms  {results[name]['queries']:>4} q  "
+                                  f"{results[name]['status']}")
+            report["sizes"][str(size)] = {"rows": self._rows(), "urls": results}
+        return report
+
+    def _objects(self):
+        # الكارت اللي عليه أكتر حجوزات = أتقل صفحة فعلاً
+        card = UniBookingCard.objects.annotate(n=Count("hotelbooking")).order_by("-n", "pk").first()
+        objects = {"card": card, "payment": Payment.objects.filter(booking_hotel__card=card).first(),
+                   "job": VoucherIngestJob.objects.order_by("-pk").first()}
+        for prefix, model in BOOKING_MODELS.items():
+            objects[prefix] = model.objects.filter(card=card).first() or model.objects.order_by("pk").first()
+        return objects
+
+    def _url(self, pattern, objects):
+        kwargs = {}
+        for key in pattern.pattern.converters:
+            if key in ("pk", "card_pk"):
+                obj = objects["card"]
+            elif key == "booking_pk":
+                obj = objects.get(str(pattern.pattern).split("/")[0])
+            elif key == "payment_pk":
+                obj = objects["payment"]
+            elif key == "job_pk":
+                obj = objects["job"]
+            else:
+                return None
+            if obj is None:
+                return None
+            kwargs[key] = obj.pk
+        return reverse(pattern.name, kwargs=kwargs)
+
+    def _measure(self, client, url, repeat):
+        client.get(url)  # تسخين: الـ templates والـ resolver والـ caches
+        timings, queries, status = [], 0, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(url)
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+            timings.append(time.perf_counter() - started)
+            status = response.status_code
+            stats = getattr(response.wsgi_request, "query_stats", None)
+            queries = stats.count if stats is not None else None
+
+        # tracemalloc بيبطّأ كل حاجة، فالذاكرة في طلب لوحده بعد التوقيت
+        tracemalloc.start()
+        try:
+            response = client.get(url)
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {
+            "url": url,
+            "status": status,
+            "p50_ms": round(_percentile(timings, 0.5) * 1000, 2),
+            "p95_ms": round(_percentile(timings, 0.95) * 1000, 2),
+            "mean_ms": round(statistics.fmean(timings) * 1000, 2),
+            "queries": queries,
+            "peak_kb": round(peak / 1024, 1),
+        }
+
+    def _rows(self):
+        return {model.__name__: model.objects.count() for model in (
+            UniBookingCard, HotelBooking, Room, Payment, FlightBooking, TransferBooking, VisaBooking,
+        )}
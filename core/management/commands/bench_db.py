@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# زي ingest_worker: العمليات الفرعية spawn، فالموديلز بتتعمل import جوه الدوال بس.
+
+
+def _init_worker():
+    django.setup()
+
+
+def _worker(alias, card_id, ops, read_ratio, seed):
+    """Mix of booking+payment writes and card-summary reads, like one gunicorn worker."""
+    import random
+
+    from django.db import OperationalError, transaction
+    from django.db.models import Sum
+
+    from core.models import HotelBooking, Payment
+
+    rnd = random.Random(seed)
+    latencies, errors, writes = [], 0, 0
+    began = time.perf_counter()
+    try:
+        for i in range(ops):
+            start = time.perf_counter()
+            try:
+                if rnd.random() < read_ratio:
+                    list(HotelBooking.objects.using(alias).filter(card_id=card_id).order_by("-id")[:20])
+                    Payment.objects.using(alias).filter(booking_hotel__card_id=card_id).aggregate(Sum("paid_amount"))
+                else:
+                    with transaction.atomic(using=alias):
+                        hb = HotelBooking(card_id=card_id, booking_ref=f"BENCH{seed}X{i}", hotel_name="bench",
+                                          net=Decimal("100"), sell=Decimal("120"))
+                        hb.save(using=alias)
+                        Payment.objects.using(alias).create(booking_hotel=hb, method="cash", paid_amount=Decimal("50"))
+                    writes += 1
+            except OperationalError:
+                # SQLite: "database is locked"
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+    finally:
+        connections.close_all()
+    return latencies, errors, writes, time.perf_counter() - began
+
+
+class Command(BaseCommand):
+    help = "قياس سرعة قاعدة البيانات مع عمليات متوازية زي عمّال gunicorn (قارن SQLite و Postgres بـ DATABASE_URL)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="database alias to benchmark")
+        parser.add_argument("--workers", type=int, default=4, help="concurrent processes (gunicorn workers)")
+        parser.add_argument("--ops", type=int, default=200, help="operations per worker")
+        parser.add_argument("--read-ratio", type=float, default=0.5, help="share of read operations (0-1)")
+        parser.add_argument("--keep", action="store_true", help="keep the rows written by the benchmark")
+        parser.add_argument("--sqlite-baseline", action="store_true",
+                            help="run the workers with SQLITE_TUNING=0 (rollback journal, deferred transactions)")
+
+    def handle(self, *args, **opts):
+        from django.contrib.auth.models import User
+
+        from core.models import UniBookingCard
+        from core.signals import set_journal_mode
+
+        alias = opts["database"]
+        conn = connections[alias]
+        if conn.vendor == "sqlite":
+            with conn.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                mode = "baseline" if opts["sqlite_baseline"] else f"journal={cursor.fetchone()[0]}"
+            self.stdout.write(f"SQLite mode: {mode}")
+        self.stdout.write(f"Backend: {conn.vendor} ({conn.settings_dict['NAME']}), "
+                          f"{opts['workers']} workers x {opts['ops']} ops, read ratio {opts['read_ratio']}")
+
+        user, _ = User.objects.db_manager(alias).get_or_create(username="__bench_db__")
+        card = UniBookingCard(customer_name="bench_db", created_by=user)
+        card.save(using=alias)
+
+        if opts["sqlite_baseline"]:
+            # العمليات الجديدة بتقرا الـ settings من الـ environment؛ الـ journal بيتخزن في الملف نفسه
+            os.environ["SQLITE_TUNING"] = "0"
+            if conn.vendor == "sqlite":
+                set_journal_mode(conn, "delete")
+        connections.close_all()
+        ctx = multiprocessing.get_context("spawn")
+        try:
+            with ProcessPoolExecutor(max_workers=opts["workers"], mp_context=ctx, initializer=_init_worker) as pool:
+                futures = [
+                    pool.submit(_worker, alias, card.pk, opts["ops"], opts["read_ratio"], seed)
+                    for seed in range(opts["workers"])
+                ]
+                results = [f.result() for f in futures]
+        finally:
+            if opts["sqlite_baseline"] and conn.vendor == "sqlite":
+                set_journal_mode(conn)  # نرجّع SQLITE_JOURNAL_MODE
+            if not opts["keep"]:
+                UniBookingCard.objects.using(alias).filter(pk=card.pk).delete()
+                User.objects.db_manager(alias).filter(username="__bench_db__").delete()
+
+        latencies = sorted(l for r in results for l in r[0])
+        errors = sum(r[1] for r in results)
+        writes = sum(r[2] for r in results)
+        elapsed = max(r[3] for r in results)  # من غير وقت تشغيل العمليات و django.setup()
+        total = len(latencies)
+        p = lambda q: 1000 * latencies[min(total - 1, int(q * total))]  # noqa: E731
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} ops in {elapsed:.2f}s = {total / elapsed:,.0f} ops/s, "
+            f"{writes / elapsed:,.0f} write txn/s, errors (locked): {errors}"
+        ))
+        self.stdout.write(
+            f"latency ms: p50 {p(0.5):.1f}  p95 {p(0.95):.1f}  p99 {p(0.99):.1f}  "
+            f"mean {1000 * statistics.fmean(latencies):.1f}"
+        )
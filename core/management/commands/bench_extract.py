@@ -0,0 +1,43 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.services.extraction import PDF_BACKENDS
+from core.services.voucher_parser import smart_parse
+
+
+class Command(BaseCommand):
+    help = "مقارنة سرعة استخراج النص من ملفات PDF بين PyMuPDF و pdfplumber"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=str(Path(settings.MEDIA_ROOT) / "vouchers"))
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--max-pages", type=int, default=getattr(settings, "VOUCHER_MAX_PAGES", None))
+
+    def handle(self, *args, **opts):
+        files = sorted(Path(opts["path"]).rglob("*.pdf"))
+        if not files:
+            self.stderr.write(f"No PDF files under {opts['path']}")
+            return
+        blobs = [(f.name, f.read_bytes()) for f in files]
+        backends = [b for b in PDF_BACKENDS.values() if b.available()]
+
+        totals = {}
+        for backend in backends:
+            filled = 0
+            start = time.perf_counter()
+            for _ in range(opts["repeat"]):
+                for _, data in blobs:
+                    backend.extract(data, opts["max_pages"])
+            totals[backend.name] = elapsed = time.perf_counter() - start
+            for _, data in blobs:
+                filled += sum(v is not None for v in smart_parse(backend.extract(data, opts["max_pages"])).values())
+            per_file = 1000 * elapsed / (len(blobs) * opts["repeat"])
+            self.stdout.write(f"{backend.name:<12} {per_file:8.1f} ms/file   parsed fields: {filled}")
+
+        if {"pymupdf", "pdfplumber"} <= totals.keys():
+            self.stdout.write(self.style.SUCCESS(
+                f"PyMuPDF is {totals['pdfplumber'] / totals['pymupdf']:.1f}x faster on {len(blobs)} file(s)"
+            ))
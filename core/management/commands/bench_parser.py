@@ -0,0 +1,66 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from core.services.voucher_parser import get_parser
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / "voucher_samples"
+
+
+def _normalize(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+class Command(BaseCommand):
+    help = "قياس دقة وسرعة قراءة الفاوتشرات على عينات الموردين (voucher_samples)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="folder of <name>.txt + <name>.expected.json")
+        parser.add_argument("--repeat", type=int, default=200, help="parses per sample for the throughput run")
+        parser.add_argument("--scale", type=int, default=1, help="repeat each text N times to simulate multi-page PDFs")
+        parser.add_argument("--verbose-fields", action="store_true", help="print every mismatching field")
+
+    def handle(self, *args, **opts):
+        corpus = Path(opts["corpus"])
+        samples = sorted(corpus.glob("*.txt"))
+        if not samples:
+            self.stderr.write(f"No samples in {corpus}")
+            return
+
+        parser = get_parser()
+        checked = correct = 0
+        for path in samples:
+            text = path.read_text(encoding="utf-8")
+            expected_path = path.with_name(path.stem + ".expected.json")
+            if not expected_path.exists():
+                continue
+            expected = json.loads(expected_path.read_text(encoding="utf-8"))
+            got = parser.parse(text)
+            ok = 0
+            for field, want in expected.items():
+                have = _normalize(got.get(field))
+                if have == want:
+                    ok += 1
+                elif opts["verbose_fields"]:
+                    self.stdout.write(f"  {path.stem}.{field}: expected {want!r}, got {have!r}")
+            checked += len(expected)
+            correct += ok
+            self.stdout.write(f"{path.stem:<32} {ok}/{len(expected)} fields")
+
+        if checked:
+            self.stdout.write(self.style.SUCCESS(f"Accuracy: {correct}/{checked} = {100.0 * correct / checked:.1f}%"))
+
+        texts = ["\n".join([p.read_text(encoding="utf-8")] * opts["scale"]) for p in samples]
+        total_bytes = sum(len(t.encode("utf-8")) for t in texts) * opts["repeat"]
+        start = time.perf_counter()
+        for _ in range(opts["repeat"]):
+            for t in texts:
+                parser.parse(t)
+        elapsed = time.perf_counter() - start
+        docs = len(texts) * opts["repeat"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Throughput: {docs} docs in {elapsed:.3f}s = {docs / elapsed:,.0f} docs/s, "
+            f"{total_bytes / elapsed / 1e6:.2f} MB/s, {1e6 * elapsed / docs:.1f} µs/doc"
+        ))
@@ -0,0 +1,75 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# بيتشغل في process جديد عشان نقيس تحميل الـ worker من الصفر
+CHILD = r"""
+import json, os, sys, time
+started = time.perf_counter()
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+base = rss_mb()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns  # بيعمل import للـ views
+result = {"boot": time.perf_counter() - started, "rss": rss_mb(), "python_rss": base}
+if "warm-up" in sys.argv:
+    from core.services.warmup import warm_up
+    warm_up(pdf=False)
+if "pdf" in sys.argv:
+    from core.services import pdf, qr
+    pdf.preload(); qr.preload()
+result["total"] = time.perf_counter() - started
+result["total_rss"] = rss_mb()
+result["heavy"] = sorted(m for m in HEAVY if m in sys.modules)
+print(json.dumps(result))
+"""
+
+HEAVY = ("xhtml2pdf", "reportlab", "qrcode", "pdfplumber", "docx", "fitz", "openpyxl", "PIL.Image", "boto3", "pypdf")
+
+
+class Command(BaseCommand):
+    help = "قياس وقت تشغيل worker والذاكرة اللي بياخدها (import وقت الـ boot و RSS)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="fresh processes per scenario (median is reported)")
+
+    def _measure(self, *flags):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "unibooking.settings"))
+        code = f"HEAVY = {HEAVY!r}\n{CHILD}"
+        out = subprocess.run(
+            [sys.executable, "-c", code, *flags], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(out.strip().splitlines()[-1])
+
+    def handle(self, *args, **opts):
+        scenarios = [
+            ("worker boot", ()),
+            ("boot + warm-up", ("warm-up",)),
+            ("boot + pdf/qr libs", ("pdf",)),
+        ]
+        self.stdout.write(f"{'scenario':<20} {'time ms':>8} {'RSS MB':>8}   heavy modules loaded")
+        for label, flags in scenarios:
+            runs = [self._measure(*flags) for _ in range(opts["runs"])]
+            total = 1000 * statistics.median(r["total"] for r in runs)
+            rss = statistics.median(r["total_rss"] for r in runs)
+            heavy = ", ".join(runs[-1]["heavy"]) or "-"
+            self.stdout.write(f"{label:<20} {total:8.0f} {rss:8.1f}   {heavy}")
+        self.stdout.write(f"(bare interpreter: {statistics.median(r['python_rss'] for r in runs):.1f} MB)")
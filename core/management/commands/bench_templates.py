@@ -0,0 +1,90 @@
+import json
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from core.services.supplier_templates import get_registry
+from core.services.voucher_parser import get_parser
+
+DEFAULT_CORPUS = Path(__file__).resolve().parents[2] / "voucher_samples"
+
+
+def _normalize(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def _score(expected, got):
+    return sum(_normalize(got.get(f)) == want for f, want in expected.items())
+
+
+class Command(BaseCommand):
+    help = "قياس قوالب الموردين: أي قالب اتعرف لكل عينة، الدقة قبل/بعد القالب، وسرعة التعرف"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="folder of <name>.txt + <name>.expected.json")
+        parser.add_argument("--repeat", type=int, default=200, help="runs per sample for the timing")
+        parser.add_argument("--verbose-fields", action="store_true", help="print every mismatching field")
+
+    def handle(self, *args, **opts):
+        corpus = Path(opts["corpus"])
+        samples = sorted(corpus.glob("*.txt"))
+        if not samples:
+            self.stderr.write(f"No samples in {corpus}")
+            return
+
+        registry = get_registry()
+        parser = get_parser()
+        texts = [p.read_text(encoding="utf-8") for p in samples]
+        per_template = Counter()
+        checked = generic_ok = template_ok = 0
+
+        self.stdout.write(f"{'sample':<32} {'template':<14} generic  template")
+        for path, text in zip(samples, texts):
+            template = registry.match(text)
+            key = template.key if template else "-"
+            per_template[key] += 1
+            expected_path = path.with_name(path.stem + ".expected.json")
+            if not expected_path.exists():
+                self.stdout.write(f"{path.stem:<32} {key:<14} (no expected.json)")
+                continue
+            expected = json.loads(expected_path.read_text(encoding="utf-8"))
+            g = _score(expected, parser.parse(text))
+            got = registry.parse(text, template)
+            t = _score(expected, got)
+            checked += len(expected)
+            generic_ok += g
+            template_ok += t
+            self.stdout.write(f"{path.stem:<32} {key:<14} {g:>3}/{len(expected):<4} {t:>3}/{len(expected)}")
+            if opts["verbose_fields"]:
+                for field, want in expected.items():
+                    have = _normalize(got.get(field))
+                    if have != want:
+                        self.stdout.write(f"  {path.stem}.{field}: expected {want!r}, got {have!r}")
+
+        for t in registry.templates:
+            if not per_template[t.key]:
+                self.stdout.write(self.style.WARNING(f"Template {t.key!r} matched no sample"))
+        if checked:
+            self.stdout.write(self.style.SUCCESS(
+                f"Accuracy: generic {generic_ok}/{checked} = {100.0 * generic_ok / checked:.1f}%, "
+                f"with templates {template_ok}/{checked} = {100.0 * template_ok / checked:.1f}%"
+            ))
+
+        repeat = opts["repeat"]
+        docs = len(texts) * repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in texts:
+                registry.match(text)
+        match_s = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for text in texts:
+                registry.parse(text)
+        parse_s = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Fingerprint lookup: {1e6 * match_s / docs:.1f} µs/doc; "
+            f"lookup + parse: {1e6 * parse_s / docs:.1f} µs/doc ({docs / parse_s:,.0f} docs/s)"
+        ))
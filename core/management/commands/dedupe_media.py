@@ -0,0 +1,124 @@
+import os
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import StoredBlob
+from core.storage import BLOB_PREFIX, DERIVED_SUFFIXES, ContentAddressedMixin, blob_name, get_blob_storage, hash_content, is_blob
+
+
+def _walk(storage, path=""):
+    dirs, files = storage.listdir(path)
+    for f in files:
+        if f.endswith(DERIVED_SUFFIXES):
+            continue
+        yield f"{path}/{f}" if path else f
+    for d in dirs:
+        sub = f"{path}/{d}" if path else d
+        if sub == BLOB_PREFIX:
+            continue
+        yield from _walk(storage, sub)
+
+
+def _raw_delete(storage, name):
+    # من غير عدّاد المراجع: الملفات القديمة مش blobs
+    super(ContentAddressedMixin, storage).delete(name)
+
+
+def _references(storage):
+    """{name: [(model, field, pk), ...]} for every FileField on the blob storage."""
+    refs = defaultdict(list)
+    for model in apps.get_models():
+        fields = [f for f in model._meta.concrete_fields if getattr(f, "storage", None) is storage]
+        for field in fields:
+            rows = model._default_manager.exclude(**{field.attname: ""}).exclude(**{f"{field.attname}__isnull": True})
+            for pk, name in rows.values_list("pk", field.attname).iterator():
+                refs[name].append((model, field.attname, pk))
+    return refs
+
+
+class Command(BaseCommand):
+    help = "دمج الملفات المكررة في media/ في ملف واحد لكل محتوى (blobs/) وتحديث الحجوزات وعدّاد المراجع"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="report only, change nothing")
+        parser.add_argument("--delete-orphans", action="store_true",
+                            help="also delete unreferenced copies and blobs nobody points to")
+
+    def handle(self, *args, **opts):
+        storage = get_blob_storage()
+        dry = opts["dry_run"]
+        refs = _references(storage)
+
+        by_digest = defaultdict(list)
+        sizes = {}
+        for name in _walk(storage):
+            with storage.open(name, "rb") as fh:
+                digest, size = hash_content(fh)
+            by_digest[digest].append(name)
+            sizes[digest] = size
+
+        moved = removed = saved = 0
+        for digest, names in sorted(by_digest.items()):
+            referenced = [n for n in names if n in refs]
+            target = blob_name(digest, os.path.splitext(names[0])[1][:10])
+            if len(names) > 1:
+                self.stdout.write(f"{digest[:12]}  x{len(names)}  {sizes[digest]:>9,} B  {names[0]}")
+
+            if referenced:
+                moved += len(referenced)
+                saved += sizes[digest] * (len(referenced) - 1)
+                if not dry:
+                    if not storage.exists(target):
+                        with storage.open(referenced[0], "rb") as fh:
+                            storage._write_blob(fh, os.path.splitext(target)[1])
+                    with transaction.atomic():
+                        for n in referenced:
+                            for model, attname, pk in refs[n]:
+                                model._default_manager.filter(pk=pk).update(**{attname: target})
+                    for n in referenced:
+                        _raw_delete(storage, n)
+
+            # نسخ محدش بيشاور عليها: بتتمسح لو المحتوى محفوظ في blob، أو مع --delete-orphans
+            extra = [n for n in names if n not in refs]
+            if extra and (referenced or opts["delete_orphans"] or storage.exists(target)):
+                removed += len(extra)
+                saved += sizes[digest] * len(extra)
+                if not dry:
+                    for n in extra:
+                        _raw_delete(storage, n)
+
+        counted = self._recount(storage, dry, opts["delete_orphans"])
+        prefix = "[dry-run] " if dry else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {prefix}{moved} ملف اتنقل لـ blobs/، {removed} نسخة زيادة اتمسحت، "
+            f"وفرنا {saved / 1024 / 1024:.1f} MB، {counted} blob في العدّاد"
+        ))
+
+    def _recount(self, storage, dry, delete_orphans):
+        """العدّاد = عدد الصفوف اللي بتشاور على كل blob فعلًا."""
+        counts = defaultdict(int)
+        for name, rows in _references(storage).items():
+            if is_blob(name):
+                counts[name] += len(rows)
+        if dry:
+            return len(counts)
+        with transaction.atomic():
+            for name, count in counts.items():
+                if not storage.exists(name):
+                    self.stderr.write(f"Missing blob {name} ({count} references)")
+                    continue
+                digest = os.path.splitext(os.path.basename(name))[0]
+                StoredBlob.objects.update_or_create(
+                    name=name, defaults={"sha256": digest, "size": storage.size(name), "refcount": count}
+                )
+            stale = StoredBlob.objects.exclude(name__in=list(counts))
+            if delete_orphans:
+                for blob in stale:
+                    _raw_delete(storage, blob.name)
+                stale.delete()
+            else:
+                stale.update(refcount=0)
+        return len(counts)
@@ -0,0 +1,58 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+# الموديول ده بيتعمله import في عمليات spawn قبل django.setup()،
+# فمفيش import للموديلز هنا غير جوه الدوال.
+
+
+def _init_worker():
+    django.setup()
+
+
+def _process(job_id):
+    from core.services.ingest import process_job
+    try:
+        return process_job(job_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "تشغيل عمّال قراءة الفاوتشرات المرفوعة (VoucherIngestJob) خارج سيرفر الويب"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=getattr(settings, "VOUCHER_INGEST_WORKERS", 4))
+        parser.add_argument("--poll", type=float, default=2.0, help="seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="drain the queue once and exit")
+
+    def handle(self, *args, **opts):
+        from core.services.ingest import pending_job_ids, requeue_stale_jobs
+
+        workers = max(1, opts["workers"])
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+        # الاتصالات المفتوحة مينفعش تتورث للعمليات الجديدة
+        connections.close_all()
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker) as pool:
+            while True:
+                ids = pending_job_ids(limit=workers * 4)
+                connections.close_all()
+                if not ids:
+                    if opts["once"]:
+                        break
+                    time.sleep(opts["poll"])
+                    continue
+                statuses = list(pool.map(_process, ids))
+                self.stdout.write(
+                    f"Processed {len(ids)} job(s): "
+                    f"{statuses.count('done')} done, {statuses.count('failed')} failed"
+                )
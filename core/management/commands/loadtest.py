@@ -0,0 +1,265 @@
+import asyncio
+import base64
+import json
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+AGENT_PREFIX = "load_agent_"
+# ترتيب الخطوات في التقرير = ترتيبها في يوم الموظف
+STEPS = (
+    "login", "dashboard_search", "card_form", "card_create", "card_detail", "hotel_form", "hotel_create",
+    "payment_page", "payment_first", "payment_second", "voucher", "voucher_pdf", "reports",
+)
+PNG_1PX = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+PDF_STUB = b"%PDF-1.4\n1 0 obj<<>>endobj\ntrailer<<>>\n%%EOF\n"
+NAMES = ["Ahmed", "Mohamed", "Sara", "Mona", "Omar", "Youssef", "Nour", "Karim", "Hana", "Mahmoud"]
+HOTELS = ["Swissotel Makkah", "Pullman Zamzam", "Rixos Sharm", "Hilton Dubai Creek", "Titanic Beach Lara"]
+
+
+class _StepFailed(Exception):
+    pass
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+class _Stats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(Counter)
+
+    def report(self, elapsed):
+        steps = {}
+        for name in STEPS:
+            times, errors = self.latencies.get(name, []), self.errors.get(name, Counter())
+            total = len(times)
+            if not total:
+                continue
+            steps[name] = {
+                "count": total,
+                "errors": sum(errors.values()),
+                "error_rate": round(sum(errors.values()) / total, 4),
+                "rps": round(total / elapsed, 2),
+                "p50_ms": round(_percentile(times, 0.5) * 1000, 1),
+                "p95_ms": round(_percentile(times, 0.95) * 1000, 1),
+                "p99_ms": round(_percentile(times, 0.99) * 1000, 1),
+                "max_ms": round(max(times) * 1000, 1),
+                "error_kinds": dict(errors),
+            }
+        requests = sum(s["count"] for s in steps.values())
+        failed = sum(s["errors"] for s in steps.values())
+        return {
+            "duration_s": round(elapsed, 2),
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 2) if elapsed else 0,
+            "error_rate": round(failed / requests, 4) if requests else 0,
+            "steps": steps,
+        }
+
+
+class _Agent:
+    """One virtual agent: own cookies and connection, the same workflow as a person at the desk."""
+
+    def __init__(self, httpx, base_url, username, password, stats, rnd, think, timeout):
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=timeout, follow_redirects=False,
+                                        limits=httpx.Limits(max_connections=1))
+        self.http_error = httpx.HTTPError
+        self.username, self.password = username, password
+        self.stats, self.rnd, self.think = stats, rnd, think
+
+    async def _request(self, step, method, path, expect=200, location=None, **kwargs):
+        """Timed request; returns the response, or the regex match of the redirect target."""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            if method == "GET" and response.status_code == 200:
+                await response.aread()
+        except self.http_error as exc:
+            self.stats.latencies[step].append(time.perf_counter() - started)
+            self.stats.errors[step][type(exc).__name__] += 1
+            raise _StepFailed(step)
+        self.stats.latencies[step].append(time.perf_counter() - started)
+
+        if response.status_code != expect:
+            # 200 على POST = الفورم رجع بأخطاء
+            kind = "form rejected" if method == "POST" and response.status_code == 200 else f"HTTP {response.status_code}"
+            self.stats.errors[step][kind] += 1
+            raise _StepFailed(step)
+        if location:
+            match = re.search(location, response.headers.get("location", ""))
+            if not match:
+                self.stats.errors[step]["unexpected redirect"] += 1
+                raise _StepFailed(step)
+            return match
+        return response
+
+    def _csrf(self):
+        return self.client.cookies.get("csrftoken", "")
+
+    async def _pause(self):
+        if self.think:
+            await asyncio.sleep(self.rnd.uniform(0, 2 * self.think))
+
+    async def login(self):
+        await self._request("login", "GET", "/login/")  # كوكي الـ csrf
+        await self._request("login", "POST", "/login/", expect=302, location=r".*", data={
+            "username": self.username, "password": self.password, "csrfmiddlewaretoken": self._csrf(),
+        })
+
+    async def workday(self):
+        rnd = self.rnd
+        await self._request("dashboard_search", "GET", "/", params={"q": rnd.choice(NAMES)[:3]})
+        await self._pause()
+
+        await self._request("card_form", "GET", "/cards/create/")
+        card = await self._request("card_create", "POST", "/cards/create/", expect=302, location=r"/cards/(\d+)/", data={
+            "csrfmiddlewaretoken": self._csrf(), "customer_name": f"{rnd.choice(NAMES)} {rnd.randint(1, 9999)}",
+            "mobile": f"010{rnd.randint(10_000_000, 99_999_999)}", "nationality": "Egyptian", "country": "Egypt",
+        })
+        card_pk = card.group(1)
+        await self._request("card_detail", "GET", f"/cards/{card_pk}/")
+        await self._pause()
+
+        checkin = date.today() + timedelta(days=rnd.randint(30, 90))
+        rooms = rnd.choices([1, 2, 3], [70, 22, 8])[0]
+        data = {
+            "csrfmiddlewaretoken": self._csrf(), "booking_ref": f"LT{rnd.randint(100000, 999999)}",
+            "hotel_name": rnd.choice(HOTELS), "hotel_address": "Main street", "country": "Saudi Arabia",
+            "room_type": "Double Room", "meal_plan": "BB", "provider_name": "DARINA HOLIDAYS",
+            "checkin": checkin.isoformat(), "checkout": (checkin + timedelta(days=rnd.randint(2, 10))).isoformat(),
+            "rooms_count": rooms, "cancellation_policy": "non_refundable",
+            "rooms-TOTAL_FORMS": rooms, "rooms-INITIAL_FORMS": 0, "rooms-MIN_NUM_FORMS": 0, "rooms-MAX_NUM_FORMS": 1000,
+        }
+        for i in range(rooms):
+            data[f"rooms-{i}-guest_names"] = f"{rnd.choice(NAMES)}, {rnd.choice(NAMES)}"
+        await self._request("hotel_form", "GET", f"/cards/{card_pk}/hotel/create/")
+        booking = await self._request("hotel_create", "POST", f"/cards/{card_pk}/hotel/create/", expect=302,
+                                      location=r"/hotel/(\d+)/payment/", data=data)
+        booking_pk = booking.group(1)
+        payment_url = f"/hotel/{booking_pk}/payment/"
+        await self._pause()
+
+        # دفعة أولى (نص المبلغ + ميعاد القسط) وبعدها الباقي
+        sell = rnd.randint(1000, 5000)
+        first = sell // 2
+        await self._request("payment_page", "GET", payment_url)
+        await self._request("payment_first", "POST", payment_url, expect=302, location=r"/payment/", data={
+            "csrfmiddlewaretoken": self._csrf(), "net_price": int(sell * 0.85), "sell_price": sell,
+            "paid_amount": first, "method": "bank", "installment_date": (checkin - timedelta(days=7)).isoformat(),
+        }, files={
+            "bank_file": ("receipt.png", PNG_1PX, "image/png"),
+            "invoice_file": ("invoice.pdf", PDF_STUB, "application/pdf"),
+            "voucher_original": ("voucher.pdf", PDF_STUB, "application/pdf"),
+        })
+        await self._pause()
+        await self._request("payment_second", "POST", payment_url, expect=302, location=r"/payment/", data={
+            "csrfmiddlewaretoken": self._csrf(), "paid_amount": sell - first, "method": "cash",
+        }, files={"bank_file": ("receipt.png", PNG_1PX, "image/png")})
+        await self._pause()
+
+        await self._request("voucher", "GET", f"/hotel/{booking_pk}/voucher/")
+        await self._request("voucher_pdf", "GET", f"/hotel/{booking_pk}/voucher/pdf/")
+        await self._pause()
+        await self._request("reports", "GET", "/reports/", params={"kind": rnd.choice(["", "hotel"])})
+
+    async def run(self, iterations, deadline, delay):
+        await asyncio.sleep(delay)
+        try:
+            try:
+                await self.login()
+            except _StepFailed:
+                return
+            done = 0
+            while done < iterations and time.monotonic() < deadline:
+                try:
+                    await self.workday()
+                except _StepFailed:
+                    pass  # الغلطة اتسجلت؛ الموظف بيبدأ من الأول
+                done += 1
+        finally:
+            await self.client.aclose()
+
+
+class Command(BaseCommand):
+    help = "اختبار ضغط: موظفين افتراضيين متوازيين (asyncio + httpx) على سيرفر gunicorn شغال محلياً"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of the running server")
+        parser.add_argument("--agents", type=int, default=10, help="concurrent virtual agents")
+        parser.add_argument("--iterations", type=int, default=3, help="workflows per agent")
+        parser.add_argument("--duration", type=float, default=0, help="stop starting new workflows after N seconds")
+        parser.add_argument("--ramp-up", type=float, default=5, help="seconds over which agents start")
+        parser.add_argument("--think", type=float, default=0.2, help="mean think time between steps (seconds)")
+        parser.add_argument("--timeout", type=float, default=60)
+        parser.add_argument("--password", default="load-test-pass")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--output", help="write the JSON report here as well")
+        parser.add_argument("--cleanup", action="store_true", help="delete the load_agent_* users and their data after the run")
+
+    def handle(self, *args, **opts):
+        try:
+            import httpx
+        except ImportError:
+            raise CommandError("loadtest needs httpx: pip install -r requirements-dev.txt")
+
+        usernames = self._agents(opts["agents"], opts["password"])
+        self.stderr.write(f"{len(usernames)} agents → {opts['url']} "
+                          f"({opts['iterations']} workflows each, ramp-up {opts['ramp_up']}s)")
+        stats = _Stats()
+        started = time.monotonic()
+        deadline = started + opts["duration"] if opts["duration"] else float("inf")
+
+        async def main():
+            agents = [
+                _Agent(httpx, opts["url"], name, opts["password"], stats, random.Random(opts["seed"] + i),
+                       opts["think"], opts["timeout"])
+                for i, name in enumerate(usernames)
+            ]
+            step = opts["ramp_up"] / max(1, len(agents))
+            await asyncio.gather(*(a.run(opts["iterations"], deadline, i * step) for i, a in enumerate(agents)))
+
+        try:
+            asyncio.run(main())
+        finally:
+            report = stats.report(time.monotonic() - started)
+            report["config"] = {k: opts[k] for k in ("url", "agents", "iterations", "duration", "ramp_up", "think", "seed")}
+            self._print(report)
+            if opts["output"]:
+                with open(opts["output"], "w", encoding="utf-8") as fh:
+                    json.dump(report, fh, indent=2, ensure_ascii=False)
+            if opts["cleanup"]:
+                deleted, _ = User.objects.filter(username__startswith=AGENT_PREFIX).delete()
+                self.stderr.write(f"Cleanup: {deleted} rows deleted")
+
+    def _agents(self, n, password):
+        # hash واحد لكل الموظفين بدل set_password لكل واحد
+        hashed = make_password(password)
+        names = [f"{AGENT_PREFIX}{i:03d}" for i in range(n)]
+        existing = set(User.objects.filter(username__in=names).values_list("username", flat=True))
+        User.objects.bulk_create([User(username=u, password=hashed, first_name="Load", last_name=u[-3:])
+                                  for u in names if u not in existing])
+        User.objects.filter(username__in=existing).update(password=hashed, is_active=True)
+        return names
+
+    def _print(self, report):
+        self.stdout.write(f"{'step':<18}{'count':>7}{'err%':>7}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}  errors")
+        for name, s in report["steps"].items():
+            errors = ", ".join(f"{k}: {v}" for k, v in s["error_kinds"].items())
+            self.stdout.write(f"{name:<18}{s['count']:>7}{s['error_rate'] * 100:>6.1f}%{s['rps']:>8.1f}"
+                              f"{s['p50_ms']:>8.0f}ms{s['p95_ms']:>7.0f}ms{s['p99_ms']:>7.0f}ms  {errors}")
+        style = self.style.SUCCESS if not report["error_rate"] else self.style.WARNING
+        self.stdout.write(style(
+            f"{report['requests']} requests in {report['duration_s']}s = {report['throughput_rps']} req/s, "
+            f"error rate {report['error_rate'] * 100:.2f}%"
+        ))
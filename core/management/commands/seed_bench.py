@@ -0,0 +1,194 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.models import FlightBooking, HotelBooking, Payment, Room, TransferBooking, UniBookingCard, VisaBooking
+
+BENCH_PREFIX = "bench_agent_"
+
+FIRST_NAMES = ["Ahmed", "Mohamed", "Mahmoud", "Omar", "Youssef", "Mona", "Sara", "Nour", "Hana", "Karim",
+               "محمد", "أحمد", "مصطفى", "فاطمة", "مريم", "خالد", "علي", "ريم", "ياسمين", "حسن"]
+LAST_NAMES = ["Hassan", "Ali", "Ibrahim", "Mostafa", "Saleh", "El Sayed", "Fathy", "عبدالله", "السيد", "الخميس"]
+# (الدولة، الوزن): أغلب الحجوزات عمرة ومصايف
+COUNTRIES = [("Saudi Arabia", 40), ("Egypt", 25), ("UAE", 12), ("Turkey", 10), ("Jordan", 5),
+             ("Malaysia", 4), ("Georgia", 4)]
+HOTELS = {
+    "Saudi Arabia": ["Swissotel Makkah", "Pullman Zamzam", "Hilton Suites Makkah", "Anwar Al Madinah Movenpick"],
+    "Egypt": ["Steigenberger Al Dau", "Rixos Sharm", "Marriott Mena House", "Albatros Palace"],
+    "UAE": ["Rove Downtown", "Atlantis The Palm", "Hilton Dubai Creek"],
+    "Turkey": ["Hilton Istanbul Bomonti", "Titanic Beach Lara"],
+    "Jordan": ["Kempinski Aqaba", "Movenpick Dead Sea"],
+    "Malaysia": ["Grand Hyatt Kuala Lumpur"],
+    "Georgia": ["Radisson Blu Batumi"],
+}
+ROOM_TYPES = ["Double Room", "Triple Room", "Quad Room", "Deluxe King", "Family Suite"]
+MEAL_PLANS = ["RO", "BB", "HB", "FB", "AI"]
+PROVIDERS = ["DARINA HOLIDAYS", "Hotelbeds", "WebBeds", "Expedia TAAP"]
+AIRLINES = ["EgyptAir", "Saudia", "Flynas", "Emirates", "Turkish Airlines", "Air Arabia"]
+VISA_TYPES = ["Umrah", "Tourist", "Business", "Transit"]
+NATIONALITIES = ["Egyptian", "Saudi", "Jordanian", "Sudanese", "Syrian"]
+
+
+@contextmanager
+def _manual_timestamps(*models):
+    # bulk_create بيحط created_at = دلوقتي؛ هنا عايزين التواريخ موزعة على السنة
+    fields = [f for m in models for f in m._meta.concrete_fields if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = "توليد بيانات تجريبية بحجم الإنتاج (موظفين وكروت وحجوزات ودفعات) لقياس الأداء"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cards", type=int, default=1000, help="customer cards to add")
+        parser.add_argument("--users", type=int, default=20, help="agents (reused if they already exist)")
+        parser.add_argument("--days", type=int, default=365, help="spread created_at over the last N days")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--batch", type=int, default=2000, help="bulk_create batch size")
+        parser.add_argument("--clear", action="store_true", help="delete previously seeded data first")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        if opts["clear"]:
+            self._clear()
+        rnd = random.Random(opts["seed"] + UniBookingCard.objects.count())
+        users = self._users(opts["users"])
+        # قلة من الموظفين بيعملوا أغلب الحجوزات
+        activity = [rnd.paretovariate(1.5) for _ in users]
+        now = timezone.now()
+
+        with transaction.atomic(), _manual_timestamps(UniBookingCard, HotelBooking, FlightBooking, TransferBooking, VisaBooking, Payment):
+            counts = self._seed(rnd, users, activity, now, opts)
+        summary = ", ".join(f"{n} {name}" for name, n in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"✅ Seeded {summary} in {time.perf_counter() - started:.1f}s"))
+
+    def _users(self, n):
+        existing = {u.username: u for u in User.objects.filter(username__startswith=BENCH_PREFIX)}
+        missing = [User(username=f"{BENCH_PREFIX}{i:03d}", first_name=f"Agent {i}")
+                   for i in range(n) if f"{BENCH_PREFIX}{i:03d}" not in existing]
+        User.objects.bulk_create(missing)
+        return list(User.objects.filter(username__startswith=BENCH_PREFIX).order_by("id")[:n])
+
+    def _clear(self):
+        # الداتا المولدة مفيهاش ملفات، فالمسح المباشر أسرع بكتير من delete() بالـ signals
+        cards = UniBookingCard.objects.filter(created_by__username__startswith=BENCH_PREFIX)
+        for qs in (
+            Room.objects.filter(hotel_booking__card__in=cards),
+            Payment.objects.filter(booking_hotel__card__in=cards),
+            HotelBooking.objects.filter(card__in=cards),
+            FlightBooking.objects.filter(card__in=cards),
+            TransferBooking.objects.filter(card__in=cards),
+            VisaBooking.objects.filter(card__in=cards),
+            cards,
+        ):
+            qs._raw_delete(qs.db)
+        User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+
+    def _seed(self, rnd, users, activity, now, opts):
+        batch, days = opts["batch"], opts["days"]
+        # آخر id مش العدد: العدد بيقل بعد المسح فالأكواد تتكرر
+        offset = (UniBookingCard.objects.aggregate(last=Max("id"))["last"] or 0) + 1
+        countries, weights = zip(*COUNTRIES)
+
+        def when():
+            # أحدث = أكتر (البيزنس بيكبر) + شوية ضوضاء
+            return now - timedelta(days=days * (1 - rnd.random() ** 0.6), minutes=rnd.randint(0, 1439))
+
+        def money(mean):
+            net = Decimal(str(round(rnd.lognormvariate(0, 0.6) * mean, 2)))
+            return net, (net * Decimal(str(round(rnd.uniform(1.06, 1.3), 3)))).quantize(Decimal("0.01"))
+
+        cards = []
+        for i in range(opts["cards"]):
+            created = when()
+            cards.append(UniBookingCard(
+                customer_name=f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}",
+                mobile=f"01{rnd.choice('0125')}{rnd.randint(10_000_000, 99_999_999)}",
+                nationality=rnd.choice(NATIONALITIES),
+                country=rnd.choices(countries, weights)[0],
+                ub_code=f"UBENCH{offset + i:08d}",
+                created_by=rnd.choices(users, activity)[0],
+                created_at=created, updated_at=created,
+            ))
+        UniBookingCard.objects.bulk_create(cards, batch_size=batch)
+
+        hotels, flights, transfers, visas = [], [], [], []
+        for card in cards:
+            agent = card.created_by.get_full_name() or card.created_by.username
+            for _ in range(rnd.choices([0, 1, 2, 3, 5], [15, 50, 20, 10, 5])[0]):
+                country = rnd.choices(countries, weights)[0]
+                checkin = (card.created_at + timedelta(days=rnd.randint(3, 90))).date()
+                nights = rnd.choices([2, 3, 4, 5, 7, 10, 14], [10, 20, 20, 15, 20, 10, 5])[0]
+                net, sell = money(4000 * nights / 4)
+                n = len(hotels)
+                hotels.append(HotelBooking(
+                    card=card, booking_ref=f"B{offset:05d}{n:07d}", voucher_code=f"HBENCH{offset:06d}{n:07d}",
+                    employee_name=agent, hotel_name=rnd.choice(HOTELS[country]), country=country,
+                    room_type=rnd.choice(ROOM_TYPES), meal_plan=rnd.choice(MEAL_PLANS),
+                    provider_name=rnd.choice(PROVIDERS), checkin=checkin, checkout=checkin + timedelta(days=nights),
+                    nights=nights, rooms_count=rnd.choices([1, 2, 3], [70, 22, 8])[0], net=net, sell=sell,
+                    created_at=card.created_at, updated_at=card.created_at,
+                ))
+            for _ in range(rnd.choices([0, 1, 2], [55, 35, 10])[0]):
+                net, sell = money(6000)
+                n = len(flights)
+                pnr = "".join(rnd.choices("ABCDEFGHJKLMNPQRSTUVWXYZ23456789", k=6))
+                flights.append(FlightBooking(
+                    card=card, booking_code=f"FBENCH{offset:06d}{n:07d}{pnr}", airline=rnd.choice(AIRLINES), pnr=pnr,
+                    net_price=net, sell_price=sell, payment_method=rnd.choice(["cash", "bank", "link"]),
+                    created_at=card.created_at, updated_at=card.created_at,
+                ))
+            for _ in range(rnd.choices([0, 1, 2], [60, 30, 10])[0]):
+                n = len(transfers)
+                transfers.append(TransferBooking(
+                    card=card, booking_ref=f"T{offset:05d}{n:07d}", voucher_code=f"TBENCH{offset:06d}{n:07d}",
+                    employee_name=agent, pickup="Airport", dropoff=rnd.choice(sum(HOTELS.values(), [])),
+                    date=(card.created_at + timedelta(days=rnd.randint(3, 90))).date(),
+                    created_at=card.created_at, updated_at=card.created_at,
+                ))
+            if rnd.random() < 0.3:
+                n = len(visas)
+                visas.append(VisaBooking(
+                    card=card, booking_ref=f"V{offset:05d}{n:07d}", voucher_code=f"VBENCH{offset:06d}{n:07d}",
+                    employee_name=agent, visa_type=rnd.choices(VISA_TYPES, [50, 30, 15, 5])[0],
+                    nationality=card.nationality, created_at=card.created_at, updated_at=card.created_at,
+                ))
+        for model, rows in ((HotelBooking, hotels), (FlightBooking, flights), (TransferBooking, transfers), (VisaBooking, visas)):
+            model.objects.bulk_create(rows, batch_size=batch)
+
+        rooms, payments = [], []
+        for hb in hotels:
+            for r in range(hb.rooms_count):
+                guests = rnd.choices([1, 2, 3, 4], [10, 55, 25, 10])[0]
+                rooms.append(Room(hotel_booking=hb, guest_names=", ".join(
+                    f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}" for _ in range(guests))))
+            # دفعة واحدة غالباً، وأحياناً أقساط، وشوية لسه مدفعوش
+            parts = rnd.choices([0, 1, 2, 3], [10, 60, 20, 10])[0]
+            paid_share = Decimal(str(rnd.choice([1, 1, 1, 0.5, 0.8])))
+            for p in range(parts):
+                method = "installment" if parts > 1 else rnd.choice(["cash", "bank", "bank", "link"])
+                payments.append(Payment(
+                    booking_hotel=hb, employee_name=hb.employee_name, net_price=hb.net, sell_price=hb.sell,
+                    paid_amount=(hb.sell * paid_share / parts).quantize(Decimal("0.01")), method=method,
+                    installment_date=hb.checkin if method == "installment" else None,
+                    created_at=hb.created_at + timedelta(days=p * 7),
+                ))
+        Room.objects.bulk_create(rooms, batch_size=batch)
+        Payment.objects.bulk_create(payments, batch_size=batch)
+        return {"users": len(users), "cards": len(cards), "hotels": len(hotels), "rooms": len(rooms),
+                "payments": len(payments), "flights": len(flights), "transfers": len(transfers), "visas": len(visas)}
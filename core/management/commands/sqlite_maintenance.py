@@ -0,0 +1,53 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.signals import set_journal_mode
+
+
+class Command(BaseCommand):
+    help = (
+        "صيانة SQLite: journal_mode من SQLITE_JOURNAL_MODE و PRAGMA optimize و ANALYZE و WAL checkpoint. "
+        "شغّله من cron كل ساعة، أو خليه شغال بـ --interval"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--analyze", action="store_true", help="full ANALYZE (slower than PRAGMA optimize)")
+        parser.add_argument("--checkpoint", default="TRUNCATE", choices=["PASSIVE", "FULL", "RESTART", "TRUNCATE"])
+        parser.add_argument("--interval", type=int, default=0, help="repeat every N seconds instead of running once")
+
+    def handle(self, *args, **opts):
+        conn = connections[opts["database"]]
+        if conn.vendor != "sqlite":
+            raise CommandError(f"{opts['database']} is {conn.vendor}, not SQLite")
+
+        while True:
+            self._run_once(conn, opts)
+            if not opts["interval"]:
+                break
+            conn.close()
+            time.sleep(opts["interval"])
+
+    def _wal_size(self, conn):
+        path = f"{conn.settings_dict['NAME']}-wal"
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _run_once(self, conn, opts):
+        started = time.perf_counter()
+        wal_before = self._wal_size(conn)
+        mode = set_journal_mode(conn)  # بيكتب في الملف بس لو SQLITE_JOURNAL_MODE اتغير
+        with conn.cursor() as cursor:
+            if opts["analyze"]:
+                cursor.execute("ANALYZE")
+            cursor.execute("PRAGMA optimize")
+            cursor.execute(f"PRAGMA wal_checkpoint({opts['checkpoint']})")
+            busy, log_frames, checkpointed = cursor.fetchone()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {time.strftime('%Y-%m-%d %H:%M:%S')} journal {mode}, optimize{' + analyze' if opts['analyze'] else ''}, "
+            f"checkpoint {opts['checkpoint']}: {checkpointed}/{log_frames} frames"
+            f"{' (busy)' if busy else ''}, WAL {wal_before / 1024:.0f} KB → {self._wal_size(conn) / 1024:.0f} KB "
+            f"in {1000 * (time.perf_counter() - started):.0f} ms"
+        ))
@@ -0,0 +1,297 @@
+# core/metrics.py
+"""
+A small Prometheus-compatible metrics registry, served as text at ``/metrics``.
+
+gunicorn workers are separate processes, so each one keeps its numbers in
+memory and dumps them to ``METRICS_DIR/<pid>.json`` (at most once per
+``METRICS_FLUSH_SECONDS``). ``/metrics`` adds up every file plus the serving
+process's live values. When a worker exits (``max_requests`` recycles them)
+the master folds its file into ``dead.json`` and deletes it, so counters never
+go backwards and the directory does not grow with every recycled worker.
+``gunicorn_common.py`` empties the directory when the master starts.
+Without ``METRICS_DIR`` everything stays in the current process.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+ROW_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+# request.method بييجي من الـ client؛ أي method تانية بتتجمع تحت "other" عشان الـ labels تفضل محدودة
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "CONNECT", "TRACE"))
+DEAD_FILE = "dead.json"
+
+
+def _merge(total, values):
+    for name, rows in values.items():
+        target = total.setdefault(name, {})
+        for key, row in rows.items():
+            if key in target and len(target[key]) == len(row):
+                target[key] = [a + b for a, b in zip(target[key], row)]
+            else:
+                target.setdefault(key, row)
+    return total
+
+
+class _Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._values = {}  # name -> {labels json: [bucket counts..., +Inf, sum, count]}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_flush = 0.0
+        self._timer = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def _check_pid(self):
+        # بعد الـ fork (preload_app) الأرقام بتاعة الـ master مش بتاعتنا
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._values = self._read(self._file(pid)) or {}
+            self._timer = None  # الثريدات مش بتعدي الـ fork
+
+    def add(self, name, key, delta):
+        with self._lock:
+            self._check_pid()
+            row = self._values.setdefault(name, {}).get(key)
+            if row is None:
+                row = self._values[name][key] = [0] * len(delta)
+            for i, d in enumerate(delta):
+                row[i] += d
+        self._maybe_flush()
+
+    # ---------- multiprocess ----------
+    def _dir(self):
+        path = getattr(settings, "METRICS_DIR", None)
+        return Path(path) if path else None
+
+    def _file(self, pid):
+        d = self._dir()
+        return d / f"{pid}.json" if d else None
+
+    @staticmethod
+    def _read(path):
+        if path is None or not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _maybe_flush(self):
+        if self._dir() is None:
+            return
+        wait = getattr(settings, "METRICS_FLUSH_SECONDS", 1) - (time.monotonic() - self._last_flush)
+        if wait <= 0:
+            self.flush()
+            return
+        # worker هادي لازم برضه يكتب آخر أرقامه، فـ timer واحد بيكتب بعد المدة
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(wait, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_flush(self):
+        with self._lock:
+            self._timer = None
+        self.flush()
+
+    def flush(self):
+        path = self._file(os.getpid())
+        if path is None:
+            return
+        with self._lock:
+            self._check_pid()
+            if not self._values:
+                return  # الـ master (atexit) مبيسجلش requests
+            data = json.dumps(self._values)
+            self._last_flush = time.monotonic()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(data)
+            os.replace(tmp, path)  # اللي بيقرا مايشوفش ملف نصه مكتوب
+        except OSError:
+            logger.warning("Could not write metrics to %s", path, exc_info=True)
+
+    @contextmanager
+    def _dir_lock(self, d, exclusive=False):
+        # retire() بيكتب dead.json ويمسح ملف الـ worker: اللي بيقرا مايشوفش الاتنين ولا ولا واحد
+        d.mkdir(parents=True, exist_ok=True)
+        with open(d / ".lock", "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def snapshot(self):
+        """Values of every process, summed."""
+        with self._lock:
+            self._check_pid()
+            own = json.loads(json.dumps(self._values))
+        d = self._dir()
+        if not d or not d.exists():
+            return own
+        with self._dir_lock(d):
+            for path in d.glob("*.json"):
+                if path.stem != str(os.getpid()):
+                    _merge(own, self._read(path) or {})
+        return own
+
+    def retire(self, pid):
+        """Fold a dead worker's file into dead.json and delete it (gunicorn ``child_exit``)."""
+        d = self._dir()
+        path = self._file(pid)
+        if path is None or not path.exists():
+            return
+        with self._dir_lock(d, exclusive=True):
+            values = self._read(path)
+            if values:
+                dead = d / DEAD_FILE
+                tmp = dead.with_suffix(".tmp")
+                tmp.write_text(json.dumps(_merge(self._read(dead) or {}, values)))
+                os.replace(tmp, dead)
+            path.unlink(missing_ok=True)
+
+    def reset_dir(self):
+        d = self._dir()
+        if d and d.exists():
+            for path in d.glob("*.json"):
+                path.unlink(missing_ok=True)
+
+
+REGISTRY = _Registry()
+atexit.register(REGISTRY.flush)
+
+
+def _key(labelnames, labels):
+    return json.dumps([str(labels.get(n, "")) for n in labelnames])
+
+
+def _label_str(labelnames, key, extra=()):
+    pairs = [*zip(labelnames, json.loads(key)), *extra]
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+
+def _fmt(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        REGISTRY.register(self)
+
+    def observe(self, value, **labels):
+        # عدد القيم في كل bucket لوحده؛ الـ render بيجمعها (cumulative) زي Prometheus
+        delta = [0] * len(self.buckets) + [1, value, 1]  # ... +Inf, sum, count
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                delta[i] = 1
+                delta[-3] = 0
+                break
+        REGISTRY.add(self.name, _key(self.labelnames, labels), delta)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self, rows):
+        for key, row in sorted(rows.items()):
+            cumulative = 0
+            for bound, n in zip((*self.buckets, "+Inf"), row):
+                cumulative += n
+                le = bound if bound == "+Inf" else _fmt(float(bound))
+                yield f"{self.name}_bucket{_label_str(self.labelnames, key, [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_label_str(self.labelnames, key)} {_fmt(float(row[-2]))}"
+            yield f"{self.name}_count{_label_str(self.labelnames, key)} {row[-1]}"
+
+
+def render_text():
+    """Prometheus text exposition format (version 0.0.4)."""
+    values = REGISTRY.snapshot()
+    lines = []
+    for name, metric in sorted(REGISTRY.metrics.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(metric.render(values.get(name, {})))
+    return "\n".join(lines) + "\n"
+
+
+# ===================== Metrics =====================
+REQUEST_SECONDS = Histogram(
+    "unibooking_request_duration_seconds", "Request latency by URL name.", ["view", "method"],
+)
+PDF_RENDER_SECONDS = Histogram(
+    "unibooking_pdf_render_seconds", "xhtml2pdf render time by template.", ["template"],
+)
+QR_SECONDS = Histogram(
+    "unibooking_qr_generate_seconds", "Time to build one voucher QR code.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+VOUCHER_SECONDS = Histogram(
+    "unibooking_voucher_read_seconds", "Uploaded voucher text extraction and parsing time.", ["stage", "type"],
+)
+EXPORT_ROWS = Histogram(
+    "unibooking_export_rows", "Rows written per export.", ["format"], buckets=ROW_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """Latency histogram per URL name (unmatched URLs are grouped under one label)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, time.perf_counter() - started)
+        return response
+
+    def _observe(self, request, elapsed):
+        match = getattr(request, "resolver_match", None)
+        # اسم الرابط مش الـ path: الـ path فيه أرقام والـ labels لازم تبقى محدودة
+        view = (match.url_name or match.view_name) if match else "<unmatched>"
+        method = request.method if request.method in HTTP_METHODS else "other"
+        REQUEST_SECONDS.observe(elapsed, view=view or "<unnamed>", method=method)
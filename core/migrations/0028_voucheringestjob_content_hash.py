@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_voucheringestjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voucheringestjob',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='voucheringestjob',
+            name='is_duplicate',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:41
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_voucheringestjob_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.BigIntegerField(default=0)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='flightbooking',
+            name='invoice_file',
+            field=models.FileField(blank=True, null=True, storage=core.storage.get_blob_storage, upload_to='invoices/flights/'),
+        ),
+        migrations.AlterField(
+            model_name='flightbooking',
+            name='payment_file',
+            field=models.FileField(blank=True, null=True, storage=core.storage.get_blob_storage, upload_to='payments/flights/'),
+        ),
+        migrations.AlterField(
+            model_name='flightbooking',
+            name='voucher_file',
+            field=models.FileField(blank=True, null=True, storage=core.storage.get_blob_storage, upload_to='vouchers/flights/'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='bank_file',
+            field=models.FileField(blank=True, null=True, storage=core.storage.get_blob_storage, upload_to='payments/banks/'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='invoice_file',
+            field=models.FileField(blank=True, null=True, storage=core.storage.get_blob_storage, upload_to='payments/invoices/'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='voucher_original',
+            field=models.FileField(blank=True, null=True, storage=core.storage.get_blob_storage, upload_to='payments/vouchers/'),
+        ),
+        migrations.AlterField(
+            model_name='voucheringestjob',
+            name='file',
+            field=models.FileField(storage=core.storage.get_blob_storage, upload_to='vouchers/ingest/'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 05:46
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_stored_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='bank_file_original',
+            field=models.FileField(blank=True, editable=False, null=True, storage=core.storage.get_blob_storage, upload_to='payments/banks/'),
+        ),
+    ]
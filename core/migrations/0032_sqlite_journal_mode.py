@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def set_journal_mode(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "sqlite" or connection.is_in_memory_db():
+        return
+    from core.signals import set_journal_mode as apply
+
+    apply(connection)
+
+
+class Migration(migrations.Migration):
+    # PRAGMA journal_mode = wal مينفعش جوه transaction
+    atomic = False
+
+    dependencies = [
+        ("core", "0031_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(set_journal_mode, migrations.RunPython.noop, elidable=True),
+    ]
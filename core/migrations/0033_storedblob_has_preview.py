@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # المعاينات اللي اتعملت قبل الحقل ده: manage.py backfill_previews
+    dependencies = [
+        ("core", "0032_sqlite_journal_mode"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="storedblob",
+            name="has_preview",
+            field=models.BooleanField(default=False),
+        ),
+    ]
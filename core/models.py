@@ -10,6 +10,8 @@ from django.utils import timezone
 import datetime
 from django.db import models, transaction
 
+from .storage import get_blob_storage
+
 
 
 
@@ -21,6 +23,7 @@ class VoucherMixin(models.Model):
     voucher_code = models.CharField(max_length=100, blank=True, null=True, unique=True)
     employee_name = models.CharField(max_length=255, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # ETag/Last-Modified للفاوتشر (الغرف والدفعات بتلمسه من signals)
 
     class Meta:
         abstract = True
@@ -45,6 +48,7 @@ class UniBookingCard(models.Model):
     ub_code = models.CharField(max_length=50, unique=True, editable=False)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # بيتلمس مع أي تعديل في حجوزاته أو دفعاته
 
     def generate_unique_code(self):
         today_str = date.today().strftime("%Y%m%d")
@@ -134,6 +138,9 @@ class HotelBooking(VoucherMixin, models.Model):
 
     @property
     def total_paid(self):
+        # card_detail بيعمل annotate بـ paid_sum بدل استعلام لكل حجز
+        if 'paid_sum' in self.__dict__:
+            return self.paid_sum
         return self.payments.aggregate(total=Sum('paid_amount'))['total'] or Decimal('0.00')
 
     @property
@@ -179,13 +186,14 @@ class FlightBooking(models.Model):
         ("link", "رابط دفع"),
     ]
     payment_method = models.CharField(max_length=20, choices=PAYMENT_CHOICES, blank=True, null=True)
-    payment_file   = models.FileField(upload_to="payments/flights/", blank=True, null=True)
+    payment_file   = models.FileField(upload_to="payments/flights/", storage=get_blob_storage, blank=True, null=True)
     payment_link   = models.URLField(blank=True, null=True)
 
-    invoice_file = models.FileField(upload_to="invoices/flights/", blank=True, null=True)
-    voucher_file = models.FileField(upload_to="vouchers/flights/", blank=True, null=True)
+    invoice_file = models.FileField(upload_to="invoices/flights/", storage=get_blob_storage, blank=True, null=True)
+    voucher_file = models.FileField(upload_to="vouchers/flights/", storage=get_blob_storage, blank=True, null=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     @property
     def profit(self):
@@ -214,9 +222,10 @@ class Payment(models.Model):
     method = models.CharField(max_length=50, choices=METHODS)
     installment_date = models.DateField(null=True, blank=True)
     payment_link = models.URLField(null=True, blank=True)
-    bank_file = models.FileField(upload_to="payments/banks/", null=True, blank=True)
-    invoice_file = models.FileField(upload_to="payments/invoices/", null=True, blank=True)
-    voucher_original = models.FileField(upload_to="payments/vouchers/", null=True, blank=True)
+    bank_file = models.FileField(upload_to="payments/banks/", storage=get_blob_storage, null=True, blank=True)
+    bank_file_original = models.FileField(upload_to="payments/banks/", storage=get_blob_storage, null=True, blank=True, editable=False)  # قبل الضغط (RECEIPT_KEEP_ORIGINAL)
+    invoice_file = models.FileField(upload_to="payments/invoices/", storage=get_blob_storage, null=True, blank=True)
+    voucher_original = models.FileField(upload_to="payments/vouchers/", storage=get_blob_storage, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     @property
@@ -248,3 +257,60 @@ class VisaBooking(VoucherMixin, models.Model):
 
     def __str__(self):
         return f"Visa: {self.visa_type} ({self.voucher_code})"
+
+
+# ==============================
+# VOUCHER INGESTION (رفع فاوتشرات الموردين)
+# ==============================
+class VoucherIngestJob(models.Model):
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "في الانتظار"),
+        (STATUS_RUNNING, "جاري القراءة"),
+        (STATUS_DONE, "جاهز للمراجعة"),
+        (STATUS_FAILED, "فشل"),
+    ]
+
+    file = models.FileField(upload_to="vouchers/ingest/", storage=get_blob_storage)
+    original_name = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64, blank=True, default="", db_index=True)  # sha256 للملف
+    is_duplicate = models.BooleanField(default=False)
+    card = models.ForeignKey(UniBookingCard, on_delete=models.SET_NULL, null=True, blank=True, related_name="ingest_jobs")
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="ingest_jobs")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    text = models.TextField(blank=True, default="")
+    result = models.JSONField(blank=True, default=dict)
+    error = models.TextField(blank=True, default="")
+    booking = models.ForeignKey(HotelBooking, on_delete=models.SET_NULL, null=True, blank=True, related_name="ingest_jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+
+    @property
+    def needs_review(self):
+        return self.status == self.STATUS_DONE and self.booking_id is None
+
+    def __str__(self):
+        return f"{self.original_name} ({self.get_status_display()})"
+
+
+# ==============================
+# STORED FILES (كل ملف متخزن مرة واحدة بالـ sha256)
+# ==============================
+class StoredBlob(models.Model):
+    name = models.CharField(max_length=255, unique=True)  # blobs/ab/cd/<sha256>.pdf
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+    has_preview = models.BooleanField(default=False)  # <name>.preview.webp جاهز (services/previews.py)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} (x{self.refcount})"
@@ -0,0 +1,267 @@
+# core/profiling.py
+"""
+On-demand profile of a single request, for superusers only, when
+``PROFILING`` is on (off by default).
+
+Add ``?_profile=1`` to the URL (or send ``X-Profile: 1``) and the request runs
+under cProfile, a stack sampler and tracemalloc. ``_profile=cpu`` skips
+tracemalloc (it slows everything down a lot), ``_profile=mem`` only traces
+memory. Each run is saved under ``PROFILE_DIR/<name>/``:
+
+* ``profile.prof``    - cProfile stats (``python -m pstats``, snakeviz)
+* ``profile.txt``     - the same, top functions by cumulative time
+* ``stacks.folded``   - sampled stacks in collapsed format (flamegraph.pl, speedscope)
+* ``allocations.txt`` - peak memory and the lines that allocated most
+* ``meta.json``       - URL, status, timings, query count
+
+Only the newest ``PROFILE_KEEP`` runs are kept. One profiled request at a time
+per process: cProfile and tracemalloc are global, so a second one is served
+without profiling.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentation import current_stats
+
+PARAM = "_profile"
+HEADER = "X-Profile"
+FILES = {
+    "profile.prof": "application/octet-stream",
+    "profile.txt": "text/plain; charset=utf-8",
+    "stacks.folded": "text/plain; charset=utf-8",
+    "allocations.txt": "text/plain; charset=utf-8",
+}
+TOP_FUNCTIONS = 80
+TOP_ALLOCATIONS = 40
+
+_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _dir():
+    return Path(_setting("PROFILE_DIR", Path(settings.BASE_DIR) / "var" / "profiles"))
+
+
+def _mode(request):
+    if not _setting("PROFILING", False):
+        return None
+    flag = request.GET.get(PARAM) or request.headers.get(HEADER)
+    if not flag or flag == "0" or not request.user.is_superuser:
+        return None
+    return flag if flag in ("cpu", "mem") else "all"
+
+
+def _collapse(frame, root):
+    # من فوق لتحت: module:function;module:function ... (صيغة flamegraph.pl)
+    names = []
+    while frame is not None and frame is not root:
+        # co_qualname من Python 3.11 بس (runtime.txt = 3.10)
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class _Sampler(threading.Thread):
+    """Every ``interval`` seconds, record the request thread's stack."""
+
+    def __init__(self, thread_id, root, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id, self.root, self.interval = thread_id, root, interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame, self.root)] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class _Session:
+    def __init__(self, mode, root):
+        self.mode = mode
+        self.cpu = mode in ("all", "cpu")
+        self.mem = mode in ("all", "mem")
+        self.profiler = cProfile.Profile() if self.cpu else None
+        self.sampler = _Sampler(threading.get_ident(), root, _setting("PROFILE_SAMPLE_MS", 5) / 1000) if self.cpu else None
+        self.own_tracing = False
+        self.snapshot = None
+        self.memory = (0, 0)
+
+    def start(self):
+        if self.mem:
+            # لو فيه حد تاني شغّل tracemalloc (أمر bench مثلاً) مانقفلوش في الآخر
+            self.own_tracing = not tracemalloc.is_tracing()
+            if self.own_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        self.queries = current_stats()
+        self.queries_before = self.queries.count if self.queries else 0
+        self.wall, self.cpu_time = time.perf_counter(), time.thread_time()
+        if self.cpu:
+            self.sampler.start()
+            self.profiler.enable()
+
+    def stop(self):
+        if self.cpu:
+            self.profiler.disable()
+            self.sampler.stop()
+        self.wall = time.perf_counter() - self.wall
+        self.cpu_time = time.thread_time() - self.cpu_time
+        if self.mem:
+            self.memory = tracemalloc.get_traced_memory()
+            self.snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ])
+            if self.own_tracing:
+                tracemalloc.stop()
+
+    def save(self, request, response):
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else None
+        slug = re.sub(r"[^A-Za-z0-9_-]+", "-", view or request.path).strip("-")[:40] or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{slug}-{secrets.token_hex(2)}"
+        path = _dir() / name
+        path.mkdir(parents=True, exist_ok=True)
+
+        if self.cpu:
+            self.profiler.dump_stats(path / "profile.prof")
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            (path / "profile.txt").write_text(out.getvalue(), encoding="utf-8")
+            (path / "stacks.folded").write_text(
+                "".join(f"{stack} {n}\n" for stack, n in self.sampler.stacks.most_common() if stack), encoding="utf-8",
+            )
+        if self.mem:
+            current, peak = self.memory
+            lines = [f"peak {peak / 1024:.1f} KiB, still allocated at the end {current / 1024:.1f} KiB", ""]
+            lines += [str(s) for s in self.snapshot.statistics("lineno")[:TOP_ALLOCATIONS]]
+            (path / "allocations.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        meta = {
+            "name": name,
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "method": request.method,
+            "path": request.get_full_path(),
+            "view": view,
+            "user": request.user.get_username(),
+            "status": response.status_code,
+            "mode": self.mode,
+            "wall_ms": round(self.wall * 1000, 1),
+            "cpu_ms": round(self.cpu_time * 1000, 1),
+            "queries": (self.queries.count - self.queries_before) if self.queries else None,
+            "samples": sum(self.sampler.stacks.values()) if self.cpu else None,
+            "peak_kb": round(self.memory[1] / 1024, 1) if self.mem else None,
+        }
+        (path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+        _prune()
+        return name
+
+
+def _prune():
+    # الأسماء بتبدأ بالتاريخ، فالترتيب بالاسم = الترتيب بالوقت
+    keep = _setting("PROFILE_KEEP", 50)
+    runs = sorted((p for p in _dir().iterdir() if p.is_dir()), key=lambda p: p.name, reverse=True)
+    for old in runs[keep:]:
+        shutil.rmtree(old, ignore_errors=True)  # worker تاني ممكن يكون مسحه
+
+
+def _drain(response):
+    # التصدير بيـ stream بعد ما الـ middleware يخلص؛ نبنيه جوه البروفايل
+    if getattr(response, "streaming", False) and not getattr(response, "is_async", False):
+        response.streaming_content = list(response.streaming_content)
+
+
+def recent_profiles():
+    d = _dir()
+    if not d.exists():
+        return []
+    runs = []
+    for path in sorted((p for p in d.iterdir() if p.is_dir()), key=lambda p: p.name, reverse=True):
+        try:
+            meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue  # لسه بيتكتب أو اتمسح
+        meta["files"] = [f for f in FILES if (path / f).exists()]
+        runs.append(meta)
+    return runs
+
+
+def profile_file(name, filename):
+    if filename not in FILES or not re.fullmatch(r"[\w-]+", name):
+        return None
+    path = _dir() / name / filename
+    return path if path.is_file() else None
+
+
+class ProfileMiddleware:
+    """Profile one request when a superuser asks for it (``?_profile=1`` / ``X-Profile: 1``)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = _mode(request)
+        if mode is None or not _lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            session = _Session(mode, sys._getframe())
+            session.start()
+            try:
+                response = self.get_response(request)
+                _drain(response)
+            finally:
+                session.stop()
+            response["X-Profile-Id"] = session.save(request, response)
+            return response
+        finally:
+            _lock.release()
+
+    async def __acall__(self, request):
+        mode = _mode(request)
+        if mode is None or not _lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            # تحت ASGI الـ event loop بيخدم طلبات تانية في نفس الوقت وبتظهر في البروفايل
+            session = _Session(mode, None)
+            session.start()
+            try:
+                response = await self.get_response(request)
+            finally:
+                session.stop()
+            response["X-Profile-Id"] = session.save(request, response)
+            return response
+        finally:
+            _lock.release()
@@ -0,0 +1,146 @@
+# core/services/extraction.py
+"""
+Text extraction for uploaded vouchers.
+
+PDFs go through a backend: PyMuPDF (fast, C) by default and pdfplumber (pure
+Python layout analysis) only when the caller asks for layout fidelity, e.g.
+because the fast text was missing fields that live in tables. Only the first
+``VOUCHER_MAX_PAGES`` pages are read; supplier vouchers put the booking data
+on page 1-2 and the rest is terms and conditions.
+"""
+import io
+
+from django.conf import settings
+
+SUPPORTED_EXTENSIONS = ("pdf", "docx")
+
+
+def file_extension(name: str) -> str:
+    return (name.rsplit(".", 1)[-1] if "." in name else "").lower()
+
+
+def read_bytes(fobj) -> bytes:
+    if hasattr(fobj, "seek"):
+        fobj.seek(0)
+    if hasattr(fobj, "chunks"):
+        return b"".join(fobj.chunks())
+    return fobj.read()
+
+
+# ===================== PDF backends =====================
+
+class PdfBackend:
+    name = ""
+
+    def available(self) -> bool:
+        raise NotImplementedError
+
+    def extract(self, data: bytes, max_pages=None) -> str:
+        raise NotImplementedError
+
+
+class PyMuPDFBackend(PdfBackend):
+    name = "pymupdf"
+
+    def available(self):
+        try:
+            import fitz  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def extract(self, data, max_pages=None):
+        import fitz
+
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            stop = doc.page_count if max_pages is None else min(max_pages, doc.page_count)
+            return "\n".join(doc[i].get_text("text") for i in range(stop))
+
+
+class PdfPlumberBackend(PdfBackend):
+    name = "pdfplumber"
+
+    def available(self):
+        try:
+            import pdfplumber  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def extract(self, data, max_pages=None):
+        import pdfplumber
+
+        with pdfplumber.open(io.BytesIO(data)) as pdf:
+            pages = pdf.pages if max_pages is None else pdf.pages[:max_pages]
+            return "\n".join([p.extract_text() or "" for p in pages])
+
+
+PDF_BACKENDS = {b.name: b for b in (PyMuPDFBackend(), PdfPlumberBackend())}
+
+
+def get_pdf_backend(layout: bool = False) -> PdfBackend:
+    order = ["pdfplumber", "pymupdf"] if layout else [getattr(settings, "VOUCHER_PDF_BACKEND", "pymupdf"), "pdfplumber"]
+    for name in order:
+        backend = PDF_BACKENDS.get(name)
+        if backend and backend.available():
+            return backend
+    raise RuntimeError("No PDF text backend installed (PyMuPDF or pdfplumber).")
+
+
+def extract_text_from_pdf(fobj, layout: bool = False, max_pages=None):
+    if max_pages is None:
+        max_pages = getattr(settings, "VOUCHER_MAX_PAGES", None)
+    return get_pdf_backend(layout).extract(read_bytes(fobj), max_pages)
+
+
+# ===================== DOCX =====================
+
+def _docx_blocks(container):
+    """سطور الفقرات والجداول بنفس ترتيبها في الملف (الجداول المتداخلة كمان)."""
+    for block in container.iter_inner_content():
+        if hasattr(block, "rows"):
+            for row in block.rows:
+                cells, seen = [], set()
+                for cell in row.cells:
+                    # الخلية المدموجة بتتكرر في كل عمود بتغطيه
+                    if id(cell._tc) in seen:
+                        continue
+                    seen.add(id(cell._tc))
+                    text = "\n".join(_docx_blocks(cell)).strip()
+                    if text:
+                        cells.append(text)
+                if cells:
+                    yield "\t".join(cells)
+        elif block.text:
+            yield block.text
+
+
+def _docx_lines(doc):
+    sections = doc.sections
+    for section in sections:
+        if not section.header.is_linked_to_previous:
+            yield from _docx_blocks(section.header)
+    yield from _docx_blocks(doc)
+    for section in sections:
+        if not section.footer.is_linked_to_previous:
+            yield from _docx_blocks(section.footer)
+
+
+def extract_text_from_docx(fobj):
+    from docx import Document
+
+    # python-docx بيقرا من أي stream فيه seek، من غير ملف مؤقت
+    if hasattr(fobj, "seek"):
+        fobj.seek(0)
+    stream = fobj if hasattr(fobj, "seekable") and fobj.seekable() else io.BytesIO(read_bytes(fobj))
+    return "\n".join(_docx_lines(Document(stream)))
+
+
+def extract_text(fobj, name: str, layout: bool = False):
+    """نص الملف حسب الامتداد، أو None لو الامتداد مش مدعوم."""
+    ext = file_extension(name)
+    if ext == "pdf":
+        return extract_text_from_pdf(fobj, layout=layout)
+    if ext == "docx":
+        return extract_text_from_docx(fobj)
+    return None
@@ -0,0 +1,113 @@
+# core/services/images.py
+"""
+Re-encoding of oversized receipt photos.
+
+Bank receipts are usually multi-megabyte phone photos. After the payment is
+saved, a worker re-encodes ``Payment.bank_file`` so that it is at most
+``RECEIPT_MAX_PX`` on the long side and, where possible, under
+``RECEIPT_MAX_BYTES``. EXIF (GPS, device) and other metadata are dropped;
+the orientation is applied to the pixels first so the photo stays upright.
+The original blob is kept in ``bank_file_original`` only when
+``RECEIPT_KEEP_ORIGINAL`` is on.
+"""
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+from .extraction import file_extension
+from .workers import submit_on_commit
+
+logger = logging.getLogger(__name__)
+
+RECOMPRESS_EXTENSIONS = ("jpg", "jpeg", "png")
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def supports(name: str) -> bool:
+    return file_extension(name or "") in RECOMPRESS_EXTENSIONS
+
+
+def recompress(data: bytes, name: str):
+    """Return ``(bytes, ext)`` of the smaller re-encoded image, or None to keep the upload as is."""
+    from PIL import Image, ImageOps
+
+    max_px = _setting("RECEIPT_MAX_PX", 2000)
+    max_bytes = _setting("RECEIPT_MAX_BYTES", 600 * 1024)
+    quality = _setting("RECEIPT_JPEG_QUALITY", 82)
+
+    with Image.open(io.BytesIO(data)) as img:
+        if len(data) <= max_bytes and max(img.size) <= max_px:
+            return None
+        img.draft("RGB", (max_px, max_px))  # JPEG: فك الضغط بمقاس أصغر على طول
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_px, max_px), Image.Resampling.LANCZOS)
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+
+        out = io.BytesIO()
+        if file_extension(name) == "png" and has_alpha:
+            img.save(out, format="PNG", optimize=True)
+            ext = "png"
+        else:
+            # صورة موبايل = JPEG حتى لو اترفعت PNG
+            img = img.convert("RGB")
+            ext = "jpg"
+            for q in (quality, quality - 10, quality - 20):
+                out = io.BytesIO()
+                img.save(out, format="JPEG", quality=q, optimize=True, progressive=True)
+                if out.tell() <= max_bytes:
+                    break
+    result = out.getvalue()
+    return (result, ext) if len(result) < len(data) else None
+
+
+def process_payment_receipt(payment_id: int, name: str):
+    from ..models import Payment
+    from . import previews
+
+    payment = Payment.objects.filter(pk=payment_id).only("bank_file").first()
+    if payment is None or payment.bank_file.name != name:
+        return None  # الإيصال اتغير أو الدفعة اتمسحت
+    storage = payment.bank_file.storage
+    try:
+        with storage.open(name, "rb") as fh:
+            result = recompress(fh.read(), name)
+    except Exception:
+        logger.exception("Recompressing receipt %s of payment %s failed", name, payment_id)
+        result = None
+    if result is None:
+        previews.schedule(payment.bank_file)
+        return name
+
+    data, ext = result
+    new_name = storage.save(f"receipt.{ext}", ContentFile(data))
+    keep = _setting("RECEIPT_KEEP_ORIGINAL", False)
+    fields = {"bank_file": new_name}
+    previous_original = None
+    if keep:
+        fields["bank_file_original"] = name
+        previous_original = Payment.objects.filter(pk=payment_id).values_list("bank_file_original", flat=True).first()
+    # update مشروط: لو حد غيّر الإيصال في النص منلمسش الجديد
+    if not Payment.objects.filter(pk=payment_id, bank_file=name).update(**fields):
+        storage.delete(new_name)
+        return None
+    if not keep:
+        storage.delete(name)
+    elif previous_original:
+        storage.delete(previous_original)
+
+    payment.bank_file.name = new_name
+    previews.schedule(payment.bank_file)
+    return new_name
+
+
+def queue_receipt(payment) -> bool:
+    f = payment.bank_file
+    if not f or not supports(f.name):
+        return False
+    submit_on_commit("uploads", process_payment_receipt, payment.pk, f.name)
+    return True
@@ -0,0 +1,194 @@
+# core/services/ingest.py
+"""
+Voucher ingestion: every uploaded file becomes a ``VoucherIngestJob`` that a
+worker extracts and parses outside the request. Parsed jobs wait on the review
+queue until an agent turns them into a hotel booking.
+"""
+import io
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..metrics import VOUCHER_SECONDS
+from ..models import StoredBlob, VoucherIngestJob
+from . import ocr, upload_cache
+from .extraction import extract_text, file_extension
+from .supplier_templates import get_registry
+from .workers import submit_on_commit
+
+logger = logging.getLogger(__name__)
+
+# الحقول اللي بتتنقل من نتيجة القراءة لفورم الفندق
+BOOKING_FIELDS = (
+    "booking_ref", "voucher_code", "hotel_name", "hotel_address", "country",
+    "room_type", "meal_plan", "provider_name", "checkin", "checkout", "rooms_count",
+)
+
+
+# لو الحقول دي ناقصة من القراءة السريعة نعيد القراءة بـ pdfplumber (layout)
+LAYOUT_FIELDS = ("hotel_name", "checkin", "checkout")
+
+
+VoucherRead = namedtuple("VoucherRead", "text data digest duplicate")
+
+
+def _json_safe(data: dict) -> dict:
+    return {k: (v.isoformat() if hasattr(v, "isoformat") else v) for k, v in data.items()}
+
+
+def _file_type(name: str) -> str:
+    # label للمقاييس: الامتدادات اللي بنقراها بس، عشان الأسماء المرفوعة متعملش labels لا نهائية
+    ext = file_extension(name)
+    return ext if ext in ("pdf", "docx", "jpg", "jpeg", "png", "webp", "tif", "tiff") else "other"
+
+
+def _extract(raw: bytes, name: str, digest: str):
+    with VOUCHER_SECONDS.time(stage="extract", type=_file_type(name)):
+        text = extract_text(io.BytesIO(raw), name)
+    if not (text or "").strip() and ocr.supports(name):
+        # فاوتشر متصوّر (صورة أو PDF من غير طبقة نص)
+        with VOUCHER_SECONDS.time(stage="ocr", type=_file_type(name)):
+            text = ocr.ocr_bytes(raw, name, digest=digest)
+    return text if (text or "").strip() else None
+
+
+def _parse(text: str, raw: bytes, name: str) -> dict:
+    with VOUCHER_SECONDS.time(stage="parse", type=_file_type(name)):
+        return _parse_fields(text, raw, name)
+
+
+def _parse_fields(text: str, raw: bytes, name: str) -> dict:
+    registry = get_registry()
+    template = registry.match(text)
+    data = registry.parse(text, template)
+    if file_extension(name) == "pdf" and any(data.get(f) is None for f in LAYOUT_FIELDS):
+        layout_text = extract_text(io.BytesIO(raw), name, layout=True)
+        for k, v in registry.parse(layout_text or "", template).items():
+            if data.get(k) is None and v is not None:
+                data[k] = v
+    return _json_safe(data)
+
+
+def read_voucher(fobj, name: str, digest: str = None) -> VoucherRead:
+    """
+    Extract and parse one voucher. The upload is hashed while it is read and
+    the result is cached under that hash, so a repeated upload returns the
+    earlier result at once with ``duplicate=True``. ``text`` is None when
+    nothing could be read. Dates in ``data`` are ISO strings.
+    """
+    registry = get_registry()
+    raw = None
+    if digest is None:
+        raw, digest = upload_cache.read_and_hash(fobj)
+
+    cached = upload_cache.get(digest)
+    if cached and cached.get("parser") == registry.fingerprint:
+        return VoucherRead(cached["text"], cached["data"], digest, True)
+
+    if raw is None:
+        raw, _ = upload_cache.read_and_hash(fobj)
+    # النص المتخزن لسه صالح حتى لو قواعد القراءة اتغيرت
+    text = cached["text"] if cached else _extract(raw, name, digest)
+    if not text:
+        return VoucherRead(None, None, digest, bool(cached))
+    data = _parse(text, raw, name)
+    upload_cache.put(digest, {"name": name, "text": text, "data": data, "parser": registry.fingerprint})
+    return VoucherRead(text, data, digest, bool(cached))
+
+
+def _discard_blobs(names):
+    # بعد rollback: الـ blob اللي ملوش صف StoredBlob محدش بيشاور عليه
+    storage = VoucherIngestJob._meta.get_field("file").storage
+    for name in names:
+        if not StoredBlob.objects.filter(name=name).exists():
+            storage.delete(name)
+
+
+def create_jobs(files, user, card=None):
+    jobs = []
+    try:
+        with transaction.atomic():
+            _create_jobs(files, user, card, jobs)
+    except Exception:
+        # الملفات اتكتبت على الـ storage والصفوف اترجعت
+        _discard_blobs(job.file.name for job in jobs if job.file)
+        raise
+    return jobs
+
+
+def _create_jobs(files, user, card, jobs):
+    for f in files:
+        upload = upload_cache.HashingFile(f, name=f.name)
+        job = VoucherIngestJob(original_name=f.name[:255], created_by=user, card=card)
+        jobs.append(job)
+        job.file.save(f.name, upload, save=False)
+        job.content_hash = upload.hexdigest()
+        job.is_duplicate = VoucherIngestJob.objects.filter(content_hash=job.content_hash).exists()
+
+        cached = upload_cache.get(job.content_hash)
+        if cached and cached.get("parser") == get_registry().fingerprint:
+            # نفس الملف اتقرا قبل كده: النتيجة جاهزة من غير عامل
+            job.is_duplicate = True
+            job.text, job.result = cached["text"], cached["data"]
+            job.status = VoucherIngestJob.STATUS_DONE
+            job.finished_at = timezone.now()
+        job.save()
+
+    if getattr(settings, "VOUCHER_INGEST_INLINE", False):
+        for job in jobs:
+            if job.status == VoucherIngestJob.STATUS_PENDING:
+                submit_on_commit("ingest", process_job, job.pk)
+
+
+def claim_job(job_id: int) -> bool:
+    # update مشروط = قفل بسيط يشتغل على SQLite و Postgres
+    return VoucherIngestJob.objects.filter(pk=job_id, status=VoucherIngestJob.STATUS_PENDING).update(
+        status=VoucherIngestJob.STATUS_RUNNING, started_at=timezone.now()
+    ) == 1
+
+
+def process_job(job_id: int) -> str:
+    if not claim_job(job_id):
+        return "skipped"
+    job = VoucherIngestJob.objects.get(pk=job_id)
+    try:
+        with job.file.open("rb") as fh:
+            read = read_voucher(fh, job.original_name, digest=job.content_hash or None)
+        if not read.text:
+            raise ValueError("ملف غير مدعوم أو لا يحتوي على نص")
+        job.text = read.text
+        job.result = read.data
+        job.content_hash = read.digest
+        job.is_duplicate = job.is_duplicate or read.duplicate
+        job.status = VoucherIngestJob.STATUS_DONE
+        job.error = ""
+    except Exception as e:
+        logger.exception("Voucher ingest job %s failed", job_id)
+        job.status = VoucherIngestJob.STATUS_FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=["text", "result", "status", "error", "finished_at", "content_hash", "is_duplicate"])
+    return job.status
+
+
+def pending_job_ids(limit: int):
+    return list(
+        VoucherIngestJob.objects.filter(status=VoucherIngestJob.STATUS_PENDING)
+        .order_by("created_at").values_list("pk", flat=True)[:limit]
+    )
+
+
+def requeue_stale_jobs(minutes: int = 15) -> int:
+    cutoff = timezone.now() - timedelta(minutes=minutes)
+    return VoucherIngestJob.objects.filter(
+        status=VoucherIngestJob.STATUS_RUNNING, started_at__lt=cutoff
+    ).update(status=VoucherIngestJob.STATUS_PENDING, started_at=None)
+
+
+def booking_initial(job) -> dict:
+    data = job.result or {}
+    return {k: data[k] for k in BOOKING_FIELDS if data.get(k) not in (None, "")}
@@ -0,0 +1,121 @@
+# core/services/media.py
+"""
+Serving uploaded files after the permission check.
+
+Django only decides *whether* a user may see a file. The bytes are sent by
+the front proxy: nginx via ``X-Accel-Redirect`` or Apache/lighttpd via
+``X-Sendfile`` (``MEDIA_SENDFILE``), or S3 through a signed redirect. Without
+a proxy (runserver) ``FileResponse`` is used, with single-range support so PDF
+viewers and resumed downloads still work.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+
+from ..models import FlightBooking, Payment, VoucherIngestJob
+from ..storage import is_blob
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _file_q(name, *fields):
+    q = Q()
+    for f in fields:
+        q |= Q(**{f: name})
+    return q
+
+
+def file_owners(name: str):
+    """(card ids, uploader ids) of every row that points at ``name``."""
+    cards, users = set(), set()
+    cards.update(Payment.objects.filter(
+        _file_q(name, "bank_file", "bank_file_original", "invoice_file", "voucher_original")
+    ).values_list("booking_hotel__card_id", flat=True))
+    cards.update(FlightBooking.objects.filter(
+        _file_q(name, "payment_file", "invoice_file", "voucher_file")
+    ).values_list("card_id", flat=True))
+    for card_id, user_id in VoucherIngestJob.objects.filter(file=name).values_list("card_id", "created_by_id"):
+        if card_id:
+            cards.add(card_id)
+        users.add(user_id)
+    cards.discard(None)
+    return cards, users
+
+
+def cache_control(name: str) -> str:
+    # ملفات blobs/ اسمها هو الـ hash بتاعها، فمحتواها مبيتغيرش أبدًا
+    return "private, max-age=31536000, immutable" if is_blob(name) else "private, max-age=3600"
+
+
+def _accel_response(name, content_type):
+    mode = getattr(settings, "MEDIA_SENDFILE", "")
+    resp = HttpResponse(content_type=content_type)
+    if mode == "nginx":
+        resp["X-Accel-Redirect"] = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/") + quote(name)
+    else:
+        resp["X-Sendfile"] = os.path.join(str(settings.MEDIA_ROOT), name)
+    return resp
+
+
+def _range_response(request, storage, name, content_type):
+    size = storage.size(name)
+    fh = storage.open(name, "rb")
+    m = _RANGE.match(request.headers.get("Range", "").strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        resp = FileResponse(fh, content_type=content_type)
+        resp["Accept-Ranges"] = "bytes"
+        return resp
+
+    if m.group(1):
+        start = int(m.group(1))
+        end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    else:  # bytes=-500 = آخر 500 بايت
+        start, end = max(size - int(m.group(2)), 0), size - 1
+    if start > end or start >= size:
+        fh.close()
+        resp = HttpResponse(status=416)
+        resp["Content-Range"] = f"bytes */{size}"
+        return resp
+
+    fh.seek(start)
+    remaining = end - start + 1
+
+    def stream(chunk=64 * 1024):
+        nonlocal remaining
+        try:
+            while remaining > 0:
+                data = fh.read(min(chunk, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+        finally:
+            fh.close()
+
+    resp = StreamingHttpResponse(stream(), status=206, content_type=content_type)
+    resp["Content-Range"] = f"bytes {start}-{end}/{size}"
+    resp["Content-Length"] = str(end - start + 1)
+    resp["Accept-Ranges"] = "bytes"
+    return resp
+
+
+def serve(request, storage, name: str, content_type: str = None):
+    content_type = content_type or mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if getattr(settings, "USE_S3", False):
+        # S3 بيدي رابط موقّع لوقت محدود، والتحميل بيروح مباشرة من الـ bucket
+        resp = HttpResponseRedirect(storage.url(name))
+    elif getattr(settings, "MEDIA_SENDFILE", ""):
+        resp = _accel_response(name, content_type)
+    else:
+        resp = _range_response(request, storage, name, content_type)
+    resp["Cache-Control"] = cache_control(name)
+    resp["X-Content-Type-Options"] = "nosniff"
+    if not content_type.startswith(("image/", "application/pdf")):
+        # HTML أو ملفات تانية مرفوعة متتفتحش جوه الموقع
+        resp["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(os.path.basename(name))}"
+    return resp
@@ -0,0 +1,170 @@
+# core/services/ocr.py
+"""
+OCR fallback for scanned vouchers (images, or PDFs without a text layer).
+
+Pages are rasterized with PyMuPDF and recognised by tesseract in a small,
+low-priority process pool so OCR never competes with web workers for CPU.
+Both the rendered page and its text are cached on disk under the file's
+SHA-256, so retrying a parse does not repeat either step.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ("jpg", "jpeg", "png", "webp", "tif", "tiff", "bmp")
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_available() -> bool:
+    try:
+        import pytesseract
+    except ImportError:
+        return False
+    return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+
+# ===================== Pool =====================
+
+def _init_ocr_worker(niceness):
+    # أولوية أقل من عمّال الويب
+    if niceness and hasattr(os, "nice"):
+        os.nice(niceness)
+
+
+def _get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = _setting("OCR_MAX_WORKERS", 2)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_ocr_worker,
+                initargs=(_setting("OCR_NICE", 10),),
+            )
+            # عدد الصفحات المسموح تستنى في الطابور في نفس الوقت
+            _slots = threading.BoundedSemaphore(workers * _setting("OCR_QUEUE_PER_WORKER", 4))
+        return _pool
+
+
+def _recognise(png_path: str, lang: str, timeout: float) -> str:
+    import pytesseract
+    from PIL import Image
+
+    with Image.open(png_path) as img:
+        return pytesseract.image_to_string(img, lang=lang, timeout=timeout)
+
+
+# ===================== Cache =====================
+
+def _cache_dir(digest: str) -> Path:
+    path = _cache_root() / digest[:2] / digest
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _rasterize(data: bytes, ext: str, digest: str, max_pages: int):
+    """Render pages to PNG (cached) and return their paths."""
+    import fitz
+
+    dpi = _setting("OCR_DPI", 200)
+    folder = _cache_dir(digest)
+    count_file = folder / "page-count"
+
+    def wanted(page_count):
+        return [folder / f"page-{i:03d}-{dpi}.png" for i in range(min(max_pages, page_count))]
+
+    if count_file.exists():
+        paths = wanted(int(count_file.read_text()))
+        if all(p.exists() for p in paths):
+            return paths
+
+    # أول مرة، أو الكاش ناقص (العامل وقع في النص أو الـ prune مسح صفحات): نرسم الناقص بس
+    filetype = "pdf" if ext == "pdf" else ext
+    with fitz.open(stream=data, filetype=filetype) as doc:
+        paths = wanted(doc.page_count)
+        for i, out in enumerate(paths):
+            if out.exists():
+                continue
+            tmp = out.with_suffix(".tmp")
+            doc[i].get_pixmap(dpi=dpi).save(str(tmp), output="png")
+            os.replace(tmp, out)
+            _note_write(out.stat().st_size)
+        count_file.write_text(str(doc.page_count))
+    return paths
+
+
+def _page_text(png: Path, lang: str, timeout: float) -> str:
+    txt_path = png.with_name(png.stem + f".{lang}.txt")
+    if txt_path.exists():
+        return txt_path.read_text(encoding="utf-8")
+
+    # جوه عامل ingest (عملية فرعية بالفعل) بنشغّل tesseract مباشرة
+    if multiprocessing.parent_process() is not None:
+        text = _recognise(str(png), lang, timeout)
+    else:
+        pool = _get_pool()
+        if not _slots.acquire(timeout=timeout):
+            raise TimeoutError("OCR queue is full")
+        try:
+            text = pool.submit(_recognise, str(png), lang, timeout).result(timeout=timeout + 5)
+        finally:
+            _slots.release()
+    txt_path.write_text(text, encoding="utf-8")
+    _note_write(txt_path.stat().st_size)
+    return text
+
+
+# ===================== Public =====================
+
+def supports(name: str) -> bool:
+    ext = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+    return ext == "pdf" or ext in IMAGE_EXTENSIONS
+
+
+def ocr_bytes(data: bytes, name: str, digest: str = None) -> str:
+    """نص الصفحات بالـ OCR؛ بيرجع "" لو tesseract مش متسطب أو الصفحة خدت وقت أكتر من اللازم."""
+    if not is_available():
+        logger.warning("OCR requested for %s but tesseract is not installed", name)
+        return ""
+
+    ext = name.rsplit(".", 1)[-1].lower()
+    digest = digest or hashlib.sha256(data).hexdigest()
+    lang = _setting("OCR_LANG", "eng")
+    timeout = _setting("OCR_PAGE_TIMEOUT", 30)
+    pages = _rasterize(data, ext, digest, _setting("VOUCHER_MAX_PAGES", 3) or 3)
+
+    texts = []
+    for png in pages:
+        try:
+            texts.append(_page_text(png, lang, timeout))
+        except (FutureTimeout, TimeoutError, RuntimeError) as e:
+            # pytesseract بيرمي RuntimeError لما يخلص الـ timeout
+            logger.warning("OCR of %s page %s skipped: %s", name, png.name, e)
+    return "\n".join(texts)
+
+
+def _cache_root() -> Path:
+    return Path(_setting("OCR_CACHE_DIR", Path(settings.BASE_DIR) / "var" / "ocr"))
+
+
+def _note_write(size: int):
+    from .upload_cache import note_write
+
+    note_write(_cache_root(), _setting("OCR_CACHE_MAX_BYTES", 500 * 1024 * 1024), size)
@@ -0,0 +1,75 @@
+# core/services/payments.py
+"""
+Hotel booking payments: the paid sum is read once per request and a new
+payment is validated and written while the booking row is locked.
+
+``record_payment`` takes ``select_for_update`` on the booking, so two agents
+paying the same booking at the same moment are handled one after the other and
+the second one is validated against the first one's payment (on PostgreSQL /
+MySQL; SQLite has no row locks and serialises writers instead).
+"""
+from collections import namedtuple
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.shortcuts import get_object_or_404
+
+from ..models import HotelBooking
+
+PaymentResult = namedtuple("PaymentResult", "booking summary form payment")
+
+
+@dataclass(frozen=True)
+class PaymentSummary:
+    sell: Decimal
+    net: Decimal
+    paid: Decimal
+    count: int
+
+    @property
+    def has_payments(self):
+        return self.count > 0
+
+    @property
+    def remaining(self):
+        return self.sell - self.paid
+
+    @property
+    def profit(self):
+        return self.sell - self.net
+
+
+def payment_summary(booking):
+    # المجموع والعدد في استعلام واحد بدل aggregate + exists
+    totals = booking.payments.aggregate(paid=Sum("paid_amount"), count=Count("pk"))
+    return PaymentSummary(
+        sell=booking.sell or Decimal("0.00"),
+        net=booking.net or Decimal("0.00"),
+        paid=totals["paid"] or Decimal("0.00"),
+        count=totals["count"],
+    )
+
+
+def record_payment(booking_pk, data, files, employee_name):
+    """Validate and save one payment; ``payment`` is None when the form has errors."""
+    from ..forms import PaymentForm  # forms.py بيستورد payment_summary من هنا
+
+    with transaction.atomic():
+        booking = get_object_or_404(HotelBooking.objects.select_for_update(), pk=booking_pk)
+        summary = payment_summary(booking)
+        form = PaymentForm(data, files, booking=booking, summary=summary)
+        if not form.is_valid():
+            return PaymentResult(booking, summary, form, None)
+
+        payment = form.save(commit=False)
+        payment.booking_hotel = booking
+        payment.employee_name = employee_name
+        # أول دفعة هي اللي بتحدد سعر الحجز
+        if not summary.has_payments:
+            booking.net = form.cleaned_data.get("net_price") or 0
+            booking.sell = form.cleaned_data.get("sell_price") or 0
+            booking.save(update_fields=["net", "sell", "updated_at"])
+        payment.save()
+    return PaymentResult(booking, summary, form, payment)
@@ -0,0 +1,28 @@
+# core/services/pdf.py
+"""
+HTML → PDF rendering of vouchers and reports with xhtml2pdf.
+
+xhtml2pdf drags in reportlab, pypdf and html5lib, so it is imported on the
+first render instead of when ``core.views`` loads; workers that never print a
+voucher never pay for it.
+"""
+import io
+
+from django.template.loader import get_template
+
+from ..metrics import PDF_RENDER_SECONDS
+
+
+def render_pdf(template_name: str, context: dict):
+    """PDF bytes of the rendered template, or None if xhtml2pdf reported an error."""
+    from xhtml2pdf import pisa
+
+    with PDF_RENDER_SECONDS.time(template=template_name):
+        html = get_template(template_name).render(context)
+        out = io.BytesIO()
+        status = pisa.CreatePDF(html, dest=out, encoding="utf-8")
+    return None if status.err else out.getvalue()
+
+
+def preload():
+    from xhtml2pdf import pisa  # noqa: F401
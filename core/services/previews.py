@@ -0,0 +1,130 @@
+# core/services/previews.py
+"""
+Small WebP previews of uploaded receipts, invoices and vouchers.
+
+Images are downscaled with Pillow and PDFs are previewed by rendering page 1
+with PyMuPDF. The preview is stored next to the original as
+``<name>.preview.webp`` and is built on the ``previews`` worker pool after the
+upload commits, never inside the request that lists the payments. Once built,
+``StoredBlob.has_preview`` is set, so a page finds its ready previews with one
+query (``ready_previews``) instead of asking the storage about every file.
+"""
+import io
+import logging
+import threading
+
+from django.conf import settings
+
+from ..storage import ContentAddressedMixin
+from .extraction import file_extension
+from .workers import submit, submit_on_commit
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ("jpg", "jpeg", "png", "webp", "gif", "bmp", "tif", "tiff")
+PREVIEW_SUFFIX = ".preview.webp"
+
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def preview_name(name: str) -> str:
+    return f"{name}{PREVIEW_SUFFIX}"
+
+
+def supports(name: str) -> bool:
+    ext = file_extension(name)
+    return ext == "pdf" or ext in IMAGE_EXTENSIONS
+
+
+def _thumbnail(img, size, quality) -> bytes:
+    from PIL import Image
+
+    img.thumbnail((size, size * 2), Image.Resampling.LANCZOS)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "P") else "RGB")
+    out = io.BytesIO()
+    img.save(out, format="WEBP", quality=quality, method=4)
+    return out.getvalue()
+
+
+def render_preview(data: bytes, name: str) -> bytes:
+    from PIL import Image
+
+    size = getattr(settings, "PREVIEW_SIZE", 320)
+    quality = getattr(settings, "PREVIEW_QUALITY", 70)
+    if file_extension(name) == "pdf":
+        import fitz
+
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            page = doc[0]
+            # نرسم الصفحة بالمقاس المطلوب على طول بدل ما نرسمها كاملة ونصغّر
+            zoom = size / max(page.rect.width, 1)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            img = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+    else:
+        img = Image.open(io.BytesIO(data))
+        img.draft("RGB", (size, size * 2))  # JPEG: فك ضغط بمقاس أصغر
+    return _thumbnail(img, size, quality)
+
+
+def _mark_ready(name: str):
+    from ..models import StoredBlob
+
+    # الصفحات بتقرا has_preview بدل ما تسأل الـ storage عن كل ملف
+    StoredBlob.objects.filter(name=name, has_preview=False).update(has_preview=True)
+
+
+def build_preview(storage, name: str):
+    target = preview_name(name)
+    try:
+        if storage.exists(target):
+            _mark_ready(name)
+            return target
+        with storage.open(name, "rb") as fh:
+            data = fh.read()
+        webp = render_preview(data, name)
+        if isinstance(storage, ContentAddressedMixin):
+            storage.save_derived(target, webp)
+        else:
+            from django.core.files.base import ContentFile
+
+            storage.save(target, ContentFile(webp))
+        _mark_ready(name)
+        return target
+    except Exception:
+        logger.exception("Preview of %s failed", name)
+        return None
+    finally:
+        with _in_flight_lock:
+            _in_flight.discard(name)
+
+
+def schedule(field_file, on_commit: bool = False) -> bool:
+    """Queue a preview for ``field_file`` unless one is already queued."""
+    name = field_file.name
+    if not name or not supports(name):
+        return False
+    with _in_flight_lock:
+        if name in _in_flight:
+            return False
+        _in_flight.add(name)
+    (submit_on_commit if on_commit else submit)("previews", build_preview, field_file.storage, name)
+    return True
+
+
+def ready_previews(files):
+    """Names of ``files`` whose preview is built: one query for the whole page, no storage calls."""
+    from ..models import StoredBlob
+
+    names = {f.name for f in files if f and supports(f.name)}
+    if not names:
+        return frozenset()
+    return frozenset(StoredBlob.objects.filter(name__in=names, has_preview=True).values_list("name", flat=True))
+
+
+def preview_url(field_file, ready=()):
+    """URL of the preview when ``field_file`` is in ``ready`` (see ``ready_previews``), else None."""
+    if not field_file or field_file.name not in ready:
+        return None
+    return field_file.storage.url(preview_name(field_file.name))
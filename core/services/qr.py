@@ -0,0 +1,24 @@
+# core/services/qr.py
+"""QR codes for the voucher pages, as inline ``data:`` URLs (qrcode is imported on first use)."""
+import base64
+import io
+
+from ..metrics import QR_SECONDS
+
+
+def build_qr_data_url(text: str) -> str:
+    import qrcode
+
+    with QR_SECONDS.time():
+        qr = qrcode.QRCode(version=1, box_size=4, border=1)
+        qr.add_data(text)
+        qr.make(fit=True)
+        img = qr.make_image(fill_color="black", back_color="white")
+        buf = io.BytesIO()
+        img.save(buf, format="PNG")
+    return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode('ascii')}"
+
+
+def preload():
+    import qrcode  # noqa: F401
+    from qrcode.image.pil import PilImage  # noqa: F401
@@ -0,0 +1,133 @@
+# core/services/supplier_templates.py
+"""
+Per-supplier voucher templates.
+
+Each template carries a keyword fingerprint. One scan of the text collects
+every fingerprint keyword present, and the template whose whole set matched
+is picked before any field parsing runs. The generic ``VoucherParser`` still
+does the bulk of the work; a template only adds what it knows about its
+supplier: fixed values, regions for fields that the PDF layout splits over
+several lines, and the supplier's date formats.
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .voucher_parser import get_parser, to_int, to_text
+
+
+@dataclass(frozen=True)
+class Region:
+    """
+    Multi-line pattern for one field. All capture groups are joined with a
+    space, so a value that the layout broke over two lines comes back whole.
+    """
+    field: str
+    pattern: str
+    kind: str = "text"  # text | date | int
+
+
+@dataclass(frozen=True)
+class SupplierTemplate:
+    key: str
+    name: str
+    fingerprint: frozenset
+    fixed: Tuple[Tuple[str, object], ...] = ()
+    regions: Tuple[Region, ...] = ()
+    date_formats: Tuple[str, ...] = ()  # للـ regions اللي kind="date" بس؛ باقي التواريخ من VoucherParser
+
+
+DARINA = SupplierTemplate(
+    key="darina",
+    name="Darina Holidays",
+    fingerprint=frozenset({"darina holidays", "confirmation / invoice", "agent ref"}),
+    fixed=(("provider_name", "DARINA HOLIDAYS"),),
+    regions=(
+        # نوع الغرفة بيطلع نصه فوق سطر الـ Check In ونصه تحت "Room Type:"
+        Region("room_type", r'^(.+)\n[ \t]*Check In:.*Room Type:[ \t]*\n(.+)$'),
+        Region("checkin", r'Check In:[ \t]*(\d{1,2}-[A-Za-z]{3}-\d{2})', "date"),
+        Region("checkout", r'Check Out:[ \t]*(\d{1,2}-[A-Za-z]{3}-\d{2})', "date"),
+    ),
+    date_formats=("%d-%b-%y",),
+)
+
+# Hotelbeds و WebBeds و Expedia: الـ parser العام بيقرا كل حقولهم (voucher_samples)، ومن غير
+# regions خاصة بيهم القالب مالوش لازمة. مورد جديد بيتضاف هنا لما يبقى عنده layout محتاج regions
+DEFAULT_TEMPLATES = (DARINA,)
+
+
+# ===================== Registry =====================
+
+class TemplateRegistry:
+    def __init__(self, templates=DEFAULT_TEMPLATES):
+        self.templates = tuple(templates)
+        words = sorted({w for t in self.templates for w in t.fingerprint}, key=len, reverse=True)
+        self._anchors = re.compile(r'\b(?:' + "|".join(map(re.escape, words)) + r')\b') if words else None
+        # الأكتر كلمات الأول عشان التطابق الأدق يكسب
+        self._ordered = sorted(self.templates, key=lambda t: len(t.fingerprint), reverse=True)
+        self._regions: Dict[str, tuple] = {
+            t.key: tuple((r, re.compile(r.pattern, re.MULTILINE)) for r in t.regions) for t in self.templates
+        }
+        spec = [(t.key, sorted(t.fingerprint), t.fixed, t.regions, t.date_formats) for t in self.templates]
+        self.fingerprint = hashlib.sha1((repr(spec) + get_parser().fingerprint).encode()).hexdigest()[:12]
+
+    def match(self, text: str) -> Optional[SupplierTemplate]:
+        if self._anchors is None or not text:
+            return None
+        found = set(self._anchors.findall(text.lower()))
+        if not found:
+            return None
+        for t in self._ordered:
+            if t.fingerprint <= found:
+                return t
+        return None
+
+    def _convert(self, template, region, raw):
+        if region.kind == "int":
+            return to_int(raw)
+        if region.kind == "date":
+            for fmt in template.date_formats:
+                try:
+                    return datetime.strptime(raw.strip(), fmt).date()
+                except ValueError:
+                    continue
+            return None
+        return to_text(raw)
+
+    def apply(self, template: SupplierTemplate, text: str, data: dict) -> dict:
+        for region, rx in self._regions[template.key]:
+            m = rx.search(text)
+            if not m:
+                continue
+            value = self._convert(template, region, " ".join(g.strip() for g in m.groups() if g))
+            if value is not None:
+                data[region.field] = value
+        for name, value in template.fixed:
+            data[name] = value
+        return data
+
+    def parse(self, text: str, template: Optional[SupplierTemplate] = None) -> dict:
+        data = get_parser().parse(text)
+        template = template or self.match(text)
+        return self.apply(template, text, data) if template else data
+
+
+_default_registry: Optional[TemplateRegistry] = None
+
+
+def get_registry() -> TemplateRegistry:
+    # VOUCHER_TEMPLATES = "dotted.path.to.TEMPLATES" لو عايز تضيف موردين
+    global _default_registry
+    if _default_registry is None:
+        path = getattr(settings, "VOUCHER_TEMPLATES", None)
+        _default_registry = TemplateRegistry(import_string(path) if path else DEFAULT_TEMPLATES)
+    return _default_registry
+
+
+def parse_voucher(text: str) -> dict:
+    return get_registry().parse(text)
@@ -0,0 +1,138 @@
+# core/services/upload_cache.py
+"""
+Disk cache of extracted voucher text and parsed fields, keyed by the SHA-256
+of the uploaded bytes. Entries are JSON files; the least recently used ones
+are removed once the folder grows past ``VOUCHER_CACHE_MAX_BYTES``. Each
+process keeps a running size total, so a write only walks the folder when the
+total passes the limit (or every ``PRUNE_EVERY`` writes).
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+
+_prune_lock = threading.Lock()
+# حجم كل فولدر كاش (تقدير) من آخر مسح + عدد الكتابات من ساعتها: الكتابة مبتلفّش على الفولدر كله
+_sizes = {}
+_writes = {}
+# العمليات التانية (workers) بتكتب هي كمان، فبنعيد المسح كل PRUNE_EVERY كتابة حتى لو التقدير تحت الحد
+PRUNE_EVERY = 200
+
+
+class HashingFile(File):
+    """File wrapper that hashes the bytes while storage (or we) read the chunks."""
+
+    def __init__(self, file, name=None):
+        super().__init__(file, name or getattr(file, "name", None))
+        self._sha = hashlib.sha256()
+        self._consumed = False
+
+    def chunks(self, chunk_size=None):
+        self._sha = hashlib.sha256()
+        for chunk in self.file.chunks(chunk_size) if hasattr(self.file, "chunks") else super().chunks(chunk_size):
+            self._sha.update(chunk)
+            yield chunk
+        self._consumed = True
+
+    def hexdigest(self) -> str:
+        if not self._consumed:
+            # الـ storage قرا الملف بـ read() مش chunks() (زي S3)
+            for _ in self.chunks():
+                pass
+        return self._sha.hexdigest()
+
+
+def read_and_hash(fobj):
+    """Read an upload once and return ``(bytes, sha256 hexdigest)``."""
+    if hasattr(fobj, "seek"):
+        fobj.seek(0)
+    sha = hashlib.sha256()
+    parts = []
+    chunks = fobj.chunks() if hasattr(fobj, "chunks") else iter(lambda: fobj.read(64 * 1024), b"")
+    for chunk in chunks:
+        sha.update(chunk)
+        parts.append(chunk)
+    return b"".join(parts), sha.hexdigest()
+
+
+# ===================== Disk LRU =====================
+
+def _root() -> Path:
+    return Path(getattr(settings, "VOUCHER_CACHE_DIR", Path(settings.BASE_DIR) / "var" / "voucher_cache"))
+
+
+def _path(digest: str) -> Path:
+    return _root() / digest[:2] / f"{digest}.json"
+
+
+def get(digest: str):
+    path = _path(digest)
+    try:
+        with open(path, encoding="utf-8") as fh:
+            entry = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    try:
+        os.utime(path)  # آخر استخدام = mtime
+    except OSError:
+        pass
+    return entry
+
+
+def put(digest: str, entry: dict):
+    path = _path(digest)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(entry, fh, ensure_ascii=False)
+    os.replace(tmp, path)
+    note_write(_root(), getattr(settings, "VOUCHER_CACHE_MAX_BYTES", 200 * 1024 * 1024), path.stat().st_size)
+
+
+def note_write(root: Path, max_bytes: int, size: int) -> int:
+    """Add ``size`` to the running total of ``root`` and prune only once it passes ``max_bytes``."""
+    key = str(root)
+    with _prune_lock:
+        total = _sizes.get(key)
+        if total is not None:
+            _sizes[key] = total = total + size
+            _writes[key] = _writes.get(key, 0) + 1
+            if total <= max_bytes and _writes[key] < PRUNE_EVERY:
+                return 0
+    # أول كتابة في الـ process (لسه مانعرفش الحجم) أو عدّينا الحد
+    return prune(root, max_bytes)
+
+
+def prune(root: Path, max_bytes: int) -> int:
+    """Delete least recently used files under ``root`` until it fits in ``max_bytes``."""
+    if not root.exists():
+        return 0
+    with _prune_lock:
+        _writes[str(root)] = 0
+        files, total = [], 0
+        for dirpath, _, names in os.walk(root):
+            for n in names:
+                p = os.path.join(dirpath, n)
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+                total += st.st_size
+        removed = 0
+        if total > max_bytes:
+            for _, size, p in sorted(files):
+                try:
+                    os.remove(p)
+                except OSError:
+                    continue
+                total -= size
+                removed += 1
+                if total <= max_bytes:
+                    break
+        _sizes[str(root)] = total
+        return removed
@@ -0,0 +1,225 @@
+# core/services/voucher_parser.py
+"""
+Single-pass parser for supplier voucher text.
+
+Every field is described by a ``FieldExtractor`` (keywords + label regex +
+value regex). All patterns are compiled once per process and the document is
+scanned a single time no matter how many fields we look for.
+"""
+import hashlib
+import re
+import string
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# ===================== Values / Converters =====================
+
+SEPARATOR = r'[ \t]*\.?[ \t]*[:\-#]?[ \t]*'
+
+DATE_VALUE = (
+    r'(\d{4}-\d{1,2}-\d{1,2}'                 # 2025-09-12
+    r'|\d{1,2}[/-]\d{1,2}[/-]\d{2,4}'          # 12/09/2025, 12-09-25
+    r'|\d{1,2}[ -][A-Za-z]{3,9}[-, ]*\d{2,4}'  # 22-Nov-25, 12 September 2025
+    r'|[A-Za-z]{3,9}\s?\d{1,2},?\s?\d{4})'     # Sep 12, 2025
+)
+
+DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%d/%m/%Y", "%d-%m-%Y", "%m/%d/%Y", "%m-%d-%Y",
+    "%d/%m/%y", "%d-%m-%y",
+    "%d-%b-%y", "%d-%b-%Y", "%d %b %Y", "%d %B %Y", "%d %b %y",
+    "%b %d %Y", "%B %d %Y",
+)
+
+HOTEL_NAME_VALUE = r'([A-Za-z0-9][A-Za-z0-9 ,&\'\-\.\(\)]*)'
+
+_SPACES = re.compile(r'\s+')
+
+
+def to_date(raw: str):
+    s = _SPACES.sub(" ", raw.replace(",", " ")).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def to_int(raw: str):
+    try:
+        return int(raw)
+    except ValueError:
+        return None
+
+
+def to_text(raw: str):
+    return raw.strip(" \t,.:#|-") or None
+
+
+# ===================== Extractors =====================
+
+@dataclass(frozen=True)
+class FieldExtractor:
+    """
+    ``keywords`` lower-case words a caption starts with; used to index the text.
+    ``label``    lower-case regex for the whole caption, matched at a keyword.
+    ``value``    regex matched right after the caption; group 1 is the value.
+    ``priority`` lower wins when several extractors fill the same field.
+    ``next_line`` look at the following line when the caption ends the line.
+    """
+    field: str
+    keywords: Tuple[str, ...]
+    label: str
+    value: str
+    convert: Callable[[str], Any] = to_text
+    priority: int = 0
+    next_line: bool = True
+
+
+def date_extractor(field: str, keywords: Tuple[str, ...], label: str, priority: int = 0) -> FieldExtractor:
+    # التاريخ ممكن ييجي بعد الكلمة بـ 20 حرف (مثلاً "Check in date : ...")
+    # أو في السطر اللي بعده لو الكلمة لوحدها في سطر ("Arrival date:")
+    return FieldExtractor(field, keywords, rf'(?:{label})(?:\s*date)?', r'.{0,20}?' + DATE_VALUE, to_date, priority)
+
+
+DEFAULT_EXTRACTORS = (
+    FieldExtractor("booking_ref", ("booking", "reservation"),
+                   r'booking\s*ref(?:erence)?(?:\s*(?:no|number))?|reservation\s*(?:id|no|number)',
+                   SEPARATOR + r'([A-Z0-9][A-Z0-9\-]*)'),
+    # الكود لازم يكون فيه رقم في أي مكان (V-99, TC55310V): كلمة "voucher" بتيجي في العناوين والشروط
+    # ("SERVICE VOUCHER", "present this voucher upon arrival") وكود من حروف بس مش هيتقري
+    FieldExtractor("voucher_code", ("voucher",), r'voucher(?:\s*(?:code|no|number))?',
+                   SEPARATOR + r'(?=[A-Z0-9\-]*\d)([A-Z0-9][A-Z0-9\-]*)'),
+    FieldExtractor("customer_display_name", ("lead", "guest", "holder", "customer"),
+                   r'(?:lead\s*)?(?:guest|holder|customer)(?:\s*name)?',
+                   SEPARATOR + r'([A-Za-z][A-Za-z .\-]*)'),
+    FieldExtractor("hotel_address", ("hotel", "address"), r'(?:hotel\s*)?address',
+                   SEPARATOR + r'(.+)'),
+    FieldExtractor("hotel_name", ("hotel", "property"), r'(?:hotel|property)\s*name',
+                   SEPARATOR + HOTEL_NAME_VALUE),
+    FieldExtractor("hotel_name", ("hotel", "property"), r'hotel|property',
+                   SEPARATOR + HOTEL_NAME_VALUE, priority=1),
+    FieldExtractor("provider_name", ("provider", "supplier"), r'provider|supplier',
+                   SEPARATOR + r'([A-Za-z0-9][A-Za-z0-9 .&\-]*)'),
+    FieldExtractor("country", ("country",), r'country',
+                   SEPARATOR + r'([A-Za-z][A-Za-z \-]*)'),
+    FieldExtractor("meal_plan", ("meal", "board"), r'meal(?:\s*plan)?|board(?:\s*basis)?',
+                   SEPARATOR + r'([A-Za-z][A-Za-z &\-]*)'),
+    FieldExtractor("room_type", ("room",), r'room\s*type',
+                   SEPARATOR + r'(.+)'),
+    FieldExtractor("nights", ("no", "number", "nights", "night"), r'(?:(?:no\.?|number)\s*of\s*)?nights?',
+                   SEPARATOR + r'(\d+)', to_int),
+    FieldExtractor("rooms_count", ("no", "number", "rooms", "room"), r'(?:(?:no\.?|number)\s*of\s*)?rooms?',
+                   SEPARATOR + r'(\d+)', to_int),
+    date_extractor("checkin", ("check",), r'check\s*in', 0),
+    date_extractor("checkin", ("check",), r'check-in', 1),
+    date_extractor("checkin", ("arrival",), r'arrival', 2),
+    date_extractor("checkin", ("from",), r'from', 3),
+    date_extractor("checkout", ("check",), r'check\s*out', 0),
+    date_extractor("checkout", ("check",), r'check-out', 1),
+    date_extractor("checkout", ("departure",), r'departure', 2),
+    date_extractor("checkout", ("to",), r'to', 3),
+)
+
+
+# ===================== Parser =====================
+
+# lower() على ASCII بس عشان المواضع تفضل زي ما هي في النص الأصلي
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_TRAILING_PUNCT = " \t.:-#|"
+
+
+class VoucherParser:
+    """
+    One scan of the document: a keyword alternation finds candidate captions,
+    only the extractors indexed under that keyword are tried there, and the
+    scan stops as soon as every field holds its best-priority value.
+    """
+
+    def __init__(self, extractors: Iterable[FieldExtractor] = DEFAULT_EXTRACTORS):
+        self.extractors = tuple(extractors)
+        self.fields = tuple(dict.fromkeys(e.field for e in self.extractors))
+        self._by_keyword: Dict[str, list] = {}
+        for i, e in enumerate(self.extractors):
+            for kw in e.keywords:
+                self._by_keyword.setdefault(kw, []).append(i)
+        words = sorted(self._by_keyword, key=len, reverse=True)
+        self._keywords = re.compile(r'\b(?:' + "|".join(map(re.escape, words)) + r')\b')
+        self._labels = tuple(re.compile(rf'(?:{e.label})\b') for e in self.extractors)
+        self._values = tuple(re.compile(e.value, re.IGNORECASE) for e in self.extractors)
+        self._best_priority = {
+            f: min(e.priority for e in self.extractors if e.field == f) for f in self.fields
+        }
+        # بيتغير لما الحقول أو الأنماط تتغير، فالنتائج المتخزنة القديمة متتستخدمش
+        spec = [(e.field, e.keywords, e.label, e.value, e.convert.__qualname__, e.priority, e.next_line)
+                for e in self.extractors]
+        self.fingerprint = hashlib.sha1(repr(spec).encode()).hexdigest()[:12]
+
+    def _value_at(self, i: int, text: str, start: int, end: int):
+        m = self._values[i].match(text, start, end)
+        return self.extractors[i].convert(m.group(1)) if m else None
+
+    def parse(self, text: str) -> dict:
+        data = dict.fromkeys(self.fields)
+        ranks = {}
+        remaining = set(self.fields)
+        lowered = text.translate(_ASCII_LOWER)
+        size = len(text)
+        pos = 0
+
+        while remaining:
+            kw = self._keywords.search(lowered, pos)
+            if not kw:
+                break
+            pos = kw.end()
+            for i in self._by_keyword[kw.group()]:
+                e = self.extractors[i]
+                if e.field not in remaining or ranks.get(e.field, 1 << 30) <= e.priority:
+                    continue
+                label = self._labels[i].match(lowered, kw.start())
+                if not label:
+                    continue
+                line_end = text.find("\n", label.end())
+                line_end = size if line_end < 0 else line_end
+                value = self._value_at(i, text, label.end(), line_end)
+                if value is None and e.next_line and not text[label.end():line_end].strip(_TRAILING_PUNCT):
+                    nxt = line_end + 1
+                    while nxt < size and text[nxt] in " \t\r\n":
+                        nxt += 1
+                    nxt_end = text.find("\n", nxt)
+                    value = self._value_at(i, text, nxt, size if nxt_end < 0 else nxt_end)
+                if value is None:
+                    continue
+                data[e.field] = value
+                ranks[e.field] = e.priority
+                if e.priority == self._best_priority[e.field]:
+                    remaining.discard(e.field)
+                pos = max(pos, label.end())
+                break
+        return data
+
+
+_default_parser: Optional[VoucherParser] = None
+
+
+def get_parser() -> VoucherParser:
+    # VOUCHER_EXTRACTORS = "dotted.path.to.EXTRACTORS" لو عايز تضيف/تبدّل حقول
+    global _default_parser
+    if _default_parser is None:
+        path = getattr(settings, "VOUCHER_EXTRACTORS", None)
+        _default_parser = VoucherParser(import_string(path) if path else DEFAULT_EXTRACTORS)
+    return _default_parser
+
+
+def smart_parse(text: str) -> dict:
+    return get_parser().parse(text)
+
+
+def parse_dates(text: str):
+    data = smart_parse(text)
+    return data["checkin"], data["checkout"]
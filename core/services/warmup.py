@@ -0,0 +1,62 @@
+# core/services/warmup.py
+"""
+Warm-up run by gunicorn before it forks the workers (``preload_app``).
+
+Everything loaded here lives in the master and is shared copy-on-write by the
+workers: the URL resolver, the compiled templates (Django's cached loader) and,
+when ``WARMUP_PDF`` is on, xhtml2pdf/qrcode. Nothing here may touch the
+database - connections opened in the master would be shared by every fork.
+"""
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _resolve_urls():
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    resolver._populate()  # بيبني الـ reverse dict لكل اللغات مرة واحدة
+    return len(resolver.reverse_dict)
+
+
+def _template_names():
+    for engine in settings.TEMPLATES:
+        for root in engine.get("DIRS", []):
+            root = Path(root)
+            for path in sorted(root.rglob("*.html")):
+                yield path.relative_to(root).as_posix()
+
+
+def _load_templates():
+    from django.template import TemplateDoesNotExist, TemplateSyntaxError
+    from django.template.loader import get_template
+
+    loaded = 0
+    for name in _template_names():
+        try:
+            get_template(name)
+            loaded += 1
+        except (TemplateDoesNotExist, TemplateSyntaxError):
+            logger.warning("Warm-up could not load template %s", name)
+    return loaded
+
+
+def warm_up(pdf=None) -> dict:
+    from django.db import connections
+
+    started = time.perf_counter()
+    stats = {"urls": _resolve_urls(), "templates": _load_templates()}
+    if pdf if pdf is not None else getattr(settings, "WARMUP_PDF", False):
+        from . import pdf as pdf_service, qr
+
+        pdf_service.preload()
+        qr.preload()
+        stats["pdf"] = True
+    connections.close_all()
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
@@ -0,0 +1,47 @@
+# core/services/workers.py
+"""
+Small in-process thread pools for work that must not run inside the request.
+
+Pools are created lazily per name and sized from ``settings.WORKER_POOLS``.
+Jobs are submitted after the surrounding transaction commits so the worker
+always sees the rows the request just wrote.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+_lock = threading.Lock()
+_pools = {}
+
+
+def get_pool(name: str) -> ThreadPoolExecutor:
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            size = getattr(settings, "WORKER_POOLS", {}).get(name, 2)
+            pool = _pools[name] = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{name}-worker")
+        return pool
+
+
+def _run(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        # الثريد بيفتح اتصال خاص بيه بقاعدة البيانات
+        close_old_connections()
+
+
+def submit(name: str, fn, *args, **kwargs):
+    return get_pool(name).submit(_run, fn, *args, **kwargs)
+
+
+def submit_on_commit(name: str, fn, *args, **kwargs):
+    transaction.on_commit(lambda: submit(name, fn, *args, **kwargs))
+
+
+def run_async(name: str, fn, *args, **kwargs):
+    """Await ``fn`` on the named pool: each thread has its own DB connection, so calls really overlap."""
+    return sync_to_async(_run, thread_sensitive=False, executor=get_pool(name))(fn, *args, **kwargs)
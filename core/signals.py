@@ -0,0 +1,127 @@
+# core/signals.py
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    FlightBooking, HotelBooking, Payment, Room, TransferBooking, UniBookingCard, VisaBooking, VoucherIngestJob,
+)
+from . import instrumentation
+from .services import images, previews
+from .storage import ContentAddressedMixin
+
+
+def _blob_fields(instance, update_fields=None):
+    for field in instance._meta.get_fields():
+        if isinstance(getattr(field, "storage", None), ContentAddressedMixin):
+            if update_fields is None or field.name in update_fields:
+                yield field
+
+
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=FlightBooking)
+@receiver(post_delete, sender=VoucherIngestJob)
+def release_blobs(sender, instance, **kwargs):
+    # مسح الحجز = مرجع أقل على الملف؛ الملف نفسه بيتمسح لما آخر مرجع يروح
+    for field in _blob_fields(instance):
+        name = getattr(instance, field.attname)
+        if name:
+            transaction.on_commit(lambda s=field.storage, n=str(name): s.delete(n))
+
+
+@receiver(pre_save, sender=Payment)
+@receiver(pre_save, sender=FlightBooking)
+@receiver(pre_save, sender=VoucherIngestJob)
+def release_replaced_blobs(sender, instance, raw=False, update_fields=None, **kwargs):
+    # تعديل الملف على صف موجود: الجديد بياخد مرجع في _save، والقديم لازم يسيب مرجعه
+    if raw or instance._state.adding or not instance.pk:
+        return
+    fields = list(_blob_fields(instance, update_fields))
+    if not fields:
+        return
+    old = sender._base_manager.filter(pk=instance.pk).values(*(f.attname for f in fields)).first()
+    if not old:
+        return
+    for field in fields:
+        previous, current = old[field.attname], getattr(instance, field.attname)
+        # ملف جديد لسه ما اتحفظش (_committed=False) حتى لو بنفس الاسم = استبدال
+        if previous and (previous != current.name or not current._committed):
+            transaction.on_commit(lambda s=field.storage, n=previous: s.delete(n))
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=FlightBooking)
+def queue_previews(sender, instance, **kwargs):
+    # معاينة صغيرة للإيصالات والفواتير بتتعمل في الخلفية بعد الحفظ
+    for field in instance._meta.get_fields():
+        if getattr(field, "storage", None) is None or field.name == "bank_file_original":
+            continue
+        f = getattr(instance, field.attname)
+        if not f or f.storage.exists(previews.preview_name(f.name)):
+            continue
+        if field.name == "bank_file" and images.queue_receipt(instance):
+            continue  # المعاينة بتتعمل بعد ضغط الصورة
+        previews.schedule(f, on_commit=True)
+
+
+def _touch(model, pk):
+    # update() مش save(): من غير signals تانية ومن غير ما نلمس باقي الحقول
+    if pk:
+        model.objects.filter(pk=pk).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=HotelBooking)
+@receiver(post_save, sender=FlightBooking)
+@receiver(post_save, sender=TransferBooking)
+@receiver(post_save, sender=VisaBooking)
+@receiver(post_delete, sender=HotelBooking)
+@receiver(post_delete, sender=FlightBooking)
+@receiver(post_delete, sender=TransferBooking)
+@receiver(post_delete, sender=VisaBooking)
+def touch_card(sender, instance, **kwargs):
+    # صفحة الكارت (الحجوزات والإجماليات) بتتحسب من updated_at بتاع الكارت
+    _touch(UniBookingCard, instance.card_id)
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def touch_hotel_booking(sender, instance, **kwargs):
+    booking_id = instance.hotel_booking_id if sender is Room else instance.booking_hotel_id
+    _touch(HotelBooking, booking_id)
+    if booking_id:
+        UniBookingCard.objects.filter(hotelbooking=booking_id).update(updated_at=timezone.now())
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    pragmas = getattr(settings, "SQLITE_PRAGMAS", {})
+    if not pragmas:
+        return
+    # الاتصال الخام: من غير execute_wrappers، فالـ pragmas متتحسبش كاستعلامات الـ request
+    for name, value in pragmas.items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
+
+
+def set_journal_mode(connection, mode=None):
+    """Switch the SQLite file to ``mode`` (default SQLITE_JOURNAL_MODE) only if it differs; returns the mode in effect."""
+    mode = (mode or getattr(settings, "SQLITE_JOURNAL_MODE", "")).lower()
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode")
+        current = cursor.fetchone()[0].lower()
+        # بيتكتب في الملف، فمنغيرهوش غير لو لازم (لازم برّه أي transaction)
+        if mode and current != mode:
+            cursor.execute(f"PRAGMA journal_mode = {mode}")
+            current = cursor.fetchone()[0].lower()
+    return current
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    instrumentation.install(connection)
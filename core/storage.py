@@ -0,0 +1,147 @@
+# core/storage.py
+"""
+Content-addressed storage for uploaded payment and voucher files.
+
+Every upload is stored once under ``blobs/<aa>/<bb>/<sha256><ext>``, so the
+same PDF or screenshot uploaded again (or attached to another booking) points
+at the existing blob instead of adding a suffixed copy. ``StoredBlob`` keeps a
+reference count per blob; ``delete()`` only removes the bytes when the last
+reference goes away.
+"""
+import hashlib
+import os
+import uuid
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+BLOB_PREFIX = "blobs"
+DERIVED_SUFFIXES = (".preview.webp",)
+CHUNK_SIZE = 256 * 1024
+
+
+def blob_name(digest: str, ext: str) -> str:
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext.lower()}"
+
+
+def is_blob(name: str) -> bool:
+    return bool(name) and name.startswith(BLOB_PREFIX + "/")
+
+
+def hash_content(content):
+    if hasattr(content, "seek"):
+        content.seek(0)
+    sha, size = hashlib.sha256(), 0
+    for chunk in content.chunks(CHUNK_SIZE) if hasattr(content, "chunks") else iter(lambda: content.read(CHUNK_SIZE), b""):
+        sha.update(chunk)
+        size += len(chunk)
+    if hasattr(content, "seek"):
+        content.seek(0)
+    return sha.hexdigest(), size
+
+
+class ContentAddressedMixin:
+    def get_available_name(self, name, max_length=None):
+        # الاسم النهائي بيتحدد من الـ hash في _save، فمفيش داعي نسأل exists()
+        return name
+
+    def _write_blob(self, content, ext):
+        """Store ``content`` if needed and return ``(name, digest, size)``."""
+        digest, size = hash_content(content)
+        name = blob_name(digest, ext)
+        if not self.exists(name):
+            super()._save(name, content)
+        return name, digest, size
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        ext = os.path.splitext(name)[1][:10]
+        with transaction.atomic():
+            final, digest, size = self._write_blob(content, ext)
+            blob, _ = StoredBlob.objects.select_for_update().get_or_create(
+                name=final, defaults={"sha256": digest, "size": size}
+            )
+            StoredBlob.objects.filter(pk=blob.pk).update(refcount=F("refcount") + 1)
+            # delete لنفس الـ blob كان ماسك الصف ومسح الملف بعد ما كتبناه: نكتبه تاني
+            if not self.exists(final):
+                self._write_blob(content, ext)
+        return final
+
+    def save_derived(self, name, data: bytes):
+        """Write a file derived from a blob (e.g. its preview) under an exact name, outside the refcount."""
+        from django.core.files.base import ContentFile
+
+        if super().exists(name):
+            super().delete(name)
+        return super()._save(name, ContentFile(data))
+
+    def delete(self, name):
+        from .models import StoredBlob
+
+        if not is_blob(name):
+            return self._unlink(name)
+        # الملف بيتمسح جوه نفس الـ lock، و _save لنفس المحتوى بيتأكد إن الملف
+        # لسه موجود بعد ما ياخد الصف
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob and blob.refcount > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(refcount=F("refcount") - 1)
+                return
+            if blob:
+                blob.delete()
+            self._unlink(name)
+
+    def _unlink(self, name):
+        super().delete(name)
+        # الملفات المشتقة (المعاينة) بتتمسح مع الأصل
+        for suffix in DERIVED_SUFFIXES:
+            if super().exists(name + suffix):
+                super().delete(name + suffix)
+
+
+class BlobFileSystemStorage(ContentAddressedMixin, FileSystemStorage):
+    def _write_blob(self, content, ext):
+        # بنكتب لملف مؤقت ونحسب الـ hash في نفس اللفة، وبعدين rename للاسم النهائي
+        tmp_dir = self.path(f"{BLOB_PREFIX}/tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp = os.path.join(tmp_dir, uuid.uuid4().hex)
+        sha, size = hashlib.sha256(), 0
+        if hasattr(content, "seek"):
+            content.seek(0)
+        try:
+            with open(tmp, "wb") as out:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    sha.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+            name = blob_name(sha.hexdigest(), ext)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(tmp)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp, self.file_permissions_mode)
+                os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return name, sha.hexdigest(), size
+
+
+@lru_cache(maxsize=None)
+def get_blob_storage():
+    # بيتنادى من الـ FileField(storage=...) وقت تحميل الموديلات
+    if getattr(settings, "USE_S3", False):
+        from storages.backends.s3boto3 import S3Boto3Storage
+
+        class BlobS3Storage(ContentAddressedMixin, S3Boto3Storage):
+            pass
+
+        return BlobS3Storage()
+    return BlobFileSystemStorage()
@@ -0,0 +1,11 @@
+from django import template
+
+from core.services.previews import preview_url as _preview_url
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def preview_url(context, field_file):
+    # previews = المعاينات الجاهزة للصفحة كلها من الـ view (ready_previews)؛ من غيرها مفيش صورة مصغرة
+    return _preview_url(field_file, context.get("previews") or ()) or ""
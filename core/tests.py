@@ -1,3 +1,1038 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import time
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections, router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .db_router import PIN_SESSION_KEY, ROUTER, ReplicaPinMiddleware, read_only
+from .instrumentation import SlowLogHandler
+from .signals import set_journal_mode
+from .models import (
+    FlightBooking, HotelBooking, Payment, Room, StoredBlob, TransferBooking, UniBookingCard, VisaBooking,
+    VoucherIngestJob,
+)
+from .metrics import REGISTRY, render_text
+from .profiling import _collapse, _Sampler
+from .services import images, ocr, upload_cache
+from .services.extraction import PDF_BACKENDS, extract_text, get_pdf_backend
+from .services.ingest import booking_initial, create_jobs, process_job, requeue_stale_jobs
+from .services.previews import PREVIEW_SUFFIX, build_preview
+from .services.supplier_templates import get_registry
+from .services.voucher_parser import smart_parse
+from .views import _export_rows
+
+
+# ===================== Test settings =====================
+# الصفحات في التيستات بتترسم بـ manifest حقيقي (من غير ضغط عشان السرعة):
+# أي {% static %} لملف مش موجود بيطلع 500 هنا زي الإنتاج بالظبط.
+# والـ replica router مقفول: نفس الأرقام مع DATABASE_REPLICA_URL ومن غيره (الـ replica في التيستات
+# mirror لـ default على اتصال تاني مش شايف داتا الـ test). التوجيه نفسه في ReplicaRoutingTests.
+_STATIC_ROOT = tempfile.mkdtemp()
+_test_settings = override_settings(STATIC_ROOT=_STATIC_ROOT, DATABASE_ROUTERS=[], STORAGES={
+    **settings.STORAGES,
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.ManifestStaticFilesStorage"},
+})
+
+
+def setUpModule():
+    _test_settings.enable()
+    call_command("collectstatic", interactive=False, verbosity=0)
+
+
+def tearDownModule():
+    _test_settings.disable()
+    shutil.rmtree(_STATIC_ROOT, ignore_errors=True)
+
+
+# ===================== Query budgets =====================
+# أقصى عدد استعلامات لكل صفحة. نفس الرقم لازم يكفي مع حجز واحد ومع 50 حجز للكارت:
+# لو الرقم بيكبر مع الداتا يبقى فيه استعلام لكل صف (N+1) في الـ view أو الـ template.
+# الأرقام شاملة الـ session والـ user (2 استعلام).
+BUDGETS = {
+    "dashboard": 4,
+    "dashboard_overview": 23,
+    "card_create": 2,
+    "card_detail": 10,
+    "cards_bulk_export": 3,
+    "hotel_create": 3,
+    "hotel_payment": 5,
+    "hotel_voucher": 4,
+    "hotel_voucher_pdf": 5,
+    "payment_edit": 4,
+    "flight_create": 3,
+    "flight_payment": 3,
+    "transfer_create": 3,
+    "transfer_voucher": 4,
+    "transfer_voucher_pdf": 4,
+    "visa_create": 3,
+    "visa_voucher": 4,
+    "visa_voucher_pdf": 4,
+    "reports": 10,
+    "reports_export_csv": 6,
+    "reports_export_xlsx": 6,
+    "reports_export_pdf": 3,
+    "voucher_ingest": 3,
+    "metrics": 2,
+    "profiles": 2,
+}
+PAYMENT_POST_BUDGET = 16
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def _signature(sql):
+    return _LITERALS.sub("?", sql)
+
+
+class QueryBudgetMixin:
+    """Request every view in BUDGETS against one data size; see SmallDataTests / LargeDataTests."""
+    BOOKINGS_PER_CARD = 1
+    EXTRA_CARDS = 0  # كروت بحجز واحد لكل نوع عشان صفحة الـ dashboard تتملي
+
+    def _card(self, name, n):
+        card = UniBookingCard.objects.create(customer_name=name, mobile="0100000000", created_by=self.admin)
+        for i in range(n):
+            ref = f"{card.pk}R{i}"
+            HotelBooking.objects.create(
+                card=card, booking_ref=ref, employee_name="admin", hotel_name="Hilton", country="Egypt",
+                checkin=date.today(), checkout=date.today() + timedelta(days=3), nights=3,
+                net=Decimal("100"), sell=Decimal("120"),
+            )
+            FlightBooking.objects.create(card=card, booking_code=f"F{ref}", airline="EgyptAir", pnr=ref,
+                                         net_price=Decimal("200"), sell_price=Decimal("230"))
+            TransferBooking.objects.create(card=card, booking_ref=ref, employee_name="admin",
+                                           pickup="Airport", dropoff="Hilton", date=date.today())
+            VisaBooking.objects.create(card=card, booking_ref=ref, employee_name="admin",
+                                       visa_type="Tourist", nationality="Egyptian")
+        return card
+
+    def setUp(self):
+        # TransactionTestCase: ثريدات الـ dashboard_overview بتفتح اتصالات تانية ولازم تشوف الداتا
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "x")
+        for c in range(self.EXTRA_CARDS):
+            self._card(f"Customer {c}", 1)
+        n = self.BOOKINGS_PER_CARD
+        self.card = self._card("Main customer", n)
+        # أول حجز فندق: غرف ودفعات بنفس العدد عشان صفحة الدفع والفاوتشر
+        self.hotel = self.card.hotelbooking_set.order_by("pk").first()
+        Room.objects.bulk_create(Room(hotel_booking=self.hotel, guest_names=f"Guest {i}") for i in range(n))
+        Payment.objects.bulk_create(
+            Payment(booking_hotel=self.hotel, employee_name="admin", paid_amount=Decimal("1"), method="cash")
+            for _ in range(n)
+        )
+        self.payment = self.hotel.payments.first()
+        self.flight = self.card.flightbooking_set.first()
+        self.transfer = self.card.transferbooking_set.first()
+        self.visa = self.card.visabooking_set.first()
+        self.client.force_login(self.admin)
+
+    def urls(self):
+        card, hotel, transfer, visa = self.card.pk, self.hotel.pk, self.transfer.pk, self.visa.pk
+        return {
+            "dashboard": reverse("dashboard"),
+            "dashboard_overview": reverse("dashboard_overview"),
+            "card_create": reverse("card_create"),
+            "card_detail": reverse("card_detail", args=[card]),
+            "cards_bulk_export": reverse("cards_bulk_export"),
+            "hotel_create": reverse("hotel_create", args=[card]),
+            "hotel_payment": reverse("hotel_payment", args=[hotel]),
+            "hotel_voucher": reverse("hotel_voucher", args=[hotel]),
+            "hotel_voucher_pdf": reverse("hotel_voucher_pdf", args=[hotel]),
+            "payment_edit": reverse("payment_edit", args=[self.payment.pk]),
+            "flight_create": reverse("flight_create", args=[card]),
+            "flight_payment": reverse("flight_payment", args=[self.flight.pk]),
+            "transfer_create": reverse("transfer_create", args=[card]),
+            "transfer_voucher": reverse("transfer_voucher", args=[transfer]),
+            "transfer_voucher_pdf": reverse("transfer_voucher_pdf", args=[transfer]),
+            "visa_create": reverse("visa_create", args=[card]),
+            "visa_voucher": reverse("visa_voucher", args=[visa]),
+            "visa_voucher_pdf": reverse("visa_voucher_pdf", args=[visa]),
+            "reports": reverse("reports"),
+            "reports_export_csv": reverse("reports_export_csv"),
+            "reports_export_xlsx": reverse("reports_export_xlsx"),
+            # الـ PDF تقيل في الرسم نفسه؛ نوع واحد كفاية لعد الاستعلامات
+            "reports_export_pdf": reverse("reports_export_pdf") + "?kind=visa",
+            "voucher_ingest": reverse("voucher_ingest"),
+            "metrics": reverse("metrics"),
+            "profiles": reverse("profiles"),
+        }
+
+    def assertWithinBudget(self, name, url):
+        response = self.client.get(url)
+        if getattr(response, "streaming", False):
+            b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f"{name}: HTTP {response.status_code}")
+        # من QueryStatsMiddleware: بيعد كمان استعلامات ثريدات الـ dashboard
+        stats = response.wsgi_request.query_stats
+        budget = BUDGETS[name]
+        if stats.count > budget:
+            signatures = Counter()
+            for sql, n in stats.signatures.items():
+                signatures[_signature(sql)] += n
+            lines = "\n".join(f"  {n:>4} x {sql[:300]}" for sql, n in signatures.most_common())
+            self.fail(f"{name} ({url}) ran {stats.count} queries, budget is {budget}:\n{lines}")
+
+    def test_query_budgets(self):
+        urls = self.urls()
+        self.assertEqual(set(urls), set(BUDGETS))
+        for name, url in urls.items():
+            with self.subTest(view=name):
+                self.assertWithinBudget(name, url)
+
+
+class SmallDataTests(QueryBudgetMixin, TransactionTestCase):
+    BOOKINGS_PER_CARD = 1
+
+
+class LargeDataTests(QueryBudgetMixin, TransactionTestCase):
+    BOOKINGS_PER_CARD = 50
+    EXTRA_CARDS = 12
+
+
+# ===================== Settings =====================
+class DatabaseUrlTests(SimpleTestCase):
+    def test_sqlite_paths_follow_dj_database_url(self):
+        from unibooking.settings import _database_from_url
+
+        def name(url):
+            return str(_database_from_url(url)["NAME"])
+
+        self.assertEqual(name("sqlite:///var/db.sqlite3"), str(settings.BASE_DIR / "var" / "db.sqlite3"))
+        self.assertEqual(name("sqlite:////srv/unibooking/db.sqlite3"), "/srv/unibooking/db.sqlite3")
+        self.assertEqual(name("sqlite://:memory:"), ":memory:")
+        self.assertEqual(name("sqlite://"), str(settings.BASE_DIR / "db.sqlite3"))
+        with self.assertRaises(ValueError):
+            _database_from_url("mongodb://localhost/x")
+
+
+class SlowLogTests(SimpleTestCase):
+    def test_handler_creates_its_folder(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp, "var", "log", "slow.log")
+            handler = SlowLogHandler(path, maxBytes=1024, backupCount=1, encoding="utf-8", delay=True)
+            self.assertTrue(path.parent.is_dir())
+            self.assertFalse(path.exists())  # delay: الملف نفسه مع أول سطر
+            handler.close()
+
+
+class SqliteConnectionTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "db.sqlite3")
+
+    def connect(self, alias):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        conn = DatabaseWrapper({**connections["default"].settings_dict, "NAME": self.path}, alias)
+        connections[alias] = conn
+        self.addCleanup(conn.close)
+        self.addCleanup(connections.__delitem__, alias)
+        return conn
+
+    def pragma(self, conn, name):
+        with conn.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_new_connections_get_pragmas(self):
+        conn = self.connect("pragmas")
+        self.assertEqual(self.pragma(conn, "busy_timeout"), settings.SQLITE_PRAGMAS["busy_timeout"])
+        self.assertEqual(self.pragma(conn, "synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma(conn, "temp_store"), 2)  # MEMORY
+        self.assertEqual(self.pragma(conn, "journal_mode"), "delete")
+        self.assertEqual(set_journal_mode(conn), settings.SQLITE_JOURNAL_MODE)
+        # journal_mode بيتخزن في الملف: أي اتصال جديد بيلاقيه
+        self.assertEqual(self.pragma(self.connect("pragmas_2"), "journal_mode"), settings.SQLITE_JOURNAL_MODE)
+
+    def test_transactions_are_immediate(self):
+        import sqlite3
+
+        conn = self.connect("pragmas")
+        with conn.cursor() as cursor:
+            cursor.execute("CREATE TABLE t (x integer)")
+        other = sqlite3.connect(self.path, timeout=0)
+        self.addCleanup(other.close)
+        with transaction.atomic(using="pragmas"):
+            # ولا استعلام لسه: BEGIN IMMEDIATE خد قفل الكتابة من الأول
+            with self.assertRaisesMessage(sqlite3.OperationalError, "locked"):
+                other.execute("INSERT INTO t VALUES (1)")
+        other.execute("INSERT INTO t VALUES (1)")
+
+
+# ===================== Replica routing =====================
+def _db_view(request):
+    return HttpResponse(router.db_for_read(HotelBooking))
+
+
+def _write_view(request):
+    router.db_for_write(Payment)
+    return HttpResponse(router.db_for_read(HotelBooking))
+
+
+async def _async_db_view(request):
+    return HttpResponse(router.db_for_read(HotelBooking))
+
+
+@override_settings(DATABASE_ROUTERS=[ROUTER])
+@mock.patch("core.db_router.replica_configured", return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Router decisions only: no query reaches a database, so no replica is needed."""
+
+    def request(self, method="get", session=None):
+        request = getattr(RequestFactory(), method)("/")
+        request.session = session if session is not None else SessionStore()
+        return request
+
+    def test_read_only_view_reads_from_replica(self, _):
+        self.assertEqual(read_only(_db_view)(self.request()).content, b"replica")
+        self.assertEqual(_db_view(self.request()).content, b"default")
+        # بعد كتابة جوه نفس الـ view القراية ترجع للـ primary
+        self.assertEqual(read_only(_write_view)(self.request()).content, b"default")
+
+    def test_write_pins_later_reads_to_primary(self, _):
+        session = SessionStore()
+        ReplicaPinMiddleware(_write_view)(self.request("post", session))
+        self.assertGreater(session[PIN_SESSION_KEY], time.time())
+
+        pinned = ReplicaPinMiddleware(read_only(_db_view))
+        self.assertEqual(pinned(self.request(session=session)).content, b"default")
+        session[PIN_SESSION_KEY] = time.time() - 1  # التثبيت خلص
+        self.assertEqual(pinned(self.request(session=session)).content, b"replica")
+
+    def test_async_read_only_view(self, _):
+        middleware = ReplicaPinMiddleware(read_only(_async_db_view))
+        self.assertEqual(asyncio.run(middleware(self.request())).content, b"replica")
+
+        session = SessionStore()
+        session[PIN_SESSION_KEY] = time.time() + 60
+        self.assertEqual(asyncio.run(middleware(self.request(session=session))).content, b"default")
+
+
+# ===================== Payments =====================
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class PaymentTests(TestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "x")
+        card = UniBookingCard.objects.create(customer_name="Customer", mobile="0100000000", created_by=admin)
+        self.booking = HotelBooking.objects.create(
+            card=card, booking_ref="R1", employee_name="admin", hotel_name="Hilton", country="Egypt",
+            checkin=date.today() + timedelta(days=30), checkout=date.today() + timedelta(days=33), nights=3,
+        )
+        self.url = reverse("hotel_payment", args=[self.booking.pk])
+        self.client.force_login(admin)
+
+    def pay(self, amount, **extra):
+        data = {"paid_amount": amount, "method": "cash",
+                "bank_file": SimpleUploadedFile("receipt.txt", f"receipt {amount}".encode()), **extra}
+        return self.client.post(self.url, data)
+
+    def test_first_payment_sets_price_and_overpay_is_rejected(self):
+        response = self.pay("400", net_price="800", sell_price="1000",
+                            installment_date=date.today() + timedelta(days=10),
+                            invoice_file=SimpleUploadedFile("invoice.pdf", b"%PDF-1.4 invoice"),
+                            voucher_original=SimpleUploadedFile("voucher.pdf", b"%PDF-1.4 voucher"))
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.net, self.booking.sell), (Decimal("800"), Decimal("1000")))
+
+        response = self.pay("700")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("paid_amount", response.context["form"].errors)
+        self.assertEqual(self.booking.payments.count(), 1)
+
+        response = self.pay("600")
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertEqual(self.booking.remaining_balance, 0)
+        # session + user + الحجز المقفول + مجموع الدفعات + حفظ الدفعة وملفها والـ signals
+        self.assertLessEqual(response.wsgi_request.query_stats.count, PAYMENT_POST_BUDGET)
+
+    def test_replacing_file_releases_old_blob(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pay("400", net_price="800", sell_price="1000", installment_date=date.today() + timedelta(days=10),
+                     invoice_file=SimpleUploadedFile("invoice.pdf", b"%PDF-1.4 invoice"),
+                     voucher_original=SimpleUploadedFile("voucher.pdf", b"%PDF-1.4 voucher"))
+        payment = self.booking.payments.get()
+        old = payment.bank_file.name
+        self.assertEqual(StoredBlob.objects.get(name=old).refcount, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("payment_edit", args=[payment.pk]), {
+                "paid_amount": "400", "method": "cash", "net_price": "800", "sell_price": "1000",
+                "installment_date": date.today() + timedelta(days=10),
+                "bank_file": SimpleUploadedFile("receipt.txt", b"another receipt"),
+            })
+        self.assertEqual(response.status_code, 302)
+        payment.refresh_from_db()
+        self.assertNotEqual(payment.bank_file.name, old)
+        self.assertEqual(StoredBlob.objects.filter(name=old, refcount__gt=0).count(), 0)
+        self.assertFalse(payment.bank_file.storage.exists(old))
+        self.assertEqual(StoredBlob.objects.get(name=payment.bank_file.name).refcount, 1)
+        # الفاتورة ما اتغيرتش، فمرجعها فاضل زي ما هو
+        self.assertEqual(StoredBlob.objects.get(name=payment.invoice_file.name).refcount, 1)
+
+    def test_save_rewrites_blob_deleted_meanwhile(self):
+        storage = Payment._meta.get_field("bank_file").storage
+        name = storage.save("a.txt", SimpleUploadedFile("a.txt", b"same bytes"))
+        original = type(storage)._write_blob
+        calls = []
+
+        def write_then_lose(self, content, ext):
+            # delete تاني خلص بين كتابة الملف وأخد الصف
+            result = original(self, content, ext)
+            if not calls:
+                storage.delete(name)
+            calls.append(result)
+            return result
+
+        with mock.patch.object(type(storage), "_write_blob", write_then_lose):
+            again = storage.save("b.txt", SimpleUploadedFile("b.txt", b"same bytes"))
+        self.assertEqual(again, name)
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(StoredBlob.objects.get(name=name).refcount, 1)
+
+    def test_payment_page_reads_previews_without_storage_calls(self):
+        png = BytesIO()
+        Image.new("RGB", (40, 40), "red").save(png, format="PNG")
+        self.pay("400", net_price="800", sell_price="1000", installment_date=date.today() + timedelta(days=10),
+                 invoice_file=SimpleUploadedFile("invoice.png", png.getvalue()),
+                 voucher_original=SimpleUploadedFile("voucher.pdf", b"%PDF-1.4 voucher"))
+        payment = self.booking.payments.get()
+        storage = payment.invoice_file.storage
+        build_preview(storage, payment.invoice_file.name)  # بيتعمل في الـ worker بعد الرفع
+        self.assertTrue(StoredBlob.objects.get(name=payment.invoice_file.name).has_preview)
+
+        with mock.patch.object(type(storage), "exists") as exists, \
+                mock.patch("core.services.previews.submit") as submit:
+            response = self.client.get(self.url)
+        exists.assert_not_called()
+        submit.assert_not_called()  # صفحة GET مش بتجدول معاينات
+        self.assertContains(response, payment.invoice_file.name + PREVIEW_SUFFIX, count=1)
+
+    def test_backfill_marks_existing_previews(self):
+        payment = Payment.objects.create(booking_hotel=self.booking, paid_amount=Decimal("10"), method="cash",
+                                         invoice_file=SimpleUploadedFile("invoice.pdf", b"%PDF-1.4 invoice"),
+                                         voucher_original=SimpleUploadedFile("voucher.pdf", b"%PDF-1.4 voucher"))
+        # معاينة اتعملت قبل has_preview
+        payment.invoice_file.storage.save_derived(payment.invoice_file.name + PREVIEW_SUFFIX, b"webp")
+        call_command("backfill_previews", stdout=StringIO())
+        blobs = dict(StoredBlob.objects.values_list("name", "has_preview"))
+        self.assertEqual((blobs[payment.invoice_file.name], blobs[payment.voucher_original.name]), (True, False))
+
+
+# ===================== Profiler =====================
+class ProfileTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.settings_override = override_settings(PROFILING=True, PROFILE_DIR=self.tmp.name, PROFILE_KEEP=2)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "x")
+
+    def test_superuser_profile_saved_and_listed(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("reports_export_csv") + "?_profile=1")
+        name = response["X-Profile-Id"]
+        meta = json.loads((Path(self.tmp.name) / name / "meta.json").read_text())
+        self.assertEqual((meta["view"], meta["status"]), ("reports_export_csv", 200))
+        for f in ("profile.prof", "profile.txt", "stacks.folded", "allocations.txt"):
+            self.assertEqual(self.client.get(reverse("profile_file", args=[name, f])).status_code, 200, f)
+        self.assertContains(self.client.get(reverse("profiles")), name)
+
+        for _ in range(2):
+            self.client.get(reverse("dashboard"), HTTP_X_PROFILE="cpu")
+        self.assertEqual(len(list(Path(self.tmp.name).iterdir())), 2)  # PROFILE_KEEP
+
+    def test_ignored_for_other_users(self):
+        self.client.force_login(User.objects.create_user("agent", password="x"))
+        response = self.client.get(reverse("dashboard") + "?_profile=1")
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertEqual(self.client.get(reverse("profiles")).status_code, 302)
+
+    @override_settings(PROFILING=False)
+    def test_off_unless_enabled(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("dashboard") + "?_profile=1")
+        self.assertNotIn("X-Profile-Id", response)
+        self.assertFalse(any(Path(self.tmp.name).iterdir()))
+
+    def test_sampler_collects_stacks(self):
+        def busy():
+            end = time.perf_counter() + 0.2
+            while time.perf_counter() < end:
+                sum(range(1000))
+
+        sampler = _Sampler(threading.get_ident(), None, 0.005)
+        sampler.start()
+        busy()
+        sampler.stop()
+        self.assertTrue(any("busy" in stack for stack in sampler.stacks), sampler.stacks)
+        # Python 3.10: الـ code object من غير co_qualname
+        frame = SimpleNamespace(f_globals={"__name__": "m"}, f_code=SimpleNamespace(co_name="f"), f_back=None)
+        self.assertEqual(_collapse(frame, None), "m:f")
+
+
+# ===================== Metrics =====================
+class MetricsTests(TestCase):
+    def test_unknown_methods_share_one_label(self):
+        self.client.generic("BREW", reverse("login"))
+        self.client.generic("PROPFIND-" + "x" * 20, reverse("login"))
+        self.client.get(reverse("login"))
+        text = render_text()
+        self.assertIn('method="other"', text)
+        self.assertIn('method="GET"', text)
+        self.assertNotIn("BREW", text)
+        self.assertNotIn("PROPFIND", text)
+
+    def test_dead_workers_fold_into_one_file(self):
+        with tempfile.TemporaryDirectory() as d, override_settings(METRICS_DIR=d):
+            key = json.dumps(["v", "GET"])
+            for pid in (999991, 999992):
+                (Path(d) / f"{pid}.json").write_text(json.dumps({"m": {key: [1, 2, 3]}}))
+            before = REGISTRY.snapshot()["m"][key]
+            REGISTRY.retire(999991)
+            REGISTRY.retire(999992)
+            self.assertEqual(sorted(p.name for p in Path(d).glob("*.json")), ["dead.json"])
+            self.assertEqual(before, [2, 4, 6])
+            self.assertEqual(REGISTRY.snapshot()["m"][key], before)
+
+
+# ===================== Voucher parser =====================
+class VoucherParserTests(SimpleTestCase):
+    def code(self, text):
+        return smart_parse(text)["voucher_code"]
+
+    def test_voucher_code_forms(self):
+        cases = {
+            "Voucher: V-99": "V-99",
+            "Voucher Code: HB2025091477": "HB2025091477",
+            "Voucher No : 5521190": "5521190",
+            "VOUCHER # tc55310v": "tc55310v",
+            "Voucher:\n  V-99\n": "V-99",  # الكود في السطر اللي بعده
+        }
+        for text, want in cases.items():
+            self.assertEqual(self.code(text), want, text)
+
+    def test_voucher_word_in_titles_and_prose_is_skipped(self):
+        self.assertEqual(self.code("HOTEL SERVICE VOUCHER\nPage 1 of 3\nVoucher: V-99"), "V-99")
+        self.assertEqual(self.code("Please present this voucher upon arrival\nVoucher No: 77"), "77")
+        # كود من حروف بس مش بيتقري (متوثق في DEFAULT_EXTRACTORS)
+        self.assertIsNone(self.code("Voucher: ABCDEF"))
+        self.assertIsNone(self.code("no code here"))
+
+    def test_supplier_samples(self):
+        # كل قالب عنده عينة في voucher_samples والحقول كلها مطابقة للـ expected.json
+        registry = get_registry()
+        matched = set()
+        for path in sorted((Path(__file__).parent / "voucher_samples").glob("*.txt")):
+            text = path.read_text(encoding="utf-8")
+            template = registry.match(text)
+            matched.add(template and template.key)
+            got = registry.parse(text, template)
+            expected = json.loads(path.with_name(path.stem + ".expected.json").read_text(encoding="utf-8"))
+            for field, want in expected.items():
+                have = got.get(field)
+                self.assertEqual(have.isoformat() if hasattr(have, "isoformat") else have, want, f"{path.stem}.{field}")
+        self.assertLessEqual({t.key for t in registry.templates}, matched)
+
+    def test_dates_and_numbers(self):
+        data = smart_parse("Check-in: 22-Nov-25\nCheck out date : 25/11/2025\nNights: 3\nNo. of rooms: 2")
+        self.assertEqual((data["checkin"], data["checkout"]), (date(2025, 11, 22), date(2025, 11, 25)))
+        self.assertEqual((data["nights"], data["rooms_count"]), (3, 2))
+
+
+# ===================== Reports =====================
+class ReportExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "x")
+        card = UniBookingCard.objects.create(customer_name="Customer", mobile="0100000000", created_by=self.admin)
+        for i in range(3):
+            HotelBooking.objects.create(
+                card=card, booking_ref=f"H{i}", employee_name="admin", hotel_name="Hilton",
+                checkin=date.today(), checkout=date.today() + timedelta(days=3), nights=3,
+            )
+            FlightBooking.objects.create(card=card, booking_code=f"F{i}", airline="EgyptAir", pnr=f"P{i}",
+                                         net_price=Decimal("200"), sell_price=Decimal("230"))
+        self.request = RequestFactory().get(reverse("reports_export_pdf"))
+        self.request.user = self.admin
+
+    def test_limit_is_per_kind(self):
+        kinds = Counter(row[0] for row in _export_rows(self.request, limit=2))
+        self.assertEqual((kinds["Hotel"], kinds["Flight"]), (2, 2))
+
+    def test_extra_column(self):
+        extra = {(row[0], row[6]) for row in _export_rows(self.request)}
+        self.assertIn(("Hotel", "Hilton / -"), extra)  # من غير country
+        self.assertIn(("Flight", "EgyptAir P0"), extra)
+
+
+# ===================== Protected media =====================
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEDIA_SENDFILE="", USE_S3=False)
+class ProtectedMediaTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="x")
+        card = UniBookingCard.objects.create(customer_name="Customer", mobile="0100000000", created_by=self.owner)
+        booking = HotelBooking.objects.create(
+            card=card, booking_ref="R1", employee_name="owner", hotel_name="Hilton",
+            checkin=date.today(), checkout=date.today() + timedelta(days=3), nights=3,
+        )
+        payment = Payment.objects.create(booking_hotel=booking, paid_amount=Decimal("10"), method="cash",
+                                         invoice_file=SimpleUploadedFile("invoice.pdf", b"%PDF-1.4 invoice"))
+        self.name = payment.invoice_file.name
+        self.storage = payment.invoice_file.storage
+
+    def get(self, user, name=None, **extra):
+        if user:
+            self.client.force_login(user)
+        response = self.client.get(reverse("protected_media", args=[name or self.name]), **extra)
+        if response.streaming:
+            response.body = b"".join(response.streaming_content)
+        return response
+
+    def test_owner_and_superuser_only(self):
+        self.assertEqual(self.get(self.owner).body, b"%PDF-1.4 invoice")
+        self.assertEqual(self.get(User.objects.create_superuser("admin", "a@example.com", "x")).status_code, 200)
+        self.assertEqual(self.get(User.objects.create_user("other", password="x")).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.get(None).status_code, 302)  # login
+
+    def test_parent_path_rejected(self):
+        admin = User.objects.create_superuser("admin", "a@example.com", "x")
+        self.assertEqual(self.get(admin, "blobs/../" + self.name).status_code, 404)
+
+    def test_preview_follows_its_file(self):
+        self.storage.save_derived(self.name + PREVIEW_SUFFIX, b"webp")
+        response = self.get(self.owner, self.name + PREVIEW_SUFFIX)
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "image/webp"))
+        self.assertEqual(self.get(User.objects.create_user("other", password="x"),
+                                  self.name + PREVIEW_SUFFIX).status_code, 404)
+
+    def test_range_request(self):
+        response = self.get(self.owner, HTTP_RANGE="bytes=0-3")
+        self.assertEqual((response.status_code, response.body), (206, b"%PDF"))
+        self.assertEqual(response["Content-Range"], "bytes 0-3/16")
+        self.assertEqual(self.get(self.owner, HTTP_RANGE="bytes=-7").body, b"invoice")
+        self.assertEqual(self.get(self.owner, HTTP_RANGE="bytes=99-").status_code, 416)
+
+
+# ===================== Conditional GET =====================
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", password="x")
+        self.card = UniBookingCard.objects.create(customer_name="Customer", mobile="0100000000", created_by=self.owner)
+        self.booking = HotelBooking.objects.create(
+            card=self.card, booking_ref="R1", employee_name="owner", hotel_name="Hilton", country="Egypt",
+            checkin=date.today(), checkout=date.today() + timedelta(days=3), nights=3,
+        )
+        self.client.force_login(self.owner)
+        self.urls = [reverse("hotel_voucher", args=[self.booking.pk]), reverse("card_detail", args=[self.card.pk])]
+
+    def etags(self):
+        etags = []
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            etags.append(response["ETag"])
+        return etags
+
+    def assert_fresh(self, etags, status):
+        for url, etag in zip(self.urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status, url)
+
+    def test_repeat_request_is_304(self):
+        first = self.etags()
+        self.assert_fresh(first, 304)
+        response = self.client.get(self.urls[0])
+        self.assertEqual(self.client.get(self.urls[0], HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304)
+
+    def test_edits_change_the_etag(self):
+        edits = [
+            lambda: self.booking.save(),
+            lambda: self.card.save(),
+            lambda: Payment.objects.create(booking_hotel=self.booking, paid_amount=Decimal("10"), method="cash"),
+        ]
+        etags = self.etags()
+        for edit in edits:
+            edit()
+            self.assert_fresh(etags, 200)
+            new = self.etags()
+            self.assertTrue(all(a != b for a, b in zip(etags, new)))
+            etags = new
+
+    def test_pending_message_is_never_304(self):
+        payment = Payment.objects.create(booking_hotel=self.booking, paid_amount=Decimal("10"), method="cash")
+        etag = self.etags()[1]
+        # غير الـ superuser ميقدرش يعدّل دفعة: رسالة + redirect للكارت من غير أي تعديل في الداتا
+        self.assertRedirects(self.client.get(reverse("payment_edit", args=[payment.pk])), self.urls[1],
+                             fetch_redirect_response=False)
+        response = self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "ليس لديك صلاحية")
+        self.assertEqual(self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+# ===================== Upload cache =====================
+class UploadCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(VOUCHER_CACHE_DIR=Path(self.tmp.name), VOUCHER_CACHE_MAX_BYTES=1000)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_walks_only_past_the_limit(self):
+        entry = {"text": "x" * 200}
+        with mock.patch("core.services.upload_cache.os.walk", side_effect=os.walk) as walk:
+            upload_cache.put("a" * 64, entry)  # أول كتابة: الحجم لسه مش معروف
+            self.assertEqual(walk.call_count, 1)
+            for c in "bcd":
+                upload_cache.put(c * 64, entry)
+            self.assertEqual(walk.call_count, 1)
+            upload_cache.put("e" * 64, entry)  # 5 × ~215 بايت > 1000
+            self.assertEqual(walk.call_count, 2)
+        self.assertIsNone(upload_cache.get("a" * 64))  # الأقدم اتمسح
+        self.assertEqual(upload_cache.get("e" * 64), entry)
+
+
+# ===================== Voucher ingestion =====================
+@override_settings(USE_S3=False, VOUCHER_INGEST_INLINE=False)
+class IngestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from docx import Document
+
+        super().setUpClass()
+        # مرة واحدة: الـ zip بتاع الـ docx فيه وقت الحفظ، فملفين من نفس السطور ممكن يطلعوا hash مختلف
+        doc, buf = Document(), BytesIO()
+        for line in ("Booking Ref: 102-4478123", "Hotel Name: Jumeirah Beach Hotel",
+                     "Check-In: 14/10/2025", "Check-Out: 18/10/2025", "Rooms: 2"):
+            doc.add_paragraph(line)
+        doc.save(buf)
+        cls.voucher_bytes = buf.getvalue()
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(MEDIA_ROOT=Path(self.tmp.name, "media"),
+                                     VOUCHER_CACHE_DIR=Path(self.tmp.name, "cache"))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user("agent", password="x")
+        self.card = UniBookingCard.objects.create(customer_name="Customer", mobile="0100000000", created_by=self.user)
+        self.client.force_login(self.user)
+
+    def upload(self, name="voucher.txt", data=b"Hotel Name: Hilton"):
+        return SimpleUploadedFile(name, data)
+
+    def test_bad_ingest_param_is_404(self):
+        url = reverse("hotel_create", args=[self.card.pk])
+        self.assertEqual(self.client.get(url + "?ingest=abc").status_code, 404)
+        self.assertEqual(self.client.get(url + "?ingest=999").status_code, 404)
+
+    def test_failed_batch_leaves_no_blobs(self):
+        storage = VoucherIngestJob._meta.get_field("file").storage
+        kept = create_jobs([self.upload("kept.txt", b"already stored")], self.user)[0].file.name
+        files = [self.upload("a.txt", b"new bytes"), self.upload("b.txt", b"already stored")]
+        with mock.patch.object(VoucherIngestJob, "save", side_effect=[None, RuntimeError("boom")]):
+            with self.assertRaises(RuntimeError):
+                create_jobs(files, self.user)
+        self.assertEqual(VoucherIngestJob.objects.count(), 1)
+        self.assertEqual(StoredBlob.objects.count(), 1)
+        self.assertTrue(storage.exists(kept))
+        self.assertEqual(StoredBlob.objects.get(name=kept).refcount, 1)
+        on_disk = [n for d, _, names in os.walk(storage.location) if not d.endswith("tmp") for n in names]
+        self.assertEqual(len(on_disk), 1)
+
+    def voucher(self):
+        return self.upload("voucher.docx", self.voucher_bytes)
+
+    def test_create_jobs_hashes_and_flags_duplicates(self):
+        first, second = create_jobs([self.voucher(), self.voucher()], self.user, card=self.card)
+        self.assertEqual(len(first.content_hash), 64)
+        self.assertEqual(first.content_hash, second.content_hash)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual((first.is_duplicate, second.is_duplicate), (False, True))
+        self.assertEqual(first.status, VoucherIngestJob.STATUS_PENDING)
+        self.assertEqual(first.card, self.card)
+        self.assertEqual(StoredBlob.objects.get(name=first.file.name).refcount, 2)
+
+    def test_create_jobs_reuses_cached_result(self):
+        job = create_jobs([self.voucher()], self.user)[0]
+        self.assertEqual(process_job(job.pk), VoucherIngestJob.STATUS_DONE)
+        again = create_jobs([self.voucher()], self.user)[0]
+        self.assertEqual(again.status, VoucherIngestJob.STATUS_DONE)
+        self.assertTrue(again.is_duplicate)
+        self.assertEqual(again.result, VoucherIngestJob.objects.get(pk=job.pk).result)
+
+    def test_inline_jobs_start_after_commit(self):
+        with override_settings(VOUCHER_INGEST_INLINE=True), \
+                mock.patch("core.services.ingest.submit_on_commit") as submit:
+            job = create_jobs([self.voucher()], self.user)[0]
+        submit.assert_called_once_with("ingest", process_job, job.pk)
+
+    def test_process_job_reads_voucher(self):
+        job = create_jobs([self.voucher()], self.user)[0]
+        self.assertEqual(process_job(job.pk), VoucherIngestJob.STATUS_DONE)
+        job.refresh_from_db()
+        self.assertTrue(job.needs_review)
+        self.assertIsNotNone(job.started_at)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn("Jumeirah", job.text)
+        self.assertEqual(job.result["hotel_name"], "Jumeirah Beach Hotel")
+        self.assertEqual(job.result["checkin"], "2025-10-14")
+
+    def test_process_job_claims_once(self):
+        job = create_jobs([self.voucher()], self.user)[0]
+        VoucherIngestJob.objects.filter(pk=job.pk).update(status=VoucherIngestJob.STATUS_RUNNING)
+        # عامل تاني أخد الشغلانة: الـ update المشروط بيرجع 0
+        self.assertEqual(process_job(job.pk), "skipped")
+        self.assertEqual(VoucherIngestJob.objects.get(pk=job.pk).status, VoucherIngestJob.STATUS_RUNNING)
+
+    def test_process_job_failure(self):
+        job = create_jobs([self.upload("notes.txt", b"plain text")], self.user)[0]
+        with self.assertLogs("core.services.ingest", "ERROR"):
+            self.assertEqual(process_job(job.pk), VoucherIngestJob.STATUS_FAILED)
+        job.refresh_from_db()
+        self.assertIn("غير مدعوم", job.error)
+        self.assertFalse(job.needs_review)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_requeue_stale_jobs(self):
+        stale, fresh = create_jobs([self.voucher(), self.upload()], self.user)
+        VoucherIngestJob.objects.filter(pk=stale.pk).update(
+            status=VoucherIngestJob.STATUS_RUNNING, started_at=timezone.now() - timedelta(minutes=30))
+        VoucherIngestJob.objects.filter(pk=fresh.pk).update(
+            status=VoucherIngestJob.STATUS_RUNNING, started_at=timezone.now())
+        self.assertEqual(requeue_stale_jobs(15), 1)
+        stale.refresh_from_db()
+        self.assertEqual((stale.status, stale.started_at), (VoucherIngestJob.STATUS_PENDING, None))
+        self.assertEqual(VoucherIngestJob.objects.get(pk=fresh.pk).status, VoucherIngestJob.STATUS_RUNNING)
+
+    def test_booking_initial(self):
+        job = VoucherIngestJob(result={
+            "hotel_name": "Hilton", "checkin": "2025-10-14", "country": "", "room_type": None,
+            "customer_display_name": "MR AHMED", "rooms_count": 2,
+        })
+        self.assertEqual(booking_initial(job), {"hotel_name": "Hilton", "checkin": "2025-10-14", "rooms_count": 2})
+        self.assertEqual(booking_initial(VoucherIngestJob(result=None)), {})
+
+    def test_review_prefills_hotel_form(self):
+        job = create_jobs([self.voucher()], self.user, card=self.card)[0]
+        process_job(job.pk)
+        response = self.client.get(reverse("hotel_create", args=[self.card.pk]) + f"?ingest={job.pk}")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'value="Jumeirah Beach Hotel"')
+        # فاوتشر موظف تاني مش بيتفتح حتى على كارت المستخدم نفسه
+        other = User.objects.create_user("other", password="x")
+        card = UniBookingCard.objects.create(customer_name="Other", mobile="0100000001", created_by=other)
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse("hotel_create", args=[card.pk]) + f"?ingest={job.pk}").status_code, 404)
+
+
+# ===================== Voucher extraction =====================
+def _pdf(*pages):
+    import fitz
+
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    return doc.tobytes()
+
+
+class ExtractionTests(SimpleTestCase):
+    def test_backend_selection(self):
+        self.assertEqual(get_pdf_backend().name, "pymupdf")
+        self.assertEqual(get_pdf_backend(layout=True).name, "pdfplumber")
+        with override_settings(VOUCHER_PDF_BACKEND="pdfplumber"):
+            self.assertEqual(get_pdf_backend().name, "pdfplumber")
+        with mock.patch.object(PDF_BACKENDS["pymupdf"], "available", return_value=False):
+            self.assertEqual(get_pdf_backend().name, "pdfplumber")
+            with mock.patch.object(PDF_BACKENDS["pdfplumber"], "available", return_value=False):
+                with self.assertRaises(RuntimeError):
+                    get_pdf_backend(layout=True)
+
+    def test_max_pages(self):
+        data = _pdf("Hotel Name: Hilton", "Check-In: 14/10/2025", "Terms and conditions")
+        for backend in ("pymupdf", "pdfplumber"):
+            with self.subTest(backend=backend), override_settings(VOUCHER_PDF_BACKEND=backend, VOUCHER_MAX_PAGES=2):
+                text = extract_text(BytesIO(data), "voucher.PDF")
+                self.assertIn("Hilton", text)
+                self.assertIn("14/10/2025", text)
+                self.assertNotIn("Terms", text)
+        with override_settings(VOUCHER_MAX_PAGES=None):
+            self.assertIn("Terms", extract_text(BytesIO(data), "voucher.pdf", layout=True))
+        self.assertIsNone(extract_text(BytesIO(data), "voucher.txt"))
+
+    def test_docx_tables_headers_and_footers(self):
+        from docx import Document
+        from docx.enum.section import WD_SECTION
+
+        doc = Document()
+        doc.sections[0].header.paragraphs[0].text = "HOTELBEDS - SERVICE VOUCHER"
+        doc.sections[0].footer.paragraphs[0].text = "Payable through Hotelbeds"
+        doc.add_paragraph("Booking Ref: 102-4478123")
+        table = doc.add_table(rows=2, cols=3)
+        table.cell(0, 0).merge(table.cell(0, 2)).text = "Hotel Name: Jumeirah Beach Hotel"
+        table.cell(1, 0).text = "Check-In: 14/10/2025"
+        table.cell(1, 1).add_table(rows=1, cols=1).cell(0, 0).text = "Rooms: 2"
+        doc.add_paragraph("Remarks")
+        doc.add_section(WD_SECTION.NEW_PAGE)  # الهيدر مربوط بالأول: ميتكررش
+        buf = BytesIO()
+        doc.save(buf)
+
+        text = extract_text(SimpleUploadedFile("v.docx", buf.getvalue()), "v.docx")
+        self.assertEqual(text.split("\n"), [
+            "HOTELBEDS - SERVICE VOUCHER",
+            "Booking Ref: 102-4478123",
+            "Hotel Name: Jumeirah Beach Hotel",
+            "Check-In: 14/10/2025\tRooms: 2",
+            "Remarks",
+            "Payable through Hotelbeds",
+        ])
+
+
+@override_settings(VOUCHER_MAX_PAGES=3, OCR_DPI=20, OCR_LANG="eng")
+class OcrTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(OCR_CACHE_DIR=Path(self.tmp.name))
+        override.enable()
+        self.addCleanup(override.disable)
+        # tesseract مش لازم يبقى متسطب: الـ OCR نفسه بيرجع اسم الصفحة
+        for target, kwargs in [
+            ("core.services.ocr.is_available", {"return_value": True}),
+            ("core.services.ocr.multiprocessing.parent_process", {"return_value": object()}),
+            ("core.services.ocr._recognise", {"side_effect": lambda png, lang, timeout: Path(png).stem}),
+        ]:
+            patcher = mock.patch(target, **kwargs)
+            setattr(self, target.rsplit(".", 1)[-1].lstrip("_"), patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def test_reads_up_to_max_pages(self):
+        text = ocr.ocr_bytes(_pdf("one", "two", "three", "four"), "scan.pdf")
+        self.assertEqual(text.split("\n"), ["page-000-20", "page-001-20", "page-002-20"])
+
+    def test_partial_cache_renders_missing_pages(self):
+        data = _pdf("one", "two", "three")
+        ocr.ocr_bytes(data, "scan.pdf", digest="d" * 64)
+        self.assertEqual(self.recognise.call_count, 3)
+        folder = Path(self.tmp.name, "dd", "d" * 64)
+        for name in ("page-001-20.png", "page-001-20.eng.txt", "page-002-20.png", "page-002-20.eng.txt"):
+            (folder / name).unlink()
+
+        self.recognise.reset_mock()
+        text = ocr.ocr_bytes(data, "scan.pdf", digest="d" * 64)
+        self.assertEqual(text.split("\n"), ["page-000-20", "page-001-20", "page-002-20"])
+        self.assertEqual([Path(c.args[0]).name for c in self.recognise.call_args_list],
+                         ["page-001-20.png", "page-002-20.png"])
+
+        self.recognise.reset_mock()
+        with mock.patch("fitz.open") as fitz_open:
+            self.assertEqual(ocr.ocr_bytes(data, "scan.pdf", digest="d" * 64), text)
+        fitz_open.assert_not_called()
+        self.recognise.assert_not_called()
+
+
+# ===================== Receipts =====================
+def _photo(size, fmt="JPEG", mode="RGB", orientation=None):
+    img = Image.frombytes(mode, size, os.urandom(size[0] * size[1] * len(mode)))
+    buf = BytesIO()
+    if orientation:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(buf, format=fmt, exif=exif)
+    else:
+        img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+@override_settings(RECEIPT_MAX_PX=400, RECEIPT_MAX_BYTES=600 * 1024, RECEIPT_JPEG_QUALITY=82)
+class ReceiptTests(TestCase):
+    def test_small_receipt_is_kept(self):
+        self.assertIsNone(images.recompress(_photo((300, 200)), "receipt.jpg"))
+
+    def test_exif_orientation_is_applied(self):
+        data, ext = images.recompress(_photo((600, 200), orientation=6), "receipt.jpg")
+        self.assertEqual(ext, "jpg")
+        with Image.open(BytesIO(data)) as img:
+            self.assertEqual(img.size, (133, 400))
+            self.assertNotIn(0x0112, img.getexif())
+
+    def test_quality_steps_down_to_fit(self):
+        qualities = []
+        save = Image.Image.save
+
+        def record(img, fp, format=None, **params):
+            qualities.append(params.get("quality"))
+            return save(img, fp, format, **params)
+
+        data = _photo((500, 500), fmt="PNG")
+        with mock.patch.object(Image.Image, "save", record):
+            images.recompress(data, "receipt.png")
+            self.assertEqual(qualities, [82])
+            qualities.clear()
+            with override_settings(RECEIPT_MAX_BYTES=1000):
+                images.recompress(data, "receipt.png")
+            self.assertEqual(qualities, [82, 72, 62])
+
+    def test_transparent_png_stays_png(self):
+        data, ext = images.recompress(_photo((800, 800), fmt="PNG", mode="RGBA"), "receipt.png")
+        self.assertEqual(ext, "png")
+        with Image.open(BytesIO(data)) as img:
+            self.assertEqual((img.mode, img.size), ("RGBA", (400, 400)))
+
+    def process(self):
+        user = User.objects.create_user("agent", password="x")
+        card = UniBookingCard.objects.create(customer_name="Customer", mobile="0100000000", created_by=user)
+        booking = HotelBooking.objects.create(card=card, booking_ref="R1", employee_name="agent", hotel_name="Hilton")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with override_settings(MEDIA_ROOT=tmp.name, USE_S3=False), \
+                mock.patch("core.services.previews.schedule"):
+            payment = Payment.objects.create(
+                booking_hotel=booking, paid_amount=Decimal("10"), method="cash",
+                bank_file=SimpleUploadedFile("receipt.jpg", _photo((800, 600))),
+            )
+            old = payment.bank_file.name
+            new = images.process_payment_receipt(payment.pk, old)
+            payment.refresh_from_db()
+            self.assertNotEqual(new, old)
+            self.assertEqual(payment.bank_file.name, new)
+            return payment, old, payment.bank_file.storage.exists(old)
+
+    def test_original_is_dropped(self):
+        payment, old, exists = self.process()
+        self.assertFalse(exists)
+        self.assertFalse(payment.bank_file_original)
+        self.assertFalse(StoredBlob.objects.filter(name=old).exists())
+
+    @override_settings(RECEIPT_KEEP_ORIGINAL=True)
+    def test_original_is_kept(self):
+        payment, old, exists = self.process()
+        self.assertTrue(exists)
+        self.assertEqual(payment.bank_file_original.name, old)
+        self.assertEqual(StoredBlob.objects.get(name=old).refcount, 1)
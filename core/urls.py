@@ -48,4 +48,14 @@ urlpatterns = [
     # Voucher Upload & Generate
     path("voucher/upload/", views.voucher_upload, name="voucher_upload"),
     path("voucher/generate/", views.voucher_generate, name="voucher_generate"),
+    path("voucher/ingest/", views.voucher_ingest, name="voucher_ingest"),
+    path("voucher/ingest/<int:job_pk>/review/", views.voucher_ingest_review, name="voucher_ingest_review"),
+    path("voucher/ingest/<int:job_pk>/dismiss/", views.voucher_ingest_dismiss, name="voucher_ingest_dismiss"),
+
+    # Prometheus
+    path("metrics", views.metrics_view, name="metrics"),
+
+    # Profiles
+    path("profiles/", views.profiles, name="profiles"),
+    path("profiles/<str:name>/<str:filename>", views.profile_file, name="profile_file"),
 ]
\ No newline at end of file
@@ -1,23 +1,28 @@
 # core/views.py
-import io, base64, csv, re, tempfile
+import asyncio, csv, hashlib, hmac, os
 from decimal import Decimal
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
 from collections import Counter
+from functools import partial
 
 
 # Django
-from django.http import JsonResponse, HttpResponse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, JsonResponse, HttpResponse, Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Count, Q, DecimalField, Value as V
+from django.db.models import Sum, Count, Q, DecimalField, OuterRef, Prefetch, Subquery, Value as V
 from django.db.models.functions import Coalesce, ExtractMonth
+from django.template import TemplateDoesNotExist
 from django.template.loader import get_template, render_to_string
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.dateparse import parse_date
 from django.utils.html import format_html
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods, require_POST
 from django.forms import inlineformset_factory
 from .models import UniBookingCard, HotelBooking, Room # تأكد من استيراد Room
 from .forms import HotelBookingForm, RoomForm # تأكد من استيراد RoomForm
@@ -26,41 +31,96 @@ from .forms import HotelBookingForm, RoomForm # تأكد من استيراد Roo
 # Models & Forms
 from .models import (
     UniBookingCard, HotelBooking, Payment,
-    FlightBooking, TransferBooking, VisaBooking
+    FlightBooking, TransferBooking, VisaBooking,
+    VoucherIngestJob,
 )
 from .forms import (
     UniBookingCardForm, HotelBookingForm, PaymentForm,
     FlightBookingForm, 
     TransferBookingForm, VisaBookingForm,
-    VoucherUploadForm, VoucherConfirmForm
+    VoucherUploadForm, VoucherConfirmForm, VoucherIngestForm,
 )
+from .services.ingest import booking_initial, create_jobs, read_voucher
+from .services import media
+from .services.payments import payment_summary, record_payment
+from .services.pdf import render_pdf
+from .services.qr import build_qr_data_url
+from .services.workers import run_async
+from .db_router import read_only
+from . import metrics, profiling
+from .services.previews import PREVIEW_SUFFIX, ready_previews
+from .storage import get_blob_storage
 
 
 
-# External
-from xhtml2pdf import pisa
-import qrcode
-from qrcode.image.pil import PilImage
-import pdfplumber
-from docx import Document
-
 # ===================== Helpers =====================
-def _build_qr_data_url(text: str) -> str:
-    qr = qrcode.QRCode(version=1, box_size=4, border=1)
-    qr.add_data(text); qr.make(fit=True)
-    img: PilImage = qr.make_image(fill_color="black", back_color="white")
-    buf = io.BytesIO(); img.save(buf, format='PNG')
-    return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode('ascii')}"
-
-def _render_pdf_from_template(template_name: str, context: dict) -> bytes:
-    html = get_template(template_name).render(context)
-    out = io.BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=out, encoding='utf-8')
-    return None if pisa_status.err else out.getvalue()
-
 def _cards_base_qs(request):
     return UniBookingCard.objects.all() if request.user.is_superuser else UniBookingCard.objects.filter(created_by=request.user)
 
+def _related_count(model):
+    counts = model.objects.filter(card=OuterRef('pk')).order_by().values('card').annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counts[:1]), 0)
+
+# ===================== Conditional GET (ETag / Last-Modified) =====================
+def _template_mtime(name):
+    try:
+        return os.path.getmtime(get_template(name).origin.name)
+    except (TemplateDoesNotExist, OSError):
+        return 0
+
+
+def _page_state(request, stamps, templates, *key):
+    """(etag, last_modified) من updated_at + اليوم (التاريخ المطبوع) + آخر تعديل في الـ templates."""
+    if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+        return None  # رسالة مستنية تتعرض = لازم نرسم الصفحة
+    mtime = max(_template_mtime(t) for t in templates)
+    midnight = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    last_modified = max([*stamps, midnight, datetime.fromtimestamp(mtime, tz=dt_timezone.utc)])
+    raw = '|'.join(map(str, (
+        *key, *(s.isoformat() for s in stamps), timezone.localdate(), mtime,
+        request.user.pk, getattr(request, 'LANGUAGE_CODE', ''), request.get_host(),
+    )))
+    # weak: الـ PDF مش لازم يطلع نفس البايتات بالظبط
+    return f'W/"{hashlib.md5(raw.encode()).hexdigest()}"', last_modified
+
+
+def _conditional(get_state):
+    """@condition بحالة واحدة محسوبة مرة لكل request (get_state بيرجع None = من غير 304)."""
+    def state(request, *args, **kwargs):
+        if not hasattr(request, '_page_state'):
+            request._page_state = get_state(request, *args, **kwargs)
+        return request._page_state
+
+    def etag(request, *args, **kwargs):
+        st = state(request, *args, **kwargs)
+        return st and st[0]
+
+    def last_modified(request, *args, **kwargs):
+        st = state(request, *args, **kwargs)
+        return st and st[1]
+
+    def decorator(view):
+        # no-cache: المتصفح يسأل كل مرة (ويستلم 304) بدل ما يعرض نسخة قديمة بعد التعديل
+        return cache_control(private=True, no_cache=True)(condition(etag, last_modified)(view))
+    return decorator
+
+
+def _voucher_state(model, *templates):
+    def get_state(request, booking_pk):
+        b = (model.objects.filter(pk=booking_pk).select_related('card')
+             .only('updated_at', 'card__updated_at', 'card__created_by').first())
+        if b is None or (not request.user.is_superuser and b.card.created_by_id != request.user.pk):
+            return None  # الـ view يرجّع 404 أو "غير مسموح" زي ما هو
+        return _page_state(request, [b.updated_at, b.card.updated_at], templates, model._meta.label, b.pk)
+    return _conditional(get_state)
+
+
+def _card_state(request, pk):
+    card = UniBookingCard.objects.filter(pk=pk).only('updated_at').first()
+    if card is None:
+        return None
+    return _page_state(request, [card.updated_at], ['core/card_detail.html', 'core/base.html'], 'card', card.pk)
+
 # ===================== Dashboard / Cards =====================
 @login_required
 def dashboard(request):
@@ -73,6 +133,11 @@ def dashboard(request):
             Q(mobile__icontains=q)
         )
     from django.core.paginator import Paginator
+    # عدد الحجوزات لكل كارت في نفس الاستعلام (subquery بتتحسب لصفوف الصفحة بس)
+    qs = qs.annotate(
+        hotels_count=_related_count(HotelBooking), flights_count=_related_count(FlightBooking),
+        transfers_count=_related_count(TransferBooking), visas_count=_related_count(VisaBooking),
+    )
     paginator = Paginator(qs.order_by("-created_at"), 12)
     page_obj = paginator.get_page(request.GET.get("page"))
     return render(request, "core/dashboard.html", {"cards": page_obj, "q": q})
@@ -94,14 +159,28 @@ def card_create(request):
         form = UniBookingCardForm()
     return render(request, 'core/card_form.html', {'form': form})
 @login_required
+@_conditional(_card_state)
 def card_detail(request, pk):
-    card = get_object_or_404(UniBookingCard, pk=pk)
+    # كل الحجوزات بتتجاب مرة واحدة؛ المدفوع لكل حجز فندق annotate بدل استعلام لكل صف
+    card = get_object_or_404(
+        UniBookingCard.objects.select_related('created_by').prefetch_related(
+            Prefetch('hotelbooking_set', queryset=HotelBooking.objects.annotate(paid_sum=Coalesce(
+                Sum('payments__paid_amount'), V(0), output_field=DecimalField()))),
+            'flightbooking_set', 'transferbooking_set', 'visabooking_set',
+        ),
+        pk=pk,
+    )
 
     # حجوزات
     hotel_bookings = card.hotelbooking_set.all()
     flight_bookings = card.flightbooking_set.all()
     transfer_bookings = card.transferbooking_set.all()
     visa_bookings = card.visabooking_set.all()
+    for b in transfer_bookings:
+        b.display_kind = 'transfer'
+    for b in visa_bookings:
+        b.display_kind = 'visa'
+    other_bookings = sorted([*transfer_bookings, *visa_bookings], key=lambda b: b.created_at, reverse=True)
 
     # إجماليات
     totals = {
@@ -118,6 +197,7 @@ def card_detail(request, pk):
         "flight_bookings": flight_bookings,
         "transfer_bookings": transfer_bookings,
         "visa_bookings": visa_bookings,
+        "other_bookings": other_bookings,
         "totals": totals,
     })
 
@@ -143,13 +223,15 @@ def cards_bulk_export(request):
         'ID','UB Code','Customer','Mobile','Nationality','Country',
         'Hotels','Flights','Transfers','Visas','Created At'
     ])
-    for c in qs:
+    n = 0
+    for n, c in enumerate(qs, 1):
         writer.writerow([
             c.id, c.ub_code, c.customer_name, c.mobile or '',
             c.nationality or '', c.country or '',
             c.hotels_count, c.flights_count, c.transfers_count, c.visas_count,
             c.created_at.isoformat() if c.created_at else ''
         ])
+    metrics.EXPORT_ROWS.observe(n, format='cards_csv')
     return resp
 # ===================== Cards Bulk Delete =====================
 @login_required
@@ -189,6 +271,15 @@ def hotel_create(request, card_pk):
         can_delete=False
     )
 
+    # حجز جاي من طابور مراجعة الفاوتشرات المرفوعة
+    ingest_job = None
+    if request.GET.get('ingest'):
+        try:
+            ingest_pk = int(request.GET['ingest'])
+        except ValueError:
+            raise Http404
+        ingest_job = get_object_or_404(VoucherIngestJob, pk=ingest_pk, created_by=request.user)
+
     if request.method == 'POST':
         form = HotelBookingForm(request.POST)
         room_formset = RoomFormSet(request.POST, prefix='rooms')
@@ -208,6 +299,10 @@ def hotel_create(request, card_pk):
             room_formset.instance = hb
             room_formset.save()
 
+            if ingest_job:
+                ingest_job.booking = hb
+                ingest_job.save(update_fields=['booking'])
+
             messages.success(request, f"تم حفظ حجز الفندق. فوّتشر: {hb.voucher_code}")
             return redirect('hotel_payment', booking_pk=hb.pk)
         else:
@@ -218,7 +313,7 @@ def hotel_create(request, card_pk):
                 messages.error(request, "يرجى التحقق من بيانات أسماء النزلاء في الغرف.")
 
     else:
-        form = HotelBookingForm()
+        form = HotelBookingForm(initial=booking_initial(ingest_job) if ingest_job else None)
         room_formset = RoomFormSet(prefix='rooms')
 
     return render(request, 'core/hotel_form.html', {
@@ -230,93 +325,76 @@ def hotel_create(request, card_pk):
 
 @login_required
 def hotel_payment(request, booking_pk):
-    booking = get_object_or_404(HotelBooking, pk=booking_pk)
-    payments = booking.payments.order_by("-created_at")
-
-    # حساب الإجماليات بناءً على الدفعات المسجلة
-    total_paid = payments.aggregate(total=Sum("paid_amount"))["total"] or Decimal("0.00")
-    
-    # سعر البيع والنت يؤخذ من الحجز نفسه
-    total_sell = booking.sell or Decimal("0.00")
-    total_net = booking.net or Decimal("0.00")
-    
-    remaining = total_sell - total_paid
-    profit = total_sell - total_net
-
     if request.method == "POST":
-        # نمرر معلومات إضافية للفورم، مثل هل توجد دفعات سابقة أم لا
-        form = PaymentForm(
-            request.POST,
-            request.FILES,
-            booking=booking,
-            has_existing_payments=payments.exists()
+        # الحجز بيتقفل (select_for_update) لحد ما الدفعة تتحفظ: موظفين على نفس الحجز مش هيدفعوا أكتر من المتبقي
+        result = record_payment(
+            booking_pk, request.POST, request.FILES,
+            employee_name=request.user.get_full_name() or request.user.username,
         )
-        
-        if form.is_valid():
-            new_payment = form.save(commit=False)
-            new_payment.booking_hotel = booking
-            new_payment.employee_name = request.user.get_full_name() or request.user.username
-
-            # إذا كانت هذه أول دفعة، قم بتحديث سعر الحجز الأساسي
-            if not payments.exists():
-                booking.net = form.cleaned_data.get('net_price', 0)
-                booking.sell = form.cleaned_data.get('sell_price', 0)
-                booking.save()
-                
-                remaining_after_sell_set = booking.sell - new_payment.paid_amount
+        booking, summary, form = result.booking, result.summary, result.form
+
+        if result.payment is not None:
+            remaining_after_payment = booking.sell - summary.paid - result.payment.paid_amount
+            if not summary.has_payments:
                 messages.success(
                     request,
-                    f"تم تسجيل أول دفعة وتحديد سعر الحجز. المتبقي الآن: {remaining_after_sell_set:.2f} KWD"
+                    f"تم تسجيل أول دفعة وتحديد سعر الحجز. المتبقي الآن: {remaining_after_payment:.2f} KWD"
                 )
             else:
-                remaining_after_payment = remaining - new_payment.paid_amount
                 messages.success(
                     request,
                     f"تم تسجيل دفعة جديدة. المتبقي الآن: {remaining_after_payment:.2f} KWD"
                 )
-
-            new_payment.save()
             return redirect("hotel_payment", booking_pk=booking.pk)
-        else:
-            messages.error(request, "من فضلك صحح الأخطاء في النموذج.")
+        messages.error(request, "من فضلك صحح الأخطاء في النموذج.")
     else:
-        form = PaymentForm(booking=booking, has_existing_payments=payments.exists())
+        booking = get_object_or_404(HotelBooking, pk=booking_pk)
+        # الإجماليات بناءً على الدفعات المسجلة، وسعر البيع والنت من الحجز نفسه
+        summary = payment_summary(booking)
+        form = PaymentForm(booking=booking, summary=summary)
 
+    payments = list(booking.payments.order_by("-created_at"))
     context = {
         "booking": booking,
         "form": form,
         "payments": payments,
-        "remaining": remaining,
-        "total_paid": total_paid,
-        "total_sell": total_sell,
-        "total_net": total_net,   # ✅ أضفت النت للـ context
-        "profit": profit,         # ✅ الربح متحسب وموجود
+        # المعاينات الجاهزة لكل ملفات الصفحة في استعلام واحد
+        "previews": ready_previews(
+            f for pay in payments for f in (pay.bank_file, pay.invoice_file, pay.voucher_original)
+        ),
+        "remaining": summary.remaining,
+        "total_paid": summary.paid,
+        "total_sell": summary.sell,
+        "total_net": summary.net,   # ✅ أضفت النت للـ context
+        "profit": summary.profit,   # ✅ الربح متحسب وموجود
     }
     return render(request, "core/hotel_payment.html", context)
 
 
 @login_required
+@_voucher_state(HotelBooking, 'core/voucher.html')
 def hotel_voucher(request, booking_pk):
     booking = get_object_or_404(HotelBooking, pk=booking_pk)
     if not request.user.is_superuser and booking.card.created_by != request.user:
         messages.error(request, "غير مسموح.")
         return redirect('dashboard')
     voucher_url = request.build_absolute_uri(reverse('hotel_voucher', args=[booking.pk]))
-    qr_data_url = _build_qr_data_url(voucher_url)
+    qr_data_url = build_qr_data_url(voucher_url)
     return render(request, 'core/voucher.html', {
         'booking': booking, 'today': timezone.localdate(), 'nights': booking.nights, 'qr_data_url': qr_data_url,
     })
 
 
 @login_required
+@_voucher_state(HotelBooking, 'core/voucher_pdf.html')
 def hotel_voucher_pdf(request, booking_pk):
     booking = get_object_or_404(HotelBooking, pk=booking_pk)
     if not request.user.is_superuser and booking.card.created_by != request.user:
         messages.error(request, "غير مسموح.")
         return redirect('dashboard')
     voucher_url = request.build_absolute_uri(reverse('hotel_voucher', args=[booking.pk]))
-    qr_data_url = _build_qr_data_url(voucher_url)
-    pdf_bytes = _render_pdf_from_template('core/voucher_pdf.html', {
+    qr_data_url = build_qr_data_url(voucher_url)
+    pdf_bytes = render_pdf('core/voucher_pdf.html', {
         'booking': booking, 'today': timezone.localdate(), 'nights': booking.nights, 'qr_data_url': qr_data_url,
     })
     if pdf_bytes is None:
@@ -354,6 +432,7 @@ def flight_create(request, card_pk):
 
 
 @login_required
+@_voucher_state(FlightBooking, 'core/flight_voucher.html')
 def flight_voucher(request, booking_pk):
     b = get_object_or_404(FlightBooking, pk=booking_pk)
     if not request.user.is_superuser and b.card.created_by != request.user:
@@ -361,7 +440,7 @@ def flight_voucher(request, booking_pk):
         return redirect("dashboard")
 
     url = request.build_absolute_uri(reverse("flight_voucher", args=[b.pk]))
-    qr = _build_qr_data_url(url)
+    qr = build_qr_data_url(url)
 
     return render(request, "core/flight_voucher.html", {
         "b": b,
@@ -371,6 +450,7 @@ def flight_voucher(request, booking_pk):
 
 
 @login_required
+@_voucher_state(FlightBooking, 'core/flight_voucher_pdf.html')
 def flight_voucher_pdf(request, booking_pk):
     b = get_object_or_404(FlightBooking, pk=booking_pk)
     if not request.user.is_superuser and b.card.created_by != request.user:
@@ -378,9 +458,9 @@ def flight_voucher_pdf(request, booking_pk):
         return redirect('dashboard')
 
     url = request.build_absolute_uri(reverse('flight_voucher', args=[b.pk]))
-    qr = _build_qr_data_url(url)
+    qr = build_qr_data_url(url)
 
-    pdf = _render_pdf_from_template('core/flight_voucher_pdf.html', {
+    pdf = render_pdf('core/flight_voucher_pdf.html', {
         'b': b, 'today': timezone.localdate(), 'qr_data_url': qr
     })
     if pdf is None:
@@ -401,6 +481,7 @@ def flight_payment(request, booking_pk):
         "paid": booking.sell_price,     # 🟢 الطيران مدفوع بالكامل
         "remaining": Decimal("0.00"),   # 🟢 مفيش أقساط
         "profit": booking.profit,       # 🟢 يجيب من الـ property
+        "previews": ready_previews((booking.payment_file, booking.invoice_file, booking.voucher_file)),
     }
     return render(request, "core/flight_payment.html", context)
 
@@ -433,6 +514,7 @@ def transfer_create(request, card_pk):
 
 
 @login_required
+@_voucher_state(TransferBooking, 'core/transfer_voucher.html')
 def transfer_voucher(request, booking_pk):
     b = get_object_or_404(TransferBooking, pk=booking_pk)
     if not request.user.is_superuser and b.card.created_by != request.user:
@@ -440,7 +522,7 @@ def transfer_voucher(request, booking_pk):
         return redirect('dashboard')
 
     url = request.build_absolute_uri(reverse('transfer_voucher', args=[b.pk]))
-    qr = _build_qr_data_url(url)
+    qr = build_qr_data_url(url)
 
     return render(request, 'core/transfer_voucher.html', {
         'b': b, 'today': timezone.localdate(), 'qr_data_url': qr
@@ -448,6 +530,7 @@ def transfer_voucher(request, booking_pk):
 
 
 @login_required
+@_voucher_state(TransferBooking, 'core/transfer_voucher_pdf.html')
 def transfer_voucher_pdf(request, booking_pk):
     b = get_object_or_404(TransferBooking, pk=booking_pk)
     if not request.user.is_superuser and b.card.created_by != request.user:
@@ -455,9 +538,9 @@ def transfer_voucher_pdf(request, booking_pk):
         return redirect('dashboard')
 
     url = request.build_absolute_uri(reverse('transfer_voucher', args=[b.pk]))
-    qr = _build_qr_data_url(url)
+    qr = build_qr_data_url(url)
 
-    pdf = _render_pdf_from_template('core/transfer_voucher_pdf.html', {
+    pdf = render_pdf('core/transfer_voucher_pdf.html', {
         'b': b, 'today': timezone.localdate(), 'qr_data_url': qr
     })
     if pdf is None:
@@ -492,6 +575,7 @@ def visa_create(request, card_pk):
 
 
 @login_required
+@_voucher_state(VisaBooking, 'core/visa_voucher.html')
 def visa_voucher(request, booking_pk):
     b = get_object_or_404(VisaBooking, pk=booking_pk)
     if not request.user.is_superuser and b.card.created_by != request.user:
@@ -499,7 +583,7 @@ def visa_voucher(request, booking_pk):
         return redirect('dashboard')
 
     url = request.build_absolute_uri(reverse('visa_voucher', args=[b.pk]))
-    qr = _build_qr_data_url(url)
+    qr = build_qr_data_url(url)
 
     return render(request, 'core/visa_voucher.html', {
         'b': b, 'today': timezone.localdate(), 'qr_data_url': qr
@@ -507,6 +591,7 @@ def visa_voucher(request, booking_pk):
 
 
 @login_required
+@_voucher_state(VisaBooking, 'core/visa_voucher_pdf.html')
 def visa_voucher_pdf(request, booking_pk):
     b = get_object_or_404(VisaBooking, pk=booking_pk)
     if not request.user.is_superuser and b.card.created_by != request.user:
@@ -514,9 +599,9 @@ def visa_voucher_pdf(request, booking_pk):
         return redirect('dashboard')
 
     url = request.build_absolute_uri(reverse('visa_voucher', args=[b.pk]))
-    qr = _build_qr_data_url(url)
+    qr = build_qr_data_url(url)
 
-    pdf = _render_pdf_from_template('core/visa_voucher_pdf.html', {
+    pdf = render_pdf('core/visa_voucher_pdf.html', {
         'b': b, 'today': timezone.localdate(), 'qr_data_url': qr
     })
     if pdf is None:
@@ -527,7 +612,19 @@ def visa_voucher_pdf(request, booking_pk):
     return resp
 # ===================== Reports + CSV =====================
 
+# (kind, model, label, row -> (ref, voucher, employee, extra)) للتقارير والتصدير
+REPORT_SPECS = [
+    ('hotel', HotelBooking, 'Hotel', lambda r: (r.booking_ref, r.voucher_code, r.employee_name, f'{r.hotel_name} / {r.country or "-"}')),
+    # الطيران مفيهوش booking_ref/employee_name ولا from_city/to_city/depart_date (الكود القديم كان بيقع
+    # بـ AttributeError أول ما يلاقي رحلة): الكود والـ PNR بدلهم
+    ('flight', FlightBooking, 'Flight', lambda r: (r.booking_code, '', '', f'{r.airline} {r.pnr}')),
+    ('transfer', TransferBooking, 'Transfer', lambda r: (r.booking_ref, r.voucher_code, r.employee_name, f'{r.pickup}→{r.dropoff} {r.date}')),
+    ('visa', VisaBooking, 'Visa', lambda r: (r.booking_ref, r.voucher_code, r.employee_name, f'{r.visa_type or "-"} / {r.nationality or "-"}')),
+]
+
+
 @login_required
+@read_only
 def reports(request):
     date_from = parse_date(request.GET.get('from') or '')
     date_to   = parse_date(request.GET.get('to') or '')
@@ -537,28 +634,25 @@ def reports(request):
     base_filter = {} if request.user.is_superuser else {'card__created_by': request.user}
     data, labels = [], []
 
-    def _append(qs, kname, formatter):
+    for key, model, kname, fmt in REPORT_SPECS:
+        if kind not in (key, ''):
+            continue
+        qs = model.objects.filter(**base_filter)
         if date_from: qs = qs.filter(created_at__date__gte=date_from)
         if date_to:   qs = qs.filter(created_at__date__lte=date_to)
-        if employee:  qs = qs.filter(employee_name__icontains=employee)
-        for r in qs.select_related('card')[:1000]:
+        if employee:
+            if not hasattr(model, 'employee_name'):
+                continue
+            qs = qs.filter(employee_name__icontains=employee)
+        for r in qs.select_related('card').order_by('-created_at')[:1000]:
+            ref, voucher, emp, extra = fmt(r)
             data.append({
-                'kind': kname, 'ref': r.booking_ref, 'voucher': r.voucher_code,
-                'employee': r.employee_name,
+                'kind': kname, 'ref': ref, 'voucher': voucher, 'employee': emp,
                 'customer': r.card.customer_name if r.card_id else '',
-                'created': r.created_at, 'extra': formatter(r)
+                'created': r.created_at, 'extra': extra,
             })
         labels.append((kname, qs.count()))
 
-    if kind in ('hotel',''):    
-        _append(HotelBooking.objects.filter(**base_filter), 'Hotel', lambda r: f'{r.hotel_name} / {r.country or "-"}')
-    if kind in ('flight',''):   
-        _append(FlightBooking.objects.filter(**base_filter), 'Flight', lambda r: f'{r.from_city}→{r.to_city} {r.depart_date}')
-    if kind in ('transfer',''): 
-        _append(TransferBooking.objects.filter(**base_filter), 'Transfer', lambda r: f'{r.pickup}→{r.dropoff} {r.date}')
-    if kind in ('visa',''):     
-        _append(VisaBooking.objects.filter(**base_filter), 'Visa', lambda r: f'{r.visa_type or "-"} / {r.nationality or "-"}')
-
     data.sort(key=lambda x: x['created'], reverse=True)
     chart_labels = [lbl for lbl,_ in labels]
     chart_values = [cnt for _,cnt in labels]
@@ -570,81 +664,83 @@ def reports(request):
     })
 
 
-@login_required
-def reports_export_csv(request):
+# ===================== Reports Export =====================
+
+EXPORT_HEADER = ['Type','Booking Ref','Voucher','Employee','Customer','Created At','Extra']
+EXPORT_CHUNK = 2000  # على Postgres: server-side cursor بيجيب الصفوف على دفعات
+
+
+def _export_rows(request, limit=None):
+    """صفوف التصدير كـ generator: الصفوف بتتقري وتتكتب على دفعات من غير ما تتجمع في الذاكرة.
+
+    ``limit`` حد أقصى لكل نوع حجز (مش للتصدير كله).
+    """
     date_from = parse_date(request.GET.get('from') or '')
     date_to   = parse_date(request.GET.get('to') or '')
     employee  = (request.GET.get('employee') or '').strip()
     kind      = (request.GET.get('kind') or '').strip()
     base_filter = {} if request.user.is_superuser else {'card__created_by': request.user}
-    rows = []
 
-    def _append(qs, kname, formatter):
+    for key, model, kname, fmt in REPORT_SPECS:
+        if kind not in (key, ''):
+            continue
+        qs = model.objects.filter(**base_filter)
         if date_from: qs = qs.filter(created_at__date__gte=date_from)
         if date_to:   qs = qs.filter(created_at__date__lte=date_to)
-        if employee:  qs = qs.filter(employee_name__icontains=employee)
-        for r in qs.select_related('card')[:10000]:
-            rows.append([kname, r.booking_ref, r.voucher_code, r.employee_name,
-                         r.card.customer_name if r.card_id else '',
-                         r.created_at.isoformat(), formatter(r)])
-
-    if kind in ('hotel',''):    
-        _append(HotelBooking.objects.filter(**base_filter),'Hotel',lambda r:f'{r.hotel_name}/{r.country}')
-    if kind in ('flight',''):   
-        _append(FlightBooking.objects.filter(**base_filter),'Flight',lambda r:f'{r.from_city}→{r.to_city} {r.depart_date}')
-    if kind in ('transfer',''): 
-        _append(TransferBooking.objects.filter(**base_filter),'Transfer',lambda r:f'{r.pickup}→{r.dropoff} {r.date}')
-    if kind in ('visa',''):     
-        _append(VisaBooking.objects.filter(**base_filter),'Visa',lambda r:f'{r.visa_type}/{r.nationality}')
+        if employee:
+            if not hasattr(model, 'employee_name'):
+                continue
+            qs = qs.filter(employee_name__icontains=employee)
+        qs = qs.select_related('card')
+        if limit is not None:
+            qs = qs[:limit]
+        for r in qs.iterator(chunk_size=EXPORT_CHUNK):
+            ref, voucher, emp, extra = fmt(r)
+            yield [kname, ref, voucher, emp, r.card.customer_name if r.card_id else '', r.created_at, extra]
 
-    resp = HttpResponse(content_type='text/csv; charset=utf-8')
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+@login_required
+@read_only
+def reports_export_csv(request):
+    writer = csv.writer(_Echo())
+
+    def lines():
+        yield writer.writerow(EXPORT_HEADER)
+        n = 0
+        for n, row in enumerate(_export_rows(request), 1):
+            row[5] = row[5].isoformat()
+            yield writer.writerow(row)
+        metrics.EXPORT_ROWS.observe(n, format='csv')
+
+    resp = StreamingHttpResponse(lines(), content_type='text/csv; charset=utf-8')
     resp['Content-Disposition'] = 'attachment; filename="reports.csv"'
-    writer = csv.writer(resp)
-    writer.writerow(['Type','Booking Ref','Voucher','Employee','Customer','Created At','Extra'])
-    writer.writerows(rows)
     return resp
 
 
 # ===================== Reports Export XLSX =====================
 
 @login_required
+@read_only
 def reports_export_xlsx(request):
     from openpyxl import Workbook
     from openpyxl.utils import get_column_letter
 
-    date_from = parse_date(request.GET.get('from') or '')
-    date_to   = parse_date(request.GET.get('to') or '')
-    employee  = (request.GET.get('employee') or '').strip()
-    kind      = (request.GET.get('kind') or '').strip()
-    base_filter = {} if request.user.is_superuser else {'card__created_by': request.user}
-    rows = []
-
-    def _append(qs, kname, formatter):
-        if date_from: qs = qs.filter(created_at__date__gte=date_from)
-        if date_to:   qs = qs.filter(created_at__date__lte=date_to)
-        if employee:  qs = qs.filter(employee_name__icontains=employee)
-        for r in qs.select_related('card')[:10000]:
-            rows.append([kname,r.booking_ref,r.voucher_code,r.employee_name,
-                         r.card.customer_name if r.card_id else '',
-                         r.created_at.isoformat(),formatter(r)])
-
-    if kind in ('hotel',''):    
-        _append(HotelBooking.objects.filter(**base_filter),'Hotel',lambda r:f'{r.hotel_name}/{r.country}')
-    if kind in ('flight',''):   
-        _append(FlightBooking.objects.filter(**base_filter),'Flight',lambda r:f'{r.from_city}→{r.to_city} {r.depart_date}')
-    if kind in ('transfer',''): 
-        _append(TransferBooking.objects.filter(**base_filter),'Transfer',lambda r:f'{r.pickup}→{r.dropoff} {r.date}')
-    if kind in ('visa',''):     
-        _append(VisaBooking.objects.filter(**base_filter),'Visa',lambda r:f'{r.visa_type}/{r.nationality}')
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Reports"
-    header = ['Type','Booking Ref','Voucher','Employee','Customer','Created At','Extra']
-    ws.append(header)
-    for row in rows: ws.append(row)
-    for i,title in enumerate(header,1):
+    # write_only: الصفوف بتتكتب لملف مؤقت بدل ما الشيت كله يتبني في الذاكرة
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reports")
+    for i,title in enumerate(EXPORT_HEADER,1):
         ws.column_dimensions[get_column_letter(i)].width = max(12,len(title)+2)
+    ws.append(EXPORT_HEADER)
+    n = 0
+    for n, row in enumerate(_export_rows(request), 1):
+        row[5] = row[5].isoformat()
+        ws.append(row)
+    metrics.EXPORT_ROWS.observe(n, format='xlsx')
 
     resp = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
     resp['Content-Disposition'] = 'attachment; filename="reports.xlsx"'
@@ -655,35 +751,18 @@ def reports_export_xlsx(request):
 # ===================== Reports Export PDF =====================
 
 @login_required
+@read_only
 def reports_export_pdf(request):
-    date_from = parse_date(request.GET.get('from') or '')
-    date_to   = parse_date(request.GET.get('to') or '')
     employee  = (request.GET.get('employee') or '').strip()
     kind      = (request.GET.get('kind') or '').strip()
-    base_filter = {} if request.user.is_superuser else {'card__created_by': request.user}
-    rows = []
-
-    def _append(qs,kname,formatter):
-        if date_from: qs = qs.filter(created_at__date__gte=date_from)
-        if date_to:   qs = qs.filter(created_at__date__lte=date_to)
-        if employee:  qs = qs.filter(employee_name__icontains=employee)
-        for r in qs.select_related('card')[:10000]:
-            rows.append({'type':kname,'ref':r.booking_ref,'voucher':r.voucher_code,
-                         'employee':r.employee_name,
-                         'customer':r.card.customer_name if r.card_id else '',
-                         'created':r.created_at,'extra':formatter(r)})
-
-    if kind in ('hotel',''):    
-        _append(HotelBooking.objects.filter(**base_filter),'Hotel',lambda r:f'{r.hotel_name}/{r.country}')
-    if kind in ('flight',''):   
-        _append(FlightBooking.objects.filter(**base_filter),'Flight',lambda r:f'{r.from_city}→{r.to_city} {r.depart_date}')
-    if kind in ('transfer',''): 
-        _append(TransferBooking.objects.filter(**base_filter),'Transfer',lambda r:f'{r.pickup}→{r.dropoff} {r.date}')
-    if kind in ('visa',''):     
-        _append(VisaBooking.objects.filter(**base_filter),'Visa',lambda r:f'{r.visa_type}/{r.nationality}')
+    rows = [
+        {'type':t,'ref':ref,'voucher':voucher,'employee':emp,'customer':customer,'created':created,'extra':extra}
+        for t, ref, voucher, emp, customer, created, extra in _export_rows(request, limit=10000)
+    ]
 
     rows.sort(key=lambda x: x['created'], reverse=True)
-    pdf_bytes = _render_pdf_from_template('core/reports_pdf.html',{
+    metrics.EXPORT_ROWS.observe(len(rows), format='pdf')
+    pdf_bytes = render_pdf('core/reports_pdf.html',{
         'rows':rows,'q_from':request.GET.get('from',''),'q_to':request.GET.get('to',''),
         'q_employee':employee,'q_kind':kind,'generated_at':timezone.now(),'user':request.user,
     })
@@ -695,82 +774,20 @@ def reports_export_pdf(request):
     return resp
 # ===================== Voucher Upload / Parse =====================
 
-DATE_PATTERNS = [
-    r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-    r'([A-Za-z]{3}\s?\d{1,2},?\s?\d{4})',
-]
-
-def parse_dates(text):
-    def _norm(s):
-        for fmt in ("%d/%m/%Y","%d-%m-%Y","%m/%d/%Y","%m-%d-%Y","%b %d %Y","%b %d, %Y"):
-            try:
-                return datetime.strptime(s.replace(",",""), fmt).date()
-            except:
-                pass
-        return None
-    checkin = checkout = None
-    for key in ["check in","check-in","arrival","from"]:
-        m = re.search(key+r".{0,20}"+DATE_PATTERNS[0], text, re.IGNORECASE) or \
-            re.search(key+r".{0,20}"+DATE_PATTERNS[1], text, re.IGNORECASE)
-        if m: checkin = _norm(m.group(1)); break
-    for key in ["check out","check-out","departure","to"]:
-        m = re.search(key+r".{0,20}"+DATE_PATTERNS[0], text, re.IGNORECASE) or \
-            re.search(key+r".{0,20}"+DATE_PATTERNS[1], text, re.IGNORECASE)
-        if m: checkout = _norm(m.group(1)); break
-    return checkin, checkout
-
-
-def extract_text_from_pdf(fobj):
-    with pdfplumber.open(fobj) as pdf:
-        return "\n".join([p.extract_text() or "" for p in pdf.pages])
-
-
-def extract_text_from_docx(fobj):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-        tmp.write(fobj.read())
-        tmp.flush()
-        doc = Document(tmp.name)
-    return "\n".join([p.text for p in doc.paragraphs])
-
-
-def smart_parse(text):
-    data = {}
-    def _grab(pattern, group=2):
-        m = re.search(pattern,text,re.IGNORECASE)
-        return m.group(group).strip() if m else None
-    data["booking_ref"] = _grab(r'(booking\s*ref|reservation\s*id)\s*[:\-]?\s*([A-Z0-9\-]+)')
-    data["voucher_code"]= _grab(r'(voucher\s*code|voucher)\s*[:\-]?\s*([A-Z0-9\-]+)')
-    data["customer_display_name"]= _grab(r'(guest|holder|customer)\s*[:\-]?\s*([A-Za-z \-]+)')
-    data["hotel_name"]= _grab(r'(hotel)\s*[:\-]?\s*([A-Za-z0-9 ,\-\.\(\)]+)')
-    data["hotel_address"]= _grab(r'(address)\s*[:\-]?\s*(.+)',2)
-    data["provider_name"]= _grab(r'(provider|supplier)\s*[:\-]?\s*([A-Za-z0-9 \-]+)')
-    data["country"]= _grab(r'(country)\s*[:\-]?\s*([A-Za-z \-]+)')
-    data["meal_plan"]= _grab(r'(meal|board)\s*[:\-]?\s*([A-Za-z \-]+)')
-    data["room_type"]= _grab(r'(room\s*type)\s*[:\-]?\s*(.+)',2)
-
-    m = re.search(r'(nights?)\s*[:\-]?\s*(\d+)',text,re.IGNORECASE)
-    data["nights"]= int(m.group(2)) if m else None
-    m = re.search(r'(rooms?)\s*[:\-]?\s*(\d+)',text,re.IGNORECASE)
-    data["rooms_count"]= int(m.group(2)) if m else None
-    ci,co = parse_dates(text)
-    data["checkin"],data["checkout"]=ci,co
-    return data
-
-
 @require_http_methods(["GET","POST"])
 def voucher_upload(request):
     if request.method=="POST":
         form = VoucherUploadForm(request.POST, request.FILES)
         if form.is_valid():
             f = form.cleaned_data["file"]
-            ext = (f.name.split(".")[-1] or "").lower()
             try:
-                text = extract_text_from_pdf(f) if ext=="pdf" else extract_text_from_docx(f) if ext=="docx" else None
-                if not text:
+                read = read_voucher(f, f.name)
+                if not read.text:
                     return render(request,"core/voucher_upload.html",{"form":form,"error":"ملف غير مدعوم"})
-                data = smart_parse(text)
-                confirm_form = VoucherConfirmForm(initial={k:(v.strftime("%Y-%m-%d") if hasattr(v,"strftime") else v) for k,v in data.items()})
-                return render(request,"core/voucher_confirm.html",{"confirm_form":confirm_form,"raw_text":text[:3000]})
+                if read.duplicate:
+                    messages.info(request, "الملف ده اترفع قبل كده، البيانات من القراءة السابقة.")
+                confirm_form = VoucherConfirmForm(initial=read.data)
+                return render(request,"core/voucher_confirm.html",{"confirm_form":confirm_form,"raw_text":read.text[:3000]})
             except Exception as e:
                 return render(request,"core/voucher_upload.html",{"form":form,"error":f"خطأ أثناء القراءة: {e}"})
     else:
@@ -788,12 +805,111 @@ def voucher_generate(request):
     html = render_to_string("core/voucher_template.html",{
         "booking": type("B",(),booking),"qr_data_url":"","today":today,
     })
-    pdf_bytes = _render_pdf_from_template("core/voucher_template.html",{
+    pdf_bytes = render_pdf("core/voucher_template.html",{
         "booking": type("B",(),booking),"qr_data_url":"","today":today,
     })
     resp = HttpResponse(pdf_bytes,content_type="application/pdf")
     resp["Content-Disposition"]='inline; filename="voucher.pdf"'
     return resp
+# ===================== Voucher Ingestion (رفع مجموعة فاوتشرات) =====================
+
+@login_required
+def voucher_ingest(request):
+    card = None
+    if request.GET.get("card"):
+        card = get_object_or_404(_cards_base_qs(request), pk=request.GET["card"])
+
+    if request.method == "POST":
+        form = VoucherIngestForm(request.POST, request.FILES)
+        if form.is_valid():
+            jobs = create_jobs(form.cleaned_data["files"], request.user, card=card)
+            messages.success(request, f"تم رفع {len(jobs)} ملف، وجاري قراءتها في الخلفية.")
+            return redirect(request.get_full_path())
+    else:
+        form = VoucherIngestForm()
+
+    jobs = (VoucherIngestJob.objects
+            .filter(created_by=request.user, booking__isnull=True)
+            .select_related("card")
+            .defer("text")[:200])
+    in_progress = any(j.status in (VoucherIngestJob.STATUS_PENDING, VoucherIngestJob.STATUS_RUNNING) for j in jobs)
+    return render(request, "core/voucher_ingest.html", {
+        "form": form, "card": card, "jobs": jobs, "in_progress": in_progress,
+        "cards": _cards_base_qs(request).order_by("-created_at")[:50],
+    })
+
+
+@login_required
+def voucher_ingest_review(request, job_pk):
+    job = get_object_or_404(VoucherIngestJob, pk=job_pk, created_by=request.user)
+    card_pk = job.card_id or request.GET.get("card")
+    if not job.needs_review or not card_pk:
+        messages.error(request, "اختار كارت العميل للفاوتشر الأول.")
+        return redirect("voucher_ingest")
+    return redirect(f"{reverse('hotel_create', args=[card_pk])}?ingest={job.pk}")
+
+
+@login_required
+@require_POST
+def voucher_ingest_dismiss(request, job_pk):
+    job = get_object_or_404(VoucherIngestJob, pk=job_pk, created_by=request.user)
+    job.delete()  # الملف بيتمسح من الـ storage في signals لو مفيش حد تاني بيستخدمه
+    messages.success(request, "تم حذف الملف من الطابور.")
+    return redirect("voucher_ingest")
+
+
+# ===================== Media =====================
+
+def _can_access_media(request, name):
+    if request.user.is_superuser:
+        return True
+    cards, users = media.file_owners(name)
+    return request.user.pk in users or (cards and _cards_base_qs(request).filter(pk__in=cards).exists())
+
+
+@login_required
+def protected_media(request, name):
+    storage = get_blob_storage()
+    original = name[: -len(PREVIEW_SUFFIX)] if name.endswith(PREVIEW_SUFFIX) else name
+    if ".." in name.split("/") or not _can_access_media(request, original) or not storage.exists(name):
+        raise Http404
+    return media.serve(request, storage, name, "image/webp" if name != original else None)
+
+
+# ===================== Metrics =====================
+
+def metrics_view(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    auth = request.headers.get('Authorization', '')
+    if not request.user.is_superuser and not (token and hmac.compare_digest(auth, f'Bearer {token}')):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.render_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# ===================== Profiles =====================
+
+@login_required
+def profiles(request):
+    if not request.user.is_superuser:
+        messages.error(request, "غير مسموح.")
+        return redirect('dashboard')
+    return render(request, 'core/profiles.html', {
+        'profiles': profiling.recent_profiles(),
+        'param': profiling.PARAM,
+        'header': profiling.HEADER,
+        'enabled': settings.PROFILING,
+    })
+
+
+@login_required
+def profile_file(request, name, filename):
+    path = profiling.profile_file(name, filename) if request.user.is_superuser else None
+    if path is None:
+        raise Http404
+    return FileResponse(open(path, 'rb'), content_type=profiling.FILES[filename],
+                        as_attachment=filename.endswith('.prof'), filename=filename)
+
+
 # ===================== Edit Payment =====================
 
 @login_required
@@ -830,8 +946,32 @@ def hotel_payment_edit(request, booking_id):
 
 # ===================== Dashboard Overview =====================
 
+MONTHS_AR = {
+    1:"يناير",2:"فبراير",3:"مارس",4:"إبريل",5:"مايو",6:"يونيو",
+    7:"يوليو",8:"أغسطس",9:"سبتمبر",10:"أكتوبر",11:"نوفمبر",12:"ديسمبر"
+}
+OVERVIEW_KINDS = {'hotel': HotelBooking, 'flight': FlightBooking, 'transfer': TransferBooking, 'visa': VisaBooking}
+
+
+def _latest_rows(qs, n=5):
+    return list(qs.select_related('card').order_by('-created_at')[:n])
+
+
+def _name_counts(qs, field):
+    return Counter(dict(qs.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+                          .values_list(field).annotate(n=Count('id')).order_by()))
+
+
+def _distinct_values(qs, field):
+    return list(qs.order_by().values_list(field, flat=True).distinct())
+
+
 @login_required
-def dashboard_overview(request):
+@read_only
+async def dashboard_overview(request):
+    # كل استعلام مستقل بيشتغل على ثريد من pool الـ queries بالتوازي،
+    # فوقت الصفحة = أبطأ استعلام مش مجموعهم
+    user = await request.auser()
     q_from     = parse_date(request.GET.get('from') or '')
     q_to       = parse_date(request.GET.get('to') or '')
     q_employee = (request.GET.get('employee') or '').strip()
@@ -839,113 +979,89 @@ def dashboard_overview(request):
 
     # صلاحيات
     card_filter, booking_filter = {}, {}
-    if not request.user.is_superuser:
-        card_filter['created_by'] = request.user
-        booking_filter['card__created_by'] = request.user
+    if not user.is_superuser:
+        card_filter['created_by'] = user
+        booking_filter['card__created_by'] = user
 
     if q_from: booking_filter['created_at__date__gte'] = q_from
     if q_to:   booking_filter['created_at__date__lte'] = q_to
-    if q_employee: booking_filter['employee_name__icontains'] = q_employee
 
     # Querysets
-    hotel_qs_all    = HotelBooking.objects.filter(**booking_filter)
-    flight_qs_all   = FlightBooking.objects.filter(**booking_filter)
-    transfer_qs_all = TransferBooking.objects.filter(**booking_filter)
-    visa_qs_all     = VisaBooking.objects.filter(**booking_filter)
-
-    if q_kind == 'hotel':
-        hotel_qs, flight_qs, transfer_qs, visa_qs = hotel_qs_all, HotelBooking.objects.none(), TransferBooking.objects.none(), VisaBooking.objects.none()
-    elif q_kind == 'flight':
-        hotel_qs, flight_qs, transfer_qs, visa_qs = HotelBooking.objects.none(), flight_qs_all, TransferBooking.objects.none(), VisaBooking.objects.none()
-    elif q_kind == 'transfer':
-        hotel_qs, flight_qs, transfer_qs, visa_qs = HotelBooking.objects.none(), FlightBooking.objects.none(), transfer_qs_all, VisaBooking.objects.none()
-    elif q_kind == 'visa':
-        hotel_qs, flight_qs, transfer_qs, visa_qs = HotelBooking.objects.none(), FlightBooking.objects.none(), TransferBooking.objects.none(), visa_qs_all
-    else:
-        hotel_qs, flight_qs, transfer_qs, visa_qs = hotel_qs_all, flight_qs_all, transfer_qs_all, visa_qs_all
-
-    # KPIs
-    total_cards = UniBookingCard.objects.filter(**card_filter).count()
-    counts = {
-        'hotels': hotel_qs_all.count(),
-        'flights': flight_qs_all.count(),
-        'transfers': transfer_qs_all.count(),
-        'visas': visa_qs_all.count(),
-        'all': hotel_qs_all.count() + flight_qs_all.count() + transfer_qs_all.count() + visa_qs_all.count(),
-    }
+    all_qs = {}
+    for key, model in OVERVIEW_KINDS.items():
+        qs = model.objects.filter(**booking_filter)
+        if q_employee:
+            # الطيران مفيهوش employee_name
+            qs = qs.filter(employee_name__icontains=q_employee) if hasattr(model, 'employee_name') else qs.none()
+        all_qs[key] = qs
+    shown = {key: qs if q_kind in ('', key) else qs.none() for key, qs in all_qs.items()}
+    staff_kinds = [key for key, model in OVERVIEW_KINDS.items() if hasattr(model, 'employee_name')]
 
     # إجماليات مالية (فنادق فقط)
     dec0 = V(Decimal('0.00'), output_field=DecimalField(max_digits=12, decimal_places=2))
-    if q_kind not in ('', 'hotel'):
-        total_net = total_sell = total_paid = total_remaining = Decimal('0.00')
-        pays = Payment.objects.none()
-    else:
-        hotel_ids_for_pay = list(hotel_qs.values_list('id', flat=True))
-        pays = Payment.objects.filter(booking_hotel_id__in=hotel_ids_for_pay)
-        if q_from: pays = pays.filter(created_at__date__gte=q_from)
-        if q_to:   pays = pays.filter(created_at__date__lte=q_to)
-
-        totals = pays.aggregate(
-            total_net=Coalesce(Sum('net_price'), dec0),
-            total_sell=Coalesce(Sum('sell_price'), dec0),
-            total_paid=Coalesce(Sum('paid_amount'), dec0),
-        )
-        total_net = totals['total_net'] or Decimal('0.00')
-        total_sell = totals['total_sell'] or Decimal('0.00')
-        total_paid = totals['total_paid'] or Decimal('0.00')
-        total_remaining = total_sell - total_paid
-
-    # المبيعات الشهرية
-    months_map = {
-        1:"يناير",2:"فبراير",3:"مارس",4:"إبريل",5:"مايو",6:"يونيو",
-        7:"يوليو",8:"أغسطس",9:"سبتمبر",10:"أكتوبر",11:"نوفمبر",12:"ديسمبر"
-    }
-    monthly_raw = (
+    pays = Payment.objects.filter(booking_hotel__in=shown['hotel'])
+    if q_from: pays = pays.filter(created_at__date__gte=q_from)
+    if q_to:   pays = pays.filter(created_at__date__lte=q_to)
+    monthly_qs = (
         pays.annotate(month=ExtractMonth('created_at'))
             .values('month')
             .annotate(sell=Coalesce(Sum('sell_price'), dec0),
                       net=Coalesce(Sum('net_price'), dec0))
             .order_by('month')
     )
+
+    q = partial(run_async, 'queries')
+    total_cards, kind_counts, totals, monthly_raw, latest_parts, agent_parts, customer_parts, employee_parts = await asyncio.gather(
+        q(UniBookingCard.objects.filter(**card_filter).count),
+        asyncio.gather(*(q(qs.count) for qs in all_qs.values())),
+        q(pays.aggregate,
+          total_net=Coalesce(Sum('net_price'), dec0),
+          total_sell=Coalesce(Sum('sell_price'), dec0),
+          total_paid=Coalesce(Sum('paid_amount'), dec0)),
+        q(list, monthly_qs),
+        asyncio.gather(*(q(_latest_rows, qs) for qs in shown.values())),
+        asyncio.gather(*(q(_name_counts, shown[key], 'employee_name') for key in staff_kinds)),
+        asyncio.gather(*(q(_name_counts, qs, 'card__customer_name') for qs in shown.values())),
+        asyncio.gather(*(q(_distinct_values, all_qs[key], 'employee_name') for key in staff_kinds)),
+    )
+
+    # KPIs
+    counts = dict(zip(('hotels', 'flights', 'transfers', 'visas'), kind_counts))
+    counts['all'] = sum(kind_counts)
+
+    total_net = totals['total_net'] or Decimal('0.00')
+    total_sell = totals['total_sell'] or Decimal('0.00')
+    total_paid = totals['total_paid'] or Decimal('0.00')
+    total_remaining = total_sell - total_paid
+
+    # المبيعات الشهرية
     months, sales_data, net_data = [], [], []
     for r in monthly_raw:
         m = r['month']
         if not m: continue
-        months.append(months_map.get(m, str(m)))
+        months.append(MONTHS_AR.get(m, str(m)))
         sales_data.append(float(r['sell'] or 0))
         net_data.append(float(r['net'] or 0))
 
     # أحدث 5 حجوزات
     latest = sorted(
-        list(hotel_qs) + list(flight_qs) + list(transfer_qs) + list(visa_qs),
+        (b for part in latest_parts for b in part),
         key=lambda b: b.created_at, reverse=True
     )[:5]
     for b in latest:
         setattr(b, 'display_kind', b._meta.model_name)
 
     # Top Agents & Customers
-    agent_counter, customer_counter = Counter(), Counter()
-    def _count_from_qs(qs):
-        for r in qs.values('employee_name','card__customer_name'):
-            if r['employee_name']: agent_counter[r['employee_name']] += 1
-            if r['card__customer_name']: customer_counter[r['card__customer_name']] += 1
-    _count_from_qs(hotel_qs); _count_from_qs(flight_qs); _count_from_qs(transfer_qs); _count_from_qs(visa_qs)
-    top_agents = agent_counter.most_common(5)
-    top_customers = customer_counter.most_common(5)
+    top_agents = sum(agent_parts, Counter()).most_common(5)
+    top_customers = sum(customer_parts, Counter()).most_common(5)
 
     # توزيع أنواع الحجوزات
-    booking_types_data = [hotel_qs.count(), flight_qs.count(), transfer_qs.count(), visa_qs.count()]
+    booking_types_data = [c if q_kind in ('', key) else 0 for key, c in zip(OVERVIEW_KINDS, kind_counts)]
 
     # قائمة الموظفين
-    employees_set = set(
-        list(hotel_qs_all.values_list('employee_name', flat=True)) +
-        list(flight_qs_all.values_list('employee_name', flat=True)) +
-        list(transfer_qs_all.values_list('employee_name', flat=True)) +
-        list(visa_qs_all.values_list('employee_name', flat=True))
-    )
-    employees = sorted([e for e in employees_set if (e or '').strip()])
+    employees = sorted({e for part in employee_parts for e in part if (e or '').strip()})
 
-    return render(request,'core/dashboard_overview.html',{
+    return await sync_to_async(render)(request,'core/dashboard_overview.html',{
         'total_cards': total_cards,
         'counts': counts,
         'total_net': total_net, 'total_sell': total_sell,
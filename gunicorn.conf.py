@@ -0,0 +1,10 @@
+# gunicorn.conf.py
+# gunicorn بيقرا الملف ده تلقائي لما يشتغل من جذر المشروع (الـ Procfile).
+# الإعدادات نفسها في unibooking/gunicorn_common.py عشان gunicorn_asgi.conf.py يستوردها هو كمان
+import os
+import sys
+
+# gunicorn بيقرا الـ config قبل ما يطبّق --chdir، فبنضيف جذر المشروع بنفسنا
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from unibooking.gunicorn_common import *  # noqa: E402,F401,F403
@@ -0,0 +1,17 @@
+# gunicorn_asgi.conf.py
+# تشغيل ASGI (الـ dashboard_overview async واستعلاماته بتشتغل بالتوازي):
+#   gunicorn unibooking.asgi:application -c gunicorn_asgi.conf.py
+# الـ Procfile الافتراضي لسه WSGI؛ الـ views الـ async بتشتغل هناك برضه بس كل request بياخد worker.
+# باقي الإعدادات (preload والـ warm-up) من unibooking/gunicorn_common.py.
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # زي gunicorn.conf.py
+
+from unibooking.gunicorn_common import *  # noqa: E402,F401,F403
+
+# uvicorn.workers اتشال من uvicorn؛ الـ worker بقى في باكدج uvicorn-worker
+worker_class = "uvicorn_worker.UvicornWorker"
+# worker async واحد بيخدم requests كتير، فمحتاجين عدد أقل من WSGI
+workers = int(os.getenv("WEB_CONCURRENCY", max(2, multiprocessing.cpu_count())))
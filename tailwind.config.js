@@ -1,8 +1,10 @@
 module.exports = {
+  // الثيم الداكن بيتفعل بكلاس dark على <html> (زرار المظهر الداكن)
+  darkMode: "class",
   content: [
     "./templates/**/*.html",
     "./core/templates/**/*.html",
-    "./**/*.py",
+    "./core/**/*.py",
   ],
   theme: {
     extend: {},
@@ -0,0 +1,55 @@
+# unibooking/gunicorn_common.py
+# إعدادات gunicorn المشتركة بين gunicorn.conf.py (WSGI) و gunicorn_asgi.conf.py (ASGI).
+# preload_app: Django والـ urls والـ templates بيتحملوا مرة واحدة في الـ master
+# والـ workers بيتعملوا fork منه، فالتشغيل وإعادة التشغيل أسرع والذاكرة مشتركة.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", max(2, multiprocessing.cpu_count() + 1)))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+# بنعيد تشغيل الـ worker كل فترة عشان أي تسريب في الذاكرة (PDF/OCR)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+accesslog = "-"
+
+
+def _warm_up(log):
+    from core.services.warmup import warm_up
+
+    stats = warm_up()
+    log.info("Warm-up: %(urls)s url patterns, %(templates)s templates in %(seconds)ss", stats)
+
+
+def on_starting(server):
+    # ملفات /metrics من التشغيل اللي فات (pids قديمة) متتجمعش مع الجديدة.
+    # core.metrics محتاج الـ settings بس: من غير preload الـ master ميحمّلش Django خالص
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "unibooking.settings")
+    if server.cfg.preload_app:
+        import django
+
+        django.setup()
+    from core.metrics import REGISTRY
+
+    REGISTRY.reset_dir()
+
+
+def child_exit(server, worker):
+    # الـ worker اللي خلص (max_requests) أرقامه بتتجمع في dead.json بدل ملف لكل pid
+    from core.metrics import REGISTRY
+
+    REGISTRY.retire(worker.pid)
+
+
+def when_ready(server):
+    # مع preload_app الـ app اتحمّل في الـ master قبل ما نوصل هنا
+    if server.cfg.preload_app:
+        _warm_up(server.log)
+
+
+def post_worker_init(worker):
+    if not worker.cfg.preload_app:
+        _warm_up(worker.log)
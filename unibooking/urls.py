@@ -1,9 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
 
+from core import views as core_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -17,6 +18,9 @@ urlpatterns = [
     ), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='login'), name='logout'),
 
+    # الملفات المرفوعة: بعد التحقق من الصلاحية (الـ proxy هو اللي بيبعت الملف)
+    path(settings.MEDIA_URL.lstrip('/') + '<path:name>', core_views.protected_media, name='protected_media'),
+
     # App
     path('', include('core.urls')),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]